@@ -1,3 +1,4 @@
+import gc
 import multiprocessing
 
 name = 'sdow'
@@ -6,3 +7,27 @@ errorlog = 'errors.log'
 accesslog = 'access.log'
 capture_output = True
 workers = multiprocessing.cpu_count() * 2 + 1
+
+# Sync workers are killed if a single request takes longer than this, which must leave room for
+# BATCH_MAX_DURATION_SECONDS in sdow/server.py. Must match the proxy timeouts in nginx.conf.
+timeout = 120
+
+# Load the app, including the memory-mapped graph files, once in the master process so that every
+# worker shares it copy-on-write instead of loading its own copy.
+preload_app = True
+
+
+def pre_fork(server, worker):
+  # Exclude everything allocated while preloading from garbage collection so that collections in
+  # the workers do not write to, and therefore copy, the shared memory pages.
+  gc.freeze()
+
+
+def post_fork(server, worker):
+  from server import init_worker
+  init_worker()
+
+
+def worker_exit(server, worker):
+  from server import shutdown_worker
+  shutdown_worker()
@@ -0,0 +1,242 @@
+"""
+Benchmarks shortest paths searches against an SDOW database and prints the results as JSON, so that
+runs before and after a change can be compared.
+
+A fixed, seeded set of query pairs is drawn for each query class:
+  - hub_to_hub: pairs of the most linked pages.
+  - leaf_to_leaf: pairs of pages with only a few links in each direction.
+  - redirect_resolved: searches from a redirect's title, which must be resolved first.
+  - no_path: pairs of pages with no path between them.
+
+Each query is timed end-to-end through the Database, with the search results cache disabled, and
+then run once more through an instrumented links database which records the pages and links of
+every level expanded and the time spent fetching links, from SQLite or the graph files, as opposed
+to running Python code.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import resource
+
+# The benchmark runs the server's own search code.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from sdow.database import Database
+from sdow.breadth_first_search import breadth_first_search
+
+# Seed used to draw the query pairs, so that every run uses the same pairs.
+RANDOM_SEED = 2018
+
+# Number of most linked pages from which hub pairs are drawn.
+HUB_PAGES_COUNT = 1000
+
+# Maximum number of links in either direction of a leaf page.
+MAX_LEAF_LINKS_COUNT = 3
+
+# Maximum number of random pairs tried per no-path pair found.
+MAX_NO_PATH_ATTEMPTS_PER_PAIR = 50
+
+# Validate input arguments.
+if len(sys.argv) < 2:
+  print('[ERROR] Not enough arguments provided!')
+  print('[INFO] Usage: {0} <sdow_database> [<pairs_per_class>] [<graph_directory>]'.format(
+      sys.argv[0]))
+  sys.exit()
+
+SDOW_DATABASE = sys.argv[1]
+PAIRS_PER_CLASS = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+GRAPH_DIRECTORY = sys.argv[3] if len(sys.argv) > 3 else None
+
+if not os.path.isfile(SDOW_DATABASE):
+  print('[ERROR] Specified SQLite file "{0}" does not exist.'.format(SDOW_DATABASE))
+  sys.exit()
+
+
+class InstrumentedLinksDatabase(object):
+  """Wraps a Database or CsrGraph to record every level expanded by a search and the time spent
+  fetching links."""
+
+  def __init__(self, links_database):
+    self.links_database = links_database
+    self.levels = []
+    self.fetch_seconds = 0
+
+  def fetch_outgoing_links_count(self, page_ids):
+    return self.timed(self.links_database.fetch_outgoing_links_count, page_ids)
+
+  def fetch_incoming_links_count(self, page_ids):
+    return self.timed(self.links_database.fetch_incoming_links_count, page_ids)
+
+  def fetch_outgoing_links(self, page_ids):
+    return self.record_level('forward', self.links_database.fetch_outgoing_links(page_ids),
+                             len(page_ids))
+
+  def fetch_incoming_links(self, page_ids):
+    return self.record_level('backward', self.links_database.fetch_incoming_links(page_ids),
+                             len(page_ids))
+
+  def timed(self, fetch, page_ids):
+    start_time = time.perf_counter()
+    result = fetch(page_ids)
+    self.fetch_seconds += time.perf_counter() - start_time
+    return result
+
+  def record_level(self, direction, links, frontier_size):
+    """Yields the provided links, recording the time spent fetching them and their number."""
+    level = {'direction': direction, 'frontierSize': frontier_size, 'linksScanned': 0}
+    self.levels.append(level)
+
+    links = iter(links)
+    while True:
+      start_time = time.perf_counter()
+      try:
+        page_id, linked_page_ids = next(links)
+      except StopIteration:
+        self.fetch_seconds += time.perf_counter() - start_time
+        return
+      self.fetch_seconds += time.perf_counter() - start_time
+
+      level['linksScanned'] += len(linked_page_ids)
+      yield (page_id, linked_page_ids)
+
+
+def get_percentiles(values):
+  """Returns summary statistics of the provided values, using nearest-rank percentiles."""
+  if not values:
+    return None
+
+  values = sorted(values)
+
+  def get_percentile(percentile):
+    return values[min(len(values) - 1, int(percentile / 100.0 * len(values)))]
+
+  return {
+      'p50': get_percentile(50),
+      'p90': get_percentile(90),
+      'p99': get_percentile(99),
+      'max': values[-1],
+      'mean': sum(values) / len(values),
+  }
+
+
+def draw_pairs(page_ids, pairs_count, rng):
+  """Returns the provided number of random pairs of distinct pages."""
+  if len(page_ids) < 2:
+    return []
+  return [tuple(rng.sample(page_ids, 2)) for _ in range(pairs_count)]
+
+
+def get_query_pairs(database, rng):
+  """Returns the query pairs of each query class, as (source title or page ID, target page ID)."""
+  conn = database.sdow_conn
+
+  hub_page_ids = [row[0] for row in conn.execute(
+      'SELECT id FROM links ORDER BY outgoing_links_count + incoming_links_count DESC, id LIMIT ?;',
+      (HUB_PAGES_COUNT,))]
+
+  leaf_page_ids = [row[0] for row in conn.execute(
+      'SELECT id FROM links WHERE outgoing_links_count BETWEEN 1 AND ? AND incoming_links_count '
+      'BETWEEN 1 AND ? ORDER BY id;', (MAX_LEAF_LINKS_COUNT, MAX_LEAF_LINKS_COUNT))]
+
+  linking_page_ids = [row[0] for row in conn.execute(
+      'SELECT id FROM links WHERE outgoing_links_count > 0 ORDER BY id;')]
+
+  linked_page_ids = [row[0] for row in conn.execute(
+      'SELECT id FROM links WHERE incoming_links_count > 0 ORDER BY id;')]
+
+  redirect_titles = [row[0] for row in conn.execute(
+      'SELECT title FROM pages INNER JOIN redirects ON source_id = id ORDER BY id;')]
+
+  query_pairs = {
+      'hub_to_hub': draw_pairs(hub_page_ids, PAIRS_PER_CLASS, rng),
+      'leaf_to_leaf': draw_pairs(leaf_page_ids, PAIRS_PER_CLASS, rng),
+      'redirect_resolved': [],
+      'no_path': [],
+  }
+
+  if redirect_titles and linked_page_ids:
+    query_pairs['redirect_resolved'] = [
+        (rng.choice(redirect_titles), rng.choice(linked_page_ids)) for _ in range(PAIRS_PER_CLASS)
+    ]
+
+  # Pairs without a path can only be found by searching, which does not count towards the results.
+  # Both pages have links, so that the searches cannot end immediately.
+  for _ in range(PAIRS_PER_CLASS * MAX_NO_PATH_ATTEMPTS_PER_PAIR):
+    if (len(query_pairs['no_path']) == PAIRS_PER_CLASS or not linking_page_ids or
+        not linked_page_ids):
+      break
+    source_page_id = rng.choice(linking_page_ids)
+    target_page_id = rng.choice(linked_page_ids)
+    if database.compute_shortest_paths(source_page_id, target_page_id)[1] == 0:
+      query_pairs['no_path'].append((source_page_id, target_page_id))
+
+  return query_pairs
+
+
+def run_query(database, source, target_page_id):
+  """Runs a single query and returns its measurements."""
+  start_time = time.perf_counter()
+  if isinstance(source, str):
+    source_page_id = database.fetch_page(source)[0]
+  else:
+    source_page_id = source
+  paths, paths_count = database.compute_shortest_paths(source_page_id, target_page_id)
+  latency_seconds = time.perf_counter() - start_time
+
+  # Run the search again through the instrumented links database to see the work it does.
+  links_database = database if database.graph is None else database.graph
+  instrumented_database = InstrumentedLinksDatabase(links_database)
+  start_time = time.perf_counter()
+  breadth_first_search(source_page_id, target_page_id, instrumented_database,
+                       landmark_index=database.landmark_index)
+  search_seconds = time.perf_counter() - start_time
+
+  return {
+      'source': source,
+      'target': target_page_id,
+      'latencySeconds': latency_seconds,
+      'degreesCount': len(paths[0]) - 1 if paths else None,
+      'pathsCount': paths_count,
+      'levels': instrumented_database.levels,
+      'linksScanned': sum(level['linksScanned'] for level in instrumented_database.levels),
+      'fetchSeconds': instrumented_database.fetch_seconds,
+      'pythonSeconds': search_seconds - instrumented_database.fetch_seconds,
+  }
+
+
+# Disable the search results cache so that every query runs a search. Nothing is written to the
+# searches database, so the SDOW database stands in for it.
+database = Database(SDOW_DATABASE, SDOW_DATABASE, graph_directory=GRAPH_DIRECTORY,
+                    search_results_cache_size_bytes=0)
+
+query_pairs = get_query_pairs(database, random.Random(RANDOM_SEED))
+
+results = {
+    'sdowDatabase': os.path.abspath(SDOW_DATABASE),
+    'graphDirectory': os.path.abspath(GRAPH_DIRECTORY) if GRAPH_DIRECTORY else None,
+    'randomSeed': RANDOM_SEED,
+    'pairsPerClass': PAIRS_PER_CLASS,
+    'classes': {},
+}
+
+for query_class, pairs in sorted(query_pairs.items()):
+  queries = [run_query(database, source, target_page_id) for source, target_page_id in pairs]
+
+  results['classes'][query_class] = {
+      'queriesCount': len(queries),
+      'latencySeconds': get_percentiles([query['latencySeconds'] for query in queries]),
+      'linksScanned': get_percentiles([query['linksScanned'] for query in queries]),
+      'maxFrontierSize': get_percentiles(
+          [max([level['frontierSize'] for level in query['levels']] or [0]) for query in queries]),
+      'fetchSeconds': sum(query['fetchSeconds'] for query in queries),
+      'pythonSeconds': sum(query['pythonSeconds'] for query in queries),
+      'queries': queries,
+  }
+
+# Linux reports the peak resident set size in kilobytes.
+results['peakRssKilobytes'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+print(json.dumps(results, indent=2, sort_keys=True))
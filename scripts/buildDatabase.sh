@@ -9,6 +9,8 @@ export LC_ALL=C
 WLANG=''${WLANG:-en}
 OUT_DIR="${OUT_DIR:-dump}"
 DELETE_PROGRESSIVELY=${DELETE_PROGRESSIVELY:-false}
+# Either "text" ("|"-separated page IDs) or "blob" (packed int32 page IDs) links table columns
+LINKS_FORMAT=${LINKS_FORMAT:-text}
 
 # By default, the latest Wikipedia dump will be downloaded. If a download date in the format
 # YYYYMMDD is provided as the first argument, it will be used instead.
@@ -93,40 +95,26 @@ if [ ! -f redirects.txt.gz ]; then
   echo "[INFO] Trimming redirects file"
 
   # Unzip
-  # Remove all lines that don't start with INSERT INTO...
-  # Split into individual records
-  # Only keep records in namespace 0
-  # Replace namespace with a tab
-  # Remove everything starting at the to page name's closing apostrophe
+  # Parse the redirect rows of the INSERT INTO statements in parallel, keeping namespace 0 only
   # Zip into output file
   time pigz -dc $REDIRECTS_FILENAME \
-    | sed -n 's/^INSERT INTO `redirect` VALUES (//p' \
-    | sed -e 's/),(/\'$'\n/g' \
-    | egrep "^[0-9]+,0," \
-    | sed -e $"s/,0,'/\t/g" \
-    | sed -e "s/','.*//g" \
+    | python "$ROOT_DIR/trim_wikipedia_dump.py" redirect \
     | pigz --fast > redirects.txt.gz.tmp
   mv redirects.txt.gz.tmp redirects.txt.gz
 else
   echo "[WARN] Already trimmed redirects file"
 fi
 if $DELETE_PROGRESSIVELY; then rm $REDIRECTS_FILENAME; fi
+
 if [ ! -f pages.txt.gz ]; then
   echo
   echo "[INFO] Trimming pages file"
 
   # Unzip
-  # Remove all lines that don't start with INSERT INTO...
-  # Split into individual records
-  # Only keep records in namespace 0
-  # Replace namespace with a tab
-  # Splice out the page title and whether or not the page is a redirect
+  # Parse the page rows of the INSERT INTO statements in parallel, keeping namespace 0 only
   # Zip into output file
   time pigz -dc $PAGES_FILENAME \
-    | sed -n 's/^INSERT INTO `page` VALUES //p' \
-    | egrep -o "\([0-9]+,0,'([^']*(\\\\')?)+',[01]," \
-    | sed -re $"s/^\(([0-9]+),0,'/\1\t/" \
-    | sed -re $"s/',([01]),/\t\1/" \
+    | python "$ROOT_DIR/trim_wikipedia_dump.py" page \
     | pigz --fast > pages.txt.gz.tmp
   mv pages.txt.gz.tmp pages.txt.gz
 else
@@ -139,17 +127,10 @@ if [ ! -f links.txt.gz ]; then
   echo "[INFO] Trimming links file"
 
   # Unzip
-  # Remove all lines that don't start with INSERT INTO...
-  # Split into individual records
-  # Only keep records in namespace 0
-  # Replace namespace with a tab
-  # Remove everything starting at the to page name's closing apostrophe
+  # Parse the pagelinks rows of the INSERT INTO statements in parallel, keeping namespace 0 only
   # Zip into output file
   time pigz -dc $LINKS_FILENAME \
-    | sed -n 's/^INSERT INTO `pagelinks` VALUES (//p' \
-    | sed -e 's/),(/\'$'\n/g' \
-    | egrep "^[0-9]+,0,[0-9]+$" \
-    | sed -e $"s/,0,/\t/g" \
+    | python "$ROOT_DIR/trim_wikipedia_dump.py" pagelinks \
     | pigz --fast > links.txt.gz.tmp
   mv links.txt.gz.tmp links.txt.gz
 else
@@ -162,18 +143,10 @@ if [ ! -f targets.txt.gz ]; then
   echo "[INFO] Trimming targets file"
 
   # Unzip
-  # Remove all lines that don't start with INSERT INTO...
-  # Split into individual records
-  # Only keep records in namespace 0
-  # Replace namespace with a tab
-  # Remove everything starting at the to page name's closing apostrophe
+  # Parse the linktarget rows of the INSERT INTO statements in parallel, keeping namespace 0 only
   # Zip into output file
   time pigz -dc $TARGETS_FILENAME \
-    | sed -n 's/^INSERT INTO `linktarget` VALUES (//p' \
-    | sed -e 's/),(/\'$'\n/g' \
-    | egrep "^[0-9]+,0,.*$" \
-    | sed -e $"s/,0,'/\t/g" \
-    | sed -e "s/'$//g" \
+    | python "$ROOT_DIR/trim_wikipedia_dump.py" linktarget \
     | pigz --fast > targets.txt.gz.tmp
   mv targets.txt.gz.tmp targets.txt.gz
 else
@@ -222,67 +195,29 @@ if $DELETE_PROGRESSIVELY; then rm links.txt.gz targets.with_ids.txt.gz; fi
 if [ ! -f pages.pruned.txt.gz ]; then
   echo
   echo "[INFO] Pruning pages which are marked as redirects but with no redirect"
-  time python "$ROOT_DIR/prune_pages_file.py" pages.txt.gz redirects.with_ids.txt.gz \
-    | pigz --fast > pages.pruned.txt.gz
+  time python "$ROOT_DIR/prune_pages_file.py" pages.txt.gz | pigz --fast > pages.pruned.txt.gz
 else
   echo "[WARN] Already pruned pages which are marked as redirects but with no redirect"
 fi
 if $DELETE_PROGRESSIVELY; then rm pages.txt.gz; fi
 
-#####################
-#  SORT LINKS FILE  #
-#####################
-if [ ! -f links.sorted_by_source_id.txt.gz ]; then
-  echo
-  echo "[INFO] Sorting links file by source page ID"
-  time pigz -dc links.with_ids.txt.gz \
-    | sort -S 80% -t $'\t' -k 1n,1n \
-    | uniq \
-    | pigz --fast > links.sorted_by_source_id.txt.gz.tmp
-  mv links.sorted_by_source_id.txt.gz.tmp links.sorted_by_source_id.txt.gz
-else
-  echo "[WARN] Already sorted links file by source page ID"
-fi
-
-if [ ! -f links.sorted_by_target_id.txt.gz ]; then
+######################
+#  GROUP LINKS FILE  #
+######################
+# Each line of the grouped files holds a page ID, the "|"-separated IDs of the pages it links to (or
+# which link to it), and their count. Both files are built in two passes over the links file,
+# without sorting it.
+if [ ! -f links.grouped_by_source_id.txt.gz ] || [ ! -f links.grouped_by_target_id.txt.gz ]; then
   echo
-  echo "[INFO] Sorting links file by target page ID"
-  time pigz -dc links.with_ids.txt.gz \
-    | sort -S 80% -t $'\t' -k 2n,2n \
-    | uniq \
-    | pigz --fast > links.sorted_by_target_id.txt.gz.tmp
-  mv links.sorted_by_target_id.txt.gz.tmp links.sorted_by_target_id.txt.gz
-else
-  echo "[WARN] Already sorted links file by target page ID"
-fi
-if $DELETE_PROGRESSIVELY; then rm links.with_ids.txt.gz; fi
-
-
-#############################
-#  GROUP SORTED LINKS FILE  #
-#############################
-if [ ! -f links.grouped_by_source_id.txt.gz ]; then
-  echo
-  echo "[INFO] Grouping source links file by source page ID"
-  time pigz -dc links.sorted_by_source_id.txt.gz \
-   | awk -F '\t' '$1==last {printf "|%s",$2; next} NR>1 {print "";} {last=$1; printf "%s\t%s",$1,$2;} END{print "";}' \
-   | pigz --fast > links.grouped_by_source_id.txt.gz.tmp
+  echo "[INFO] Grouping links file by source and target page ID"
+  time python "$ROOT_DIR/build_grouped_links_files.py" links.with_ids.txt.gz \
+    links.grouped_by_source_id.txt.gz.tmp links.grouped_by_target_id.txt.gz.tmp
   mv links.grouped_by_source_id.txt.gz.tmp links.grouped_by_source_id.txt.gz
+  mv links.grouped_by_target_id.txt.gz.tmp links.grouped_by_target_id.txt.gz
 else
-  echo "[WARN] Already grouped source links file by source page ID"
-fi
-if $DELETE_PROGRESSIVELY; then rm links.sorted_by_source_id.txt.gz; fi
-
-if [ ! -f links.grouped_by_target_id.txt.gz ]; then
-  echo
-  echo "[INFO] Grouping target links file by target page ID"
-  time pigz -dc links.sorted_by_target_id.txt.gz \
-    | awk -F '\t' '$2==last {printf "|%s",$1; next} NR>1 {print "";} {last=$2; printf "%s\t%s",$2,$1;} END{print "";}' \
-    | gzip > links.grouped_by_target_id.txt.gz
-else
-  echo "[WARN] Already grouped target links file by target page ID"
+  echo "[WARN] Already grouped links file by source and target page ID"
 fi
-if $DELETE_PROGRESSIVELY; then rm links.sorted_by_target_id.txt.gz; fi
+if $DELETE_PROGRESSIVELY; then rm links.with_ids.txt.gz; fi
 
 
 ################################
@@ -305,25 +240,45 @@ if $DELETE_PROGRESSIVELY; then rm links.grouped_by_source_id.txt.gz links.groupe
 ############################
 if [ ! -f sdow.sqlite ]; then
   echo
-  echo "[INFO] Creating redirects table"
-  time pigz -dc redirects.with_ids.txt.gz | sqlite3 sdow.sqlite ".read $ROOT_DIR/../sql/createRedirectsTable.sql"
-  if $DELETE_PROGRESSIVELY; then rm redirects.with_ids.txt.gz; fi
+  echo "[INFO] Creating redirects, pages, and links tables"
+  rm -f sdow.sqlite.tmp
+  # Each table is built into its own file in parallel, then copied into the database
+  time python "$ROOT_DIR/load_sdow_database.py" sdow.sqlite.tmp redirects.with_ids.txt.gz \
+    pages.pruned.txt.gz links.with_counts.txt.gz $LINKS_FORMAT 3
+  mv sdow.sqlite.tmp sdow.sqlite
+  if $DELETE_PROGRESSIVELY; then rm redirects.with_ids.txt.gz pages.pruned.txt.gz links.with_counts.txt.gz; fi
 
   echo
-  echo "[INFO] Creating pages table"
-  time pigz -dc pages.pruned.txt.gz | sqlite3 sdow.sqlite ".read $ROOT_DIR/../sql/createPagesTable.sql"
-  if $DELETE_PROGRESSIVELY; then rm pages.pruned.txt.gz; fi
+  echo "[INFO] Compressing SQLite file"
+  time pigz --best --keep sdow.sqlite
+else
+  echo "[WARN] Already created SQLite database"
+fi
 
+
+########################
+#  CREATE GRAPH FILES  #
+########################
+if [ ! -d graph ]; then
   echo
-  echo "[INFO] Creating links table"
-  time pigz -dc links.with_counts.txt.gz | sqlite3 sdow.sqlite ".read $ROOT_DIR/../sql/createLinksTable.sql"
-  if $DELETE_PROGRESSIVELY; then rm links.with_counts.txt.gz; fi
+  echo "[INFO] Creating memory-mapped graph files"
+  time python "$ROOT_DIR/build_graph_files.py" sdow.sqlite graph.tmp
 
   echo
-  echo "[INFO] Compressing SQLite file"
-  time pigz --best --keep sdow.sqlite
+  echo "[INFO] Creating landmark distance index"
+  time python "$ROOT_DIR/build_landmark_files.py" sdow.sqlite graph.tmp
+
+  echo
+  echo "[INFO] Creating reachability index"
+  time python "$ROOT_DIR/build_component_files.py" graph.tmp
+
+  echo
+  echo "[INFO] Creating title index"
+  time python "$ROOT_DIR/build_title_files.py" sdow.sqlite graph.tmp
+
+  mv graph.tmp graph
 else
-  echo "[WARN] Already created SQLite database"
+  echo "[WARN] Already created memory-mapped graph files"
 fi
 
 
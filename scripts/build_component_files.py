@@ -0,0 +1,203 @@
+"""
+Writes a reachability index into the graph directory written by build_graph_files.py.
+
+The strongly connected components of the link graph are numbered in reverse topological order, so
+a page can only reach pages whose component ID is less than or equal to its own. Each component is
+also flagged according to whether it can reach, or be reached from, the largest component, and the
+full set of components reachable from each small component outside of it is stored when it is
+small enough. Four files are written:
+  - components.ids: little-endian int32 component ID of each page, indexed by page ID.
+  - components.flags: uint8 flags of each component, indexed by component ID.
+  - components.descendants_offsets: little-endian int64 offsets into the descendants file, indexed
+    by component ID, with one trailing entry.
+  - components.descendants: little-endian int32 sorted IDs of the components reachable from each
+    component which has the HAS_DESCENDANTS flag.
+"""
+
+import os
+import sys
+import mmap
+from array import array
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import connected_components
+
+# Component flags.
+REACHES_LARGEST_COMPONENT = 1
+REACHED_BY_LARGEST_COMPONENT = 2
+HAS_DESCENDANTS = 4
+
+# Maximum number of descendant components stored per component.
+MAX_DESCENDANTS_COUNT = 64
+
+# Validate input arguments.
+if len(sys.argv) < 2:
+  print('[ERROR] Not enough arguments provided!')
+  print('[INFO] Usage: {0} <graph_directory>'.format(sys.argv[0]))
+  sys.exit()
+
+GRAPH_DIRECTORY = sys.argv[1]
+
+if not os.path.isdir(GRAPH_DIRECTORY):
+  print('[ERROR] Specified graph directory "{0}" does not exist.'.format(GRAPH_DIRECTORY))
+  sys.exit()
+
+if sys.byteorder != 'little':
+  print('[ERROR] Graph files can only be read on little-endian machines.')
+  sys.exit()
+
+
+def load_mmapped_array(filename, typecode):
+  """Returns a read-only, memory-mapped view of the provided binary file."""
+  with open(filename, 'rb') as f:
+    if os.fstat(f.fileno()).st_size == 0:
+      return memoryview(b'').cast(typecode)
+    return memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)).cast(typecode)
+
+
+def get_component_ids(offsets, neighbors, pages_count):
+  """Returns the strongly connected component ID of every page, and the number of components.
+
+  Components are found by SciPy, whose labels are in no particular order, and then numbered in a
+  reverse topological order of the condensed graph with Kahn's algorithm: components without links
+  to other components come first, followed by each level of components whose links only go to
+  components which are already numbered.
+  """
+  links_matrix = csr_matrix(
+      (np.ones(len(neighbors), dtype=np.int8), np.frombuffer(neighbors, dtype=np.int32),
+       np.frombuffer(offsets, dtype=np.int64)), shape=(pages_count, pages_count))
+  components_count, component_labels = connected_components(
+      links_matrix, directed=True, connection='strong')
+  del links_matrix
+
+  component_labels = component_labels.astype(np.int32)
+  source_labels, target_labels = get_component_links(offsets, neighbors, component_labels)
+
+  # Group the links between components by target, to find the components linking to each level.
+  remaining_links_counts = np.bincount(source_labels, minlength=components_count)
+  order = np.argsort(target_labels, kind='stable')
+  linking_labels = source_labels[order]
+  linking_offsets = np.searchsorted(target_labels[order], np.arange(components_count + 1))
+  del source_labels, target_labels, order
+
+  component_ids_by_label = np.empty(components_count, dtype=np.int32)
+  next_component_id = 0
+  level_labels = np.flatnonzero(remaining_links_counts == 0)
+  while len(level_labels) != 0:
+    component_ids_by_label[level_labels] = np.arange(
+        next_component_id, next_component_id + len(level_labels))
+    next_component_id += len(level_labels)
+
+    links_counts = linking_offsets[level_labels + 1] - linking_offsets[level_labels]
+    links_positions = np.arange(links_counts.sum()) + np.repeat(
+        linking_offsets[level_labels] - (np.cumsum(links_counts) - links_counts), links_counts)
+
+    # Components are numbered once all of their links go to components which are numbered.
+    linking_level_labels, level_links_counts = np.unique(
+        linking_labels[links_positions], return_counts=True)
+    remaining_links_counts[linking_level_labels] -= level_links_counts
+    level_labels = linking_level_labels[remaining_links_counts[linking_level_labels] == 0]
+
+  return (component_ids_by_label[component_labels], components_count)
+
+
+def get_component_links(offsets, neighbors, component_ids):
+  """Returns the distinct links between different components, sorted by source component."""
+  offsets = np.frombuffer(offsets, dtype=np.int64)
+  neighbors = np.frombuffer(neighbors, dtype=np.int32)
+
+  source_component_ids = np.repeat(component_ids, np.diff(offsets)).astype(np.int64)
+  target_component_ids = component_ids[neighbors].astype(np.int64)
+
+  is_between_components = source_component_ids != target_component_ids
+  component_links = np.unique((source_component_ids[is_between_components] << 32) |
+                              target_component_ids[is_between_components])
+
+  return ((component_links >> 32).astype(np.int32), (component_links & 0xFFFFFFFF).astype(np.int32))
+
+
+outgoing_offsets = load_mmapped_array(os.path.join(GRAPH_DIRECTORY, 'outgoing_links.offsets'), 'q')
+outgoing_neighbors = load_mmapped_array(
+    os.path.join(GRAPH_DIRECTORY, 'outgoing_links.neighbors'), 'i')
+
+pages_count = len(outgoing_offsets) - 1
+
+print('[INFO] Finding strongly connected components of {0} pages'.format(pages_count))
+component_ids, components_count = get_component_ids(
+    outgoing_offsets, outgoing_neighbors, pages_count)
+
+largest_component_id = int(np.bincount(component_ids).argmax())
+
+# Condense the graph into links between components. Every link goes from a component to one with a
+# smaller ID.
+source_component_ids, target_component_ids = get_component_links(
+    outgoing_offsets, outgoing_neighbors, component_ids)
+component_links_offsets = np.searchsorted(source_component_ids, np.arange(components_count + 1))
+del source_component_ids
+
+# Most page IDs belong to no page, or to a page without links, so most components have no links to
+# other components and no descendants. Those are flagged here at once, and only the components with
+# links are walked one at a time below.
+component_links_counts = np.diff(component_links_offsets)
+flags = np.where(component_links_counts == 0, HAS_DESCENDANTS, 0).astype(np.uint8)
+flags[largest_component_id] = REACHES_LARGEST_COMPONENT | REACHED_BY_LARGEST_COMPONENT
+flags = bytearray(flags.tobytes())
+
+linking_component_ids = np.flatnonzero(component_links_counts)
+linking_components = list(zip(linking_component_ids.tolist(),
+                              component_links_offsets[linking_component_ids].tolist(),
+                              component_links_offsets[linking_component_ids + 1].tolist()))
+target_component_ids = target_component_ids.tolist()
+del component_links_counts, component_links_offsets, linking_component_ids
+
+# Descendants of the components with links which have the HAS_DESCENDANTS flag. Other components
+# with that flag have no links, and so no descendants.
+descendants = {}
+
+# Walk the components in topological order, flagging those reached by the largest component.
+for component_id, links_start, links_end in reversed(linking_components):
+  if flags[component_id] & REACHED_BY_LARGEST_COMPONENT:
+    for target_component_id in target_component_ids[links_start:links_end]:
+      flags[target_component_id] |= REACHED_BY_LARGEST_COMPONENT
+
+# Walk the components in reverse topological order, flagging those which reach the largest
+# component and collecting the descendants of those which do not.
+for component_id, links_start, links_end in linking_components:
+  current_descendants = set()
+  is_descendants_count_known = True
+
+  for target_component_id in target_component_ids[links_start:links_end]:
+    if flags[target_component_id] & REACHES_LARGEST_COMPONENT:
+      flags[component_id] |= REACHES_LARGEST_COMPONENT
+
+    if is_descendants_count_known and flags[target_component_id] & HAS_DESCENDANTS:
+      current_descendants.add(target_component_id)
+      current_descendants.update(descendants.get(target_component_id, ()))
+      if len(current_descendants) > MAX_DESCENDANTS_COUNT:
+        is_descendants_count_known = False
+    else:
+      is_descendants_count_known = False
+
+  if not flags[component_id] & REACHES_LARGEST_COMPONENT and is_descendants_count_known:
+    flags[component_id] |= HAS_DESCENDANTS
+    descendants[component_id] = sorted(current_descendants)
+
+# Write the index files.
+component_ids.astype('<i4').tofile(os.path.join(GRAPH_DIRECTORY, 'components.ids'))
+
+with open(os.path.join(GRAPH_DIRECTORY, 'components.flags'), 'wb') as flags_file:
+  flags_file.write(flags)
+
+descendants_offsets = np.zeros(components_count + 1, dtype=np.int64)
+for component_id, component_descendants in descendants.items():
+  descendants_offsets[component_id + 1] = len(component_descendants)
+np.cumsum(descendants_offsets).astype('<i8').tofile(
+    os.path.join(GRAPH_DIRECTORY, 'components.descendants_offsets'))
+
+with open(os.path.join(GRAPH_DIRECTORY, 'components.descendants'), 'wb') as descendants_file:
+  for component_id in sorted(descendants):
+    array('i', descendants[component_id]).tofile(descendants_file)
+
+print('[INFO] Wrote {0} components, the largest of which has {1} pages, to {2}'.format(
+    components_count, int((component_ids == largest_component_id).sum()), GRAPH_DIRECTORY))
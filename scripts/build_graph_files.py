@@ -0,0 +1,83 @@
+"""
+Writes the outgoing and incoming links of the links table as memory-mappable compressed sparse row
+(CSR) files which can be searched without querying SQLite.
+
+For each link direction, two files are written to the output directory:
+  - <direction>.offsets: little-endian int64 offsets, indexed by page ID, with one trailing entry.
+    The links of page ID i are stored between offsets[i] and offsets[i + 1].
+  - <direction>.neighbors: little-endian int32 page IDs of the linked pages.
+"""
+
+import os
+import sys
+import sqlite3
+from array import array
+
+# Validate input arguments.
+if len(sys.argv) < 3:
+  print('[ERROR] Not enough arguments provided!')
+  print('[INFO] Usage: {0} <sdow_database> <output_directory>'.format(sys.argv[0]))
+  sys.exit()
+
+SDOW_DATABASE = sys.argv[1]
+OUTPUT_DIRECTORY = sys.argv[2]
+
+if not os.path.isfile(SDOW_DATABASE):
+  print('[ERROR] Specified SQLite file "{0}" does not exist.'.format(SDOW_DATABASE))
+  sys.exit()
+
+os.makedirs(OUTPUT_DIRECTORY, exist_ok=True)
+
+
+def to_little_endian(values):
+  """Byte swaps the provided array in place on big-endian machines and returns it."""
+  if sys.byteorder != 'little':
+    values.byteswap()
+  return values
+
+
+def write_links_files(outgoing_or_incoming_links):
+  """Streams one links column of the links table, ordered by page ID, into its offsets and
+  neighbors files."""
+  conn = sqlite3.connect(SDOW_DATABASE)
+  cursor = conn.cursor()
+  cursor.arraysize = 1000
+
+  # There is no need to escape the query parameters here since they are never user-defined.
+  cursor.execute('SELECT id, {0} FROM links ORDER BY id;'.format(outgoing_or_incoming_links))
+
+  offsets_filename = os.path.join(OUTPUT_DIRECTORY, outgoing_or_incoming_links + '.offsets')
+  neighbors_filename = os.path.join(OUTPUT_DIRECTORY, outgoing_or_incoming_links + '.neighbors')
+
+  with open(offsets_filename, 'wb') as offsets_file, \
+      open(neighbors_filename, 'wb') as neighbors_file:
+    next_page_id = 0
+    current_offset = 0
+
+    for page_id, links in cursor:
+      # Pages without a row in the links table have no links, so their offsets span nothing.
+      to_little_endian(array('q', [current_offset]) * (page_id - next_page_id + 1)).tofile(
+          offsets_file)
+      next_page_id = page_id + 1
+
+      if isinstance(links, bytes):
+        # BLOB link columns are already packed little-endian int32 page IDs.
+        neighbors_file.write(links)
+        current_offset += len(links) // 4
+        continue
+
+      neighbors = array('i', [int(linked_id) for linked_id in links.split('|') if linked_id])
+      to_little_endian(neighbors).tofile(neighbors_file)
+      current_offset += len(neighbors)
+
+    # Write the trailing end offset of the last page.
+    to_little_endian(array('q', [current_offset])).tofile(offsets_file)
+
+  conn.close()
+
+  print('[INFO] Wrote {0} {1} to {2}'.format(current_offset, outgoing_or_incoming_links.replace(
+      '_', ' '), OUTPUT_DIRECTORY))
+
+
+write_links_files('outgoing_links')
+write_links_files('incoming_links')
@@ -0,0 +1,163 @@
+"""
+Groups the links file by source page ID and by target page ID in two passes over it, without
+sorting it.
+
+The first pass counts the outgoing and incoming links of each page, which gives the offset of each
+page's links in a compressed sparse row (CSR) array of each direction. The second pass scatters
+every link into both arrays, which are memory-mapped next to the output files. Each page's links
+are then sorted and deduplicated, and written out one line per page in page ID order, as
+"<page_id>\t<links>\t<links_count>", where links are "|"-separated page IDs.
+"""
+
+import io
+import os
+import sys
+import gzip
+
+import numpy as np
+
+# Approximate number of bytes of the links file parsed at once.
+BLOCK_SIZE_BYTES = 16 * 1024 * 1024
+
+# Approximate number of links sorted and written out at once.
+WRITE_CHUNK_LINKS_COUNT = 16 * 1024 * 1024
+
+# Validate input arguments.
+if len(sys.argv) < 4:
+  print('[ERROR] Not enough arguments provided!')
+  print('[INFO] Usage: {0} <links_file> <outgoing_links_file> <incoming_links_file>'.format(
+      sys.argv[0]))
+  sys.exit()
+
+LINKS_FILE = sys.argv[1]
+OUTGOING_LINKS_FILE = sys.argv[2]
+INCOMING_LINKS_FILE = sys.argv[3]
+
+for filename in [LINKS_FILE, OUTGOING_LINKS_FILE, INCOMING_LINKS_FILE]:
+  if not filename.endswith('.gz'):
+    print('[ERROR] File "{0}" must be gzipped.'.format(filename))
+    sys.exit()
+
+
+def iter_link_blocks(filename):
+  """Yields the source and target page IDs of the gzipped links file in blocks of links."""
+  with gzip.open(filename, 'rb') as f:
+    while True:
+      block = f.read(BLOCK_SIZE_BYTES)
+      if not block:
+        return
+      # Extend each block to the end of its last line.
+      links = np.loadtxt(io.BytesIO(block + f.readline()), dtype=np.int64, delimiter='\t',
+                         ndmin=2).reshape(-1, 2)
+      yield (links[:, 0], links[:, 1])
+
+
+def add_links_counts(links_counts, page_ids):
+  """Returns the provided links counts, grown if needed, with one more link for each page ID."""
+  page_links_counts = np.bincount(page_ids)
+  if len(page_links_counts) > len(links_counts):
+    links_counts = np.concatenate(
+        [links_counts, np.zeros(len(page_links_counts) - len(links_counts), dtype=np.int64)])
+  links_counts[:len(page_links_counts)] += page_links_counts
+  return links_counts
+
+
+def scatter_links(page_ids, linked_page_ids, next_offsets, neighbors):
+  """Writes each linked page ID at the next free offset of its page's links."""
+  order = np.argsort(page_ids, kind='stable')
+  page_ids = page_ids[order]
+
+  # Links of the same page go to consecutive offsets, in the order in which they were read.
+  ranks = np.arange(len(page_ids)) - np.searchsorted(page_ids, page_ids)
+  neighbors[next_offsets[page_ids] + ranks] = linked_page_ids[order]
+
+  unique_page_ids, page_links_counts = np.unique(page_ids, return_counts=True)
+  next_offsets[unique_page_ids] += page_links_counts
+
+
+def write_grouped_links(filename, offsets, neighbors):
+  """Writes the sorted, distinct links of each page with links to the provided gzipped file."""
+  pages_count = len(offsets) - 1
+  with gzip.open(filename, 'wb', compresslevel=1) as f:
+    start_page_id = 0
+    while start_page_id < pages_count:
+      # Write out at least one page at a time, however many links it has.
+      end_page_id = int(np.searchsorted(
+          offsets, offsets[start_page_id] + WRITE_CHUNK_LINKS_COUNT, side='right')) - 1
+      end_page_id = min(max(end_page_id, start_page_id + 1), pages_count)
+
+      # Sort and deduplicate the links of the chunk's pages at once.
+      start_offset = offsets[start_page_id]
+      links = np.unique(
+          (np.repeat(np.arange(end_page_id - start_page_id, dtype=np.int64),
+                     np.diff(offsets[start_page_id:end_page_id + 1])) << 32) |
+          neighbors[start_offset:offsets[end_page_id]].astype(np.int64))
+
+      page_offsets = np.searchsorted(
+          links >> 32, np.arange(end_page_id - start_page_id + 1)).tolist()
+      linked_page_ids = [str(page_id) for page_id in (links & 0xFFFFFFFF).tolist()]
+
+      lines = []
+      for i in range(end_page_id - start_page_id):
+        if page_offsets[i] != page_offsets[i + 1]:
+          lines.append('{0}\t{1}\t{2}\n'.format(
+              start_page_id + i, '|'.join(linked_page_ids[page_offsets[i]:page_offsets[i + 1]]),
+              page_offsets[i + 1] - page_offsets[i]))
+      f.write(''.join(lines).encode())
+
+      start_page_id = end_page_id
+
+
+# First pass: count the outgoing and incoming links of each page.
+outgoing_links_counts = np.zeros(0, dtype=np.int64)
+incoming_links_counts = np.zeros(0, dtype=np.int64)
+for source_page_ids, target_page_ids in iter_link_blocks(LINKS_FILE):
+  outgoing_links_counts = add_links_counts(outgoing_links_counts, source_page_ids)
+  incoming_links_counts = add_links_counts(incoming_links_counts, target_page_ids)
+
+pages_count = max(len(outgoing_links_counts), len(incoming_links_counts))
+links_count = int(outgoing_links_counts.sum())
+
+print('[INFO] Counted {0} links between {1} page IDs'.format(links_count, pages_count))
+
+# Turn the counts into the offsets of each page's links in the CSR arrays.
+outgoing_offsets = np.zeros(pages_count + 1, dtype=np.int64)
+np.cumsum(outgoing_links_counts, out=outgoing_offsets[1:len(outgoing_links_counts) + 1])
+outgoing_offsets[len(outgoing_links_counts) + 1:] = links_count
+
+incoming_offsets = np.zeros(pages_count + 1, dtype=np.int64)
+np.cumsum(incoming_links_counts, out=incoming_offsets[1:len(incoming_links_counts) + 1])
+incoming_offsets[len(incoming_links_counts) + 1:] = links_count
+
+del outgoing_links_counts, incoming_links_counts
+
+outgoing_neighbors_filename = OUTGOING_LINKS_FILE + '.neighbors.tmp'
+incoming_neighbors_filename = INCOMING_LINKS_FILE + '.neighbors.tmp'
+
+try:
+  # Memory-mapped arrays cannot be empty.
+  outgoing_neighbors = np.memmap(
+      outgoing_neighbors_filename, dtype=np.int32, mode='w+', shape=(max(links_count, 1),))
+  incoming_neighbors = np.memmap(
+      incoming_neighbors_filename, dtype=np.int32, mode='w+', shape=(max(links_count, 1),))
+
+  # Second pass: scatter every link into the CSR arrays of both directions.
+  next_outgoing_offsets = outgoing_offsets[:-1].copy()
+  next_incoming_offsets = incoming_offsets[:-1].copy()
+  for source_page_ids, target_page_ids in iter_link_blocks(LINKS_FILE):
+    scatter_links(source_page_ids, target_page_ids, next_outgoing_offsets, outgoing_neighbors)
+    scatter_links(target_page_ids, source_page_ids, next_incoming_offsets, incoming_neighbors)
+
+  del next_outgoing_offsets, next_incoming_offsets
+
+  print('[INFO] Writing outgoing links to {0}'.format(OUTGOING_LINKS_FILE))
+  write_grouped_links(OUTGOING_LINKS_FILE, outgoing_offsets, outgoing_neighbors)
+
+  print('[INFO] Writing incoming links to {0}'.format(INCOMING_LINKS_FILE))
+  write_grouped_links(INCOMING_LINKS_FILE, incoming_offsets, incoming_neighbors)
+
+  del outgoing_neighbors, incoming_neighbors
+finally:
+  for filename in [outgoing_neighbors_filename, incoming_neighbors_filename]:
+    if os.path.exists(filename):
+      os.remove(filename)
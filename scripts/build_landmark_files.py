@@ -0,0 +1,130 @@
+"""
+Writes a landmark distance index into the graph directory written by build_graph_files.py.
+
+A few dozen of the most linked pages are picked as landmarks. A full breadth-first search from and
+to each of them records the number of degrees between every page and every landmark. The server
+combines those distances through the triangle inequality to bound the number of degrees between
+any two pages. Three files are written:
+  - landmarks.ids: little-endian int32 page IDs of the landmarks.
+  - landmarks.forward_distances: uint8 distances from each landmark to each page, stored as one
+    row of landmarks per page ID. 255 means the page cannot be reached from the landmark.
+  - landmarks.backward_distances: uint8 distances from each page to each landmark, stored the same
+    way. 255 means the landmark cannot be reached from the page.
+"""
+
+import os
+import sys
+import sqlite3
+
+import numpy as np
+
+# Distance stored for pages which are not reachable.
+UNREACHABLE_DISTANCE = 255
+
+# Validate input arguments.
+if len(sys.argv) < 3:
+  print('[ERROR] Not enough arguments provided!')
+  print('[INFO] Usage: {0} <sdow_database> <graph_directory> [<landmarks_count>]'.format(
+      sys.argv[0]))
+  sys.exit()
+
+SDOW_DATABASE = sys.argv[1]
+GRAPH_DIRECTORY = sys.argv[2]
+LANDMARKS_COUNT = int(sys.argv[3]) if len(sys.argv) > 3 else 32
+
+if not os.path.isfile(SDOW_DATABASE):
+  print('[ERROR] Specified SQLite file "{0}" does not exist.'.format(SDOW_DATABASE))
+  sys.exit()
+
+if not os.path.isdir(GRAPH_DIRECTORY):
+  print('[ERROR] Specified graph directory "{0}" does not exist.'.format(GRAPH_DIRECTORY))
+  sys.exit()
+
+
+def load_links_arrays(outgoing_or_incoming_links):
+  """Returns the memory-mapped offsets and neighbors arrays of one link direction."""
+  offsets = np.memmap(os.path.join(GRAPH_DIRECTORY, outgoing_or_incoming_links + '.offsets'),
+                      dtype='<i8', mode='r')
+
+  neighbors_filename = os.path.join(GRAPH_DIRECTORY, outgoing_or_incoming_links + '.neighbors')
+  if os.path.getsize(neighbors_filename) == 0:
+    neighbors = np.empty(0, dtype='<i4')
+  else:
+    neighbors = np.memmap(neighbors_filename, dtype='<i4', mode='r')
+
+  return (offsets, neighbors)
+
+
+def remove_landmark_files():
+  """Removes any landmark files written so far, so an incomplete index is never used."""
+  for filename in ['landmarks.ids', 'landmarks.forward_distances', 'landmarks.backward_distances']:
+    if os.path.exists(os.path.join(GRAPH_DIRECTORY, filename)):
+      os.remove(os.path.join(GRAPH_DIRECTORY, filename))
+
+
+def get_landmark_distances(landmark_page_id, offsets, neighbors, pages_count):
+  """Runs a level-synchronous breadth-first search from the provided landmark and returns the
+  distance to every page."""
+  distances = np.full(pages_count, UNREACHABLE_DISTANCE, dtype=np.uint8)
+  distances[landmark_page_id] = 0
+
+  frontier = np.array([landmark_page_id], dtype=np.int64)
+  depth = 0
+
+  while len(frontier) != 0:
+    depth += 1
+    if depth >= UNREACHABLE_DISTANCE:
+      print('[ERROR] Page {0} is too many degrees away from another page.'.format(
+          landmark_page_id))
+      remove_landmark_files()
+      sys.exit(1)
+
+    # Gather the neighbors of every page in the frontier without looping over the pages.
+    start_offsets = offsets[frontier]
+    links_counts = offsets[frontier + 1] - start_offsets
+    level_start_offsets = np.cumsum(links_counts) - links_counts
+    neighbor_indices = np.repeat(start_offsets - level_start_offsets, links_counts) + np.arange(
+        int(links_counts.sum()), dtype=np.int64)
+
+    linked_page_ids = neighbors[neighbor_indices]
+    frontier = np.unique(linked_page_ids[distances[linked_page_ids] == UNREACHABLE_DISTANCE])
+    distances[frontier] = depth
+
+  return distances
+
+
+def write_distances_file(filename, landmark_page_ids, offsets, neighbors, pages_count):
+  """Writes the distances between every landmark and every page in one direction."""
+  distances = np.memmap(filename, dtype=np.uint8, mode='w+',
+                        shape=(pages_count, len(landmark_page_ids)))
+
+  for i, landmark_page_id in enumerate(landmark_page_ids):
+    distances[:, i] = get_landmark_distances(landmark_page_id, offsets, neighbors, pages_count)
+
+  distances.flush()
+  del distances
+
+
+# Pick the pages with the most links as landmarks, since most shortest paths pass near them.
+conn = sqlite3.connect(SDOW_DATABASE)
+landmark_page_ids = [row[0] for row in conn.execute(
+    'SELECT id FROM links ORDER BY outgoing_links_count + incoming_links_count DESC LIMIT ?;',
+    (LANDMARKS_COUNT,))]
+conn.close()
+
+outgoing_offsets, outgoing_neighbors = load_links_arrays('outgoing_links')
+incoming_offsets, incoming_neighbors = load_links_arrays('incoming_links')
+
+pages_count = len(outgoing_offsets) - 1
+
+np.array(landmark_page_ids, dtype='<i4').tofile(os.path.join(GRAPH_DIRECTORY, 'landmarks.ids'))
+
+# Searching forward from a landmark yields its distance to each page, and searching backward yields
+# each page's distance to it.
+write_distances_file(os.path.join(GRAPH_DIRECTORY, 'landmarks.forward_distances'),
+                     landmark_page_ids, outgoing_offsets, outgoing_neighbors, pages_count)
+write_distances_file(os.path.join(GRAPH_DIRECTORY, 'landmarks.backward_distances'),
+                     landmark_page_ids, incoming_offsets, incoming_neighbors, pages_count)
+
+print('[INFO] Wrote distances to and from {0} landmarks to {1}'.format(
+    len(landmark_page_ids), GRAPH_DIRECTORY))
@@ -0,0 +1,204 @@
+"""
+Writes a title index into the graph directory written by build_graph_files.py, which resolves page
+titles to non-redirect pages and looks up titles by prefix without querying SQLite.
+
+Every page title is stored in case-insensitive order, using the same ASCII-only case folding as
+SQLite's NOCASE collation, with ties broken by page ID. Seven files are written:
+  - titles.data: UTF-8 page titles, concatenated.
+  - titles.offsets: little-endian int64 offsets into the titles data, with one trailing entry.
+  - titles.page_ids: little-endian int32 page ID of each title.
+  - titles.resolved_indices: little-endian int32 index of the title of the non-redirect page each
+    title resolves to, which is its own index for non-redirect pages, or -1 for broken redirects.
+  - titles.ranks: little-endian int32 incoming links count of the page each title resolves to.
+  - titles.suggestion_ranges: little-endian int64 "<start_index> << 32 | <end_index>" range of the
+    titles matching each prefix which matches too many titles to rank them when suggesting, sorted.
+  - titles.suggestions: little-endian int32 indices of the resolved titles of the most linked pages
+    matching each of those prefixes, most linked first, in rows of a fixed size padded with -1.
+"""
+
+import os
+import sys
+import sqlite3
+from array import array
+
+import numpy as np
+
+# Number of titles matching a prefix above which its suggestions are precomputed. Must match
+# MAX_SUGGESTION_CANDIDATES in sdow/titles.py.
+MAX_SUGGESTION_CANDIDATES = 1000
+
+# Number of suggestions precomputed per prefix, which must be at least the server's maximum limit.
+PRECOMPUTED_SUGGESTIONS_COUNT = 50
+
+# Validate input arguments.
+if len(sys.argv) < 3:
+  print('[ERROR] Not enough arguments provided!')
+  print('[INFO] Usage: {0} <sdow_database> <graph_directory>'.format(sys.argv[0]))
+  sys.exit()
+
+SDOW_DATABASE = sys.argv[1]
+GRAPH_DIRECTORY = sys.argv[2]
+
+if not os.path.isfile(SDOW_DATABASE):
+  print('[ERROR] Specified SQLite file "{0}" does not exist.'.format(SDOW_DATABASE))
+  sys.exit()
+
+if not os.path.isdir(GRAPH_DIRECTORY):
+  print('[ERROR] Specified graph directory "{0}" does not exist.'.format(GRAPH_DIRECTORY))
+  sys.exit()
+
+
+def get_ranges_indices(start_indices, end_indices):
+  """Returns the ID of the range of, and the index of, every title in the provided ranges."""
+  sizes = end_indices - start_indices
+  range_ids = np.repeat(np.arange(len(sizes)), sizes)
+  indices = np.arange(sizes.sum()) + np.repeat(start_indices - (np.cumsum(sizes) - sizes), sizes)
+  return (range_ids, indices)
+
+
+def get_child_ranges(start_indices, end_indices, key_length):
+  """Splits the provided ranges of titles, whose keys share a prefix of the provided length, into
+  the ranges of titles whose keys share one more byte."""
+  range_ids, indices = get_ranges_indices(start_indices, end_indices)
+
+  # Titles whose key is the prefix itself have no next byte, and come first in their range.
+  has_next_byte = offsets[indices + 1] - offsets[indices] > key_length
+  next_bytes = np.full(len(indices), -1, dtype=np.int16)
+  next_bytes[has_next_byte] = data[offsets[indices[has_next_byte]] + key_length]
+
+  # Fold ASCII letters to lower case, like get_title_key() in sdow/titles.py.
+  is_upper_case = (next_bytes >= ord('A')) & (next_bytes <= ord('Z'))
+  next_bytes[is_upper_case] += ord('a') - ord('A')
+
+  is_first = np.ones(len(indices), dtype=bool)
+  is_first[1:] = (range_ids[1:] != range_ids[:-1]) | (next_bytes[1:] != next_bytes[:-1])
+  first_positions = np.flatnonzero(is_first)
+  last_positions = np.append(first_positions[1:], len(indices)) - 1
+
+  has_prefix = next_bytes[first_positions] != -1
+  return (indices[first_positions][has_prefix], indices[last_positions][has_prefix] + 1)
+
+
+def get_ranges_suggestions(start_indices, end_indices):
+  """Returns one row per provided range of titles with the indices of the resolved titles of its
+  most linked pages, ranked like TitleIndex.fetch_page_suggestions() does, padded with -1."""
+  range_ids, indices = get_ranges_indices(start_indices, end_indices)
+
+  is_resolved = resolved_indices[indices] != -1
+  range_ids = range_ids[is_resolved]
+  indices = indices[is_resolved]
+
+  # Most linked first, with ties broken by the first title which resolves to each page.
+  order = np.lexsort((indices, -ranks[indices].astype(np.int64), range_ids))
+  range_ids = range_ids[order]
+  suggested_indices = resolved_indices[indices[order]]
+
+  _, first_positions = np.unique(range_ids.astype(np.int64) * len(page_ids) + suggested_indices,
+                                 return_index=True)
+  first_positions.sort()
+  range_ids = range_ids[first_positions]
+  suggested_indices = suggested_indices[first_positions]
+
+  columns = np.arange(len(range_ids)) - np.searchsorted(range_ids, range_ids)
+  is_kept = columns < PRECOMPUTED_SUGGESTIONS_COUNT
+
+  suggestions = np.full((len(start_indices), PRECOMPUTED_SUGGESTIONS_COUNT), -1, dtype=np.int32)
+  suggestions[range_ids[is_kept], columns[is_kept]] = suggested_indices[is_kept]
+  return suggestions
+
+
+conn = sqlite3.connect(SDOW_DATABASE)
+cursor = conn.cursor()
+cursor.arraysize = 1000
+
+# Stream the titles in index order, along with the page each redirect points to.
+cursor.execute('SELECT id, title, is_redirect, target_id FROM pages LEFT JOIN redirects '
+               'ON source_id = id ORDER BY title COLLATE NOCASE, id;')
+
+page_ids = array('i')
+resolved_page_ids = array('i')
+
+with open(os.path.join(GRAPH_DIRECTORY, 'titles.data'), 'wb') as data_file, \
+    open(os.path.join(GRAPH_DIRECTORY, 'titles.offsets'), 'wb') as offsets_file:
+  current_offset = 0
+
+  for page_id, title, is_redirect, redirect_target_page_id in cursor:
+    encoded_title = title.encode('utf-8')
+
+    array('q', [current_offset]).tofile(offsets_file)
+    data_file.write(encoded_title)
+    current_offset += len(encoded_title)
+
+    page_ids.append(page_id)
+    if not is_redirect:
+      resolved_page_ids.append(page_id)
+    elif redirect_target_page_id is not None:
+      resolved_page_ids.append(redirect_target_page_id)
+    else:
+      # Redirects whose target is missing cannot be resolved.
+      resolved_page_ids.append(-1)
+
+  array('q', [current_offset]).tofile(offsets_file)
+
+# Convert each resolved page ID into the index of that page's title.
+page_ids = np.frombuffer(page_ids, dtype=np.int32)
+resolved_page_ids = np.frombuffer(resolved_page_ids, dtype=np.int32)
+
+max_page_id = int(max(page_ids.max(initial=0), resolved_page_ids.max(initial=0)))
+indices_by_page_id = np.full(max_page_id + 1, -1, dtype=np.int32)
+indices_by_page_id[page_ids] = np.arange(len(page_ids), dtype=np.int32)
+resolved_indices = np.where(resolved_page_ids == -1, -1, indices_by_page_id[resolved_page_ids])
+
+# Rank each title by the number of incoming links of the page it resolves to.
+incoming_links_counts = np.zeros(max_page_id + 1, dtype=np.int32)
+for page_id, incoming_links_count in conn.execute('SELECT id, incoming_links_count FROM links;'):
+  if page_id <= max_page_id:
+    incoming_links_counts[page_id] = incoming_links_count
+
+ranks = np.where(resolved_indices == -1, 0, incoming_links_counts[resolved_page_ids])
+
+conn.close()
+
+page_ids.astype('<i4').tofile(os.path.join(GRAPH_DIRECTORY, 'titles.page_ids'))
+resolved_indices.astype('<i4').tofile(os.path.join(GRAPH_DIRECTORY, 'titles.resolved_indices'))
+ranks.astype('<i4').tofile(os.path.join(GRAPH_DIRECTORY, 'titles.ranks'))
+
+# Precompute the suggestions of every prefix which matches too many titles to rank them all. Since
+# titles are sorted by key, the titles matching a prefix are a range, which is split by the next
+# byte of their keys until every range is small enough.
+data = np.fromfile(os.path.join(GRAPH_DIRECTORY, 'titles.data'), dtype=np.uint8)
+offsets = np.fromfile(os.path.join(GRAPH_DIRECTORY, 'titles.offsets'), dtype='<i8')
+
+suggestion_ranges = []
+suggestions = []
+
+# The empty prefix matches every title, if there are any.
+start_indices = np.zeros(min(len(page_ids), 1), dtype=np.int64)
+end_indices = np.full(len(start_indices), len(page_ids), dtype=np.int64)
+parent_ranges = np.zeros(0, dtype=np.int64)
+key_length = 0
+while len(start_indices) != 0:
+  start_indices, end_indices = get_child_ranges(start_indices, end_indices, key_length)
+  key_length += 1
+
+  is_large = end_indices - start_indices > MAX_SUGGESTION_CANDIDATES
+  start_indices = start_indices[is_large]
+  end_indices = end_indices[is_large]
+
+  # A longer prefix matches the same titles as its parent if they all share its next byte.
+  ranges = (start_indices << 32) | end_indices
+  is_new = ~np.isin(ranges, parent_ranges)
+  suggestion_ranges.append(ranges[is_new])
+  suggestions.append(get_ranges_suggestions(start_indices[is_new], end_indices[is_new]))
+  parent_ranges = ranges
+
+suggestion_ranges = np.concatenate(suggestion_ranges)
+suggestions = np.concatenate(suggestions)
+
+order = np.argsort(suggestion_ranges)
+suggestion_ranges[order].astype('<i8').tofile(
+    os.path.join(GRAPH_DIRECTORY, 'titles.suggestion_ranges'))
+suggestions[order].astype('<i4').tofile(os.path.join(GRAPH_DIRECTORY, 'titles.suggestions'))
+
+print('[INFO] Wrote {0} titles and the suggestions of {1} prefixes to {2}'.format(
+    len(page_ids), len(suggestion_ranges), GRAPH_DIRECTORY))
@@ -1,16 +1,17 @@
 """
 Combines the incoming and outgoing links (as well as their counts) for each page.
 
+Both grouped links files are sorted by page ID, with one "<page_id>\t<links>\t<links_count>" line
+per page, so they are merged a line at a time and pages are written in page ID order.
+
 Output is written to stdout.
 """
 
-import io
 import sys
 import gzip
-from collections import defaultdict
 
 # Validate input arguments.
-if len(sys.argv) < 2:
+if len(sys.argv) < 3:
   print('[ERROR] Not enough arguments provided!')
   print('[INFO] Usage: {0} <outgoing_links_file> <incoming_links_file>'.format(sys.argv[0]))
   sys.exit()
@@ -26,29 +27,47 @@ if not INCOMING_LINKS_FILE.endswith('.gz'):
   print('[ERROR] Incoming links file must be gzipped.')
   sys.exit()
 
-# Create a dictionary of page IDs to their incoming and outgoing links.
-LINKS = defaultdict(lambda: defaultdict(str))
-# outgoing is [0], incoming is [1]
-for line in io.BufferedReader(gzip.open(OUTGOING_LINKS_FILE, 'rb')):
-  [source_page_id, target_page_ids] = line.rstrip(b'\n').split(b'\t')
-  LINKS[int(source_page_id)][0] = target_page_ids
 
-for line in io.BufferedReader(gzip.open(INCOMING_LINKS_FILE, 'rb')):
-  [target_page_id, source_page_ids] = line.rstrip(b'\n').split(b'\t')
-  LINKS[int(target_page_id)][1] = source_page_ids
+def iter_grouped_links(filename):
+  """Yields the page ID, links and links count of each line of a grouped links file."""
+  with gzip.open(filename, 'rb') as f:
+    for line in f:
+      [page_id, links, links_count] = line.rstrip(b'\n').split(b'\t')
+      yield (int(page_id), links, links_count)
+
+
+def iter_combined_links():
+  """Yields the page ID, outgoing links count, incoming links count, outgoing links and incoming
+  links of each page with links, in page ID order, by merging the two grouped links files."""
+  outgoing_links = iter_grouped_links(OUTGOING_LINKS_FILE)
+  incoming_links = iter_grouped_links(INCOMING_LINKS_FILE)
+
+  no_links = (float('inf'), b'', b'0')
+  current_outgoing_links = next(outgoing_links, no_links)
+  current_incoming_links = next(incoming_links, no_links)
+
+  while current_outgoing_links is not no_links or current_incoming_links is not no_links:
+    page_id = min(current_outgoing_links[0], current_incoming_links[0])
+
+    if current_outgoing_links[0] == page_id:
+      _, page_outgoing_links, outgoing_links_count = current_outgoing_links
+      current_outgoing_links = next(outgoing_links, no_links)
+    else:
+      page_outgoing_links, outgoing_links_count = (b'', b'0')
 
-# For each page in the links dictionary, print out its incoming and outgoing links as well as their
-# counts.
-for page_id, links in LINKS.items():
-  outgoing_links = links.get(0, b'')
-  outgoing_links_count = 0 if outgoing_links==b'' else len(
-      outgoing_links.split(b'|'))
+    if current_incoming_links[0] == page_id:
+      _, page_incoming_links, incoming_links_count = current_incoming_links
+      current_incoming_links = next(incoming_links, no_links)
+    else:
+      page_incoming_links, incoming_links_count = (b'', b'0')
 
-  incoming_links = links.get(1, b'')
-  incoming_links_count = 0 if incoming_links==b'' else len(
-      incoming_links.split(b'|'))
+    yield (page_id, outgoing_links_count, incoming_links_count, page_outgoing_links,
+           page_incoming_links)
 
-  columns = [str(page_id).encode(), str(outgoing_links_count).encode(), str(
-      incoming_links_count).encode(), outgoing_links, incoming_links]
 
-  print(b'\t'.join(columns).decode())
+# For each page, print out its incoming and outgoing links as well as their counts.
+for (page_id, outgoing_links_count, incoming_links_count, outgoing_links,
+     incoming_links) in iter_combined_links():
+  sys.stdout.buffer.write(b'\t'.join([str(page_id).encode(), outgoing_links_count,
+                                      incoming_links_count, outgoing_links,
+                                      incoming_links]) + b'\n')
@@ -1,5 +1,24 @@
+"""
+Creates the mock SDOW and searches databases used for local development.
+
+By default, the SDOW database contains a small hand-written graph of 35 pages. If a number of pages
+is provided, it instead contains a synthetic graph with a Wikipedia-like shape, which is useful to
+load test and benchmark the service without downloading and processing a Wikipedia dump:
+  - Pages are linked to with a Zipf-like popularity, so incoming links counts follow a power law.
+  - Outgoing links counts follow a log-normal distribution around the provided average.
+  - There are 1.5 redirects per page, each to a page picked by the same popularity.
+
+The synthetic graph is generated in chunks of pages, with the links of each chunk spilled to
+temporary shard files by source and by target page, so that memory use does not grow with the
+number of links. Each shard is then sorted and bulk inserted into the links table.
+"""
+
 import os
+import sys
+import math
+import shutil
 import sqlite3
+import tempfile
 import subprocess
 from collections import defaultdict
 
@@ -7,124 +26,382 @@ cwd = os.path.dirname(__file__)
 mock_sdow_database_filename = os.path.join(cwd, '../sdow/sdow.sqlite')
 mock_searches_database_filename = os.path.join(cwd, '../sdow/searches.sqlite')
 searches_database_sql_filename = os.path.join(cwd, '../sql/createSearchesTable.sql')
+links_blob_table_sql_filename = os.path.join(cwd, '../sql/createLinksBlobTable.sql')
 
-print('[INFO] Creating mock SDOW database: {0}'.format(mock_sdow_database_filename))
+# Seed of the synthetic graph, so that every run with the same arguments creates the same graph.
+SYNTHETIC_RANDOM_SEED = 2018
+
+# Average number of outgoing links per page, which is roughly that of English Wikipedia.
+DEFAULT_LINKS_PER_PAGE = 85
+
+# Number of redirects per page, which is roughly that of English Wikipedia.
+REDIRECTS_PER_PAGE = 1.5
+
+# Exponent of the Zipf-like popularity of pages. Incoming links counts then follow a power law
+# with an exponent of 1 + 1 / POPULARITY_EXPONENT.
+POPULARITY_EXPONENT = 0.8
+
+# Standard deviation of the logarithm of outgoing links counts.
+OUTGOING_LINKS_COUNT_SIGMA = 1.2
+
+# Number of pages whose links are generated at once.
+CHUNK_PAGES_COUNT = 10000
+
+# Approximate number of links held in memory while a shard is inserted.
+MAX_SHARD_LINKS_COUNT = 10000000
+
+# Number of rows inserted per executemany() call.
+INSERT_BATCH_SIZE = 10000
+
+# Validate input arguments.
+if len(sys.argv) > 1:
+  try:
+    SYNTHETIC_PAGES_COUNT = int(sys.argv[1])
+    LINKS_PER_PAGE = float(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_LINKS_PER_PAGE
+  except ValueError:
+    SYNTHETIC_PAGES_COUNT = LINKS_PER_PAGE = 0
+  LINKS_FORMAT = sys.argv[3] if len(sys.argv) > 3 else 'text'
+
+  if SYNTHETIC_PAGES_COUNT < 2 or LINKS_PER_PAGE <= 0 or LINKS_FORMAT not in ('text', 'blob'):
+    print('[ERROR] Invalid arguments provided!')
+    print('[INFO] Usage: {0} [<pages_count> [<links_per_page>] [text|blob]]'.format(sys.argv[0]))
+    sys.exit()
+
+  # NumPy is only needed to generate synthetic graphs.
+  import numpy as np
+else:
+  SYNTHETIC_PAGES_COUNT = None
+
+
+def get_popular_page_ids(rng, pages_count, samples_count):
+  """Returns page IDs drawn with a Zipf-like popularity.
+
+  Popularity ranks are drawn by inverting the cumulative distribution of a continuous power law
+  over [1, pages_count + 1), and are then scattered over the page IDs by a fixed permutation so
+  that popular pages are not all next to each other.
+  """
+  exponent = 1 - POPULARITY_EXPONENT
+  scale = (pages_count + 1) ** exponent - 1
+  ranks = np.floor((1 + rng.random(samples_count) * scale) ** (1 / exponent)).astype(np.int64)
+  np.clip(ranks, 1, pages_count, out=ranks)
+
+  return ((ranks - 1) * get_permutation_multiplier(pages_count) % pages_count + 1).astype(np.int32)
+
+
+def get_permutation_multiplier(pages_count):
+  """Returns a multiplier which is coprime with the number of pages, so that multiplying by it
+  modulo the number of pages permutes the page IDs."""
+  multiplier = int(pages_count * 0.6180339887) | 1
+  while math.gcd(multiplier, pages_count) != 1:
+    multiplier += 2
+  return multiplier
+
+
+def get_chunk_links(rng, start_page_id, end_page_id, pages_count):
+  """Returns the distinct (source, target) links of the pages in the provided range, sorted by
+  source and then target page ID."""
+  page_ids = np.arange(start_page_id, end_page_id, dtype=np.int32)
+
+  # Draw the log-normal outgoing links counts of the pages around the requested average.
+  mean = math.log(LINKS_PER_PAGE) - OUTGOING_LINKS_COUNT_SIGMA ** 2 / 2
+  links_counts = rng.lognormal(mean, OUTGOING_LINKS_COUNT_SIGMA, len(page_ids)).astype(np.int64)
+  np.clip(links_counts, 0, pages_count - 1, out=links_counts)
+
+  source_page_ids = np.repeat(page_ids, links_counts)
+  target_page_ids = get_popular_page_ids(rng, pages_count, len(source_page_ids))
+
+  # Drop self-links and duplicate links, which do not exist in the real links table.
+  is_not_self_link = source_page_ids != target_page_ids
+  links = np.unique((source_page_ids[is_not_self_link].astype(np.int64) << 32) |
+                    target_page_ids[is_not_self_link].astype(np.int64))
+
+  return np.column_stack(((links >> 32).astype('<i4'), (links & 0xFFFFFFFF).astype('<i4')))
+
+
+def get_shard_links(links_filename):
+  """Returns the (page, linked page) pairs of the provided shard file, sorted by page ID and then
+  linked page ID, along with the offsets of each page's links."""
+  links = np.fromfile(links_filename, dtype='<i4').astype(np.int64)
+  links = np.sort((links[0::2] << 32) | links[1::2])
+  return ((links >> 32).astype(np.int32), (links & 0xFFFFFFFF).astype('<i4'))
+
+
+def serialize_links(linked_page_ids, links_format):
+  """Returns the provided page IDs as a links table column value."""
+  if links_format == 'blob':
+    return linked_page_ids.tobytes()
+  return '|'.join(map(str, linked_page_ids.tolist()))
+
+
+def insert_in_batches(conn, sql, rows):
+  """Inserts the provided rows with one executemany() call per batch."""
+  batch = []
+  for row in rows:
+    batch.append(row)
+    if len(batch) == INSERT_BATCH_SIZE:
+      conn.executemany(sql, batch)
+      batch = []
+  if batch:
+    conn.executemany(sql, batch)
+
+
+def get_synthetic_links_rows(shard_directory, shards_count, shard_pages_count, links_format):
+  """Yields a links table row for each page with at least one link, in page ID order."""
+  for shard_index in range(shards_count):
+    outgoing_page_ids, outgoing_links = get_shard_links(
+        os.path.join(shard_directory, 'outgoing.{0}'.format(shard_index)))
+    incoming_page_ids, incoming_links = get_shard_links(
+        os.path.join(shard_directory, 'incoming.{0}'.format(shard_index)))
+
+    start_page_id = shard_index * shard_pages_count + 1
+    page_ids = np.arange(start_page_id, start_page_id + shard_pages_count + 1)
+    outgoing_offsets = np.searchsorted(outgoing_page_ids, page_ids).tolist()
+    incoming_offsets = np.searchsorted(incoming_page_ids, page_ids).tolist()
+
+    for i in range(shard_pages_count):
+      outgoing_links_count = outgoing_offsets[i + 1] - outgoing_offsets[i]
+      incoming_links_count = incoming_offsets[i + 1] - incoming_offsets[i]
+      if outgoing_links_count or incoming_links_count:
+        yield (
+            start_page_id + i,
+            outgoing_links_count,
+            incoming_links_count,
+            serialize_links(outgoing_links[outgoing_offsets[i]:outgoing_offsets[i + 1]],
+                            links_format),
+            serialize_links(incoming_links[incoming_offsets[i]:incoming_offsets[i + 1]],
+                            links_format),
+        )
+
+    os.remove(os.path.join(shard_directory, 'outgoing.{0}'.format(shard_index)))
+    os.remove(os.path.join(shard_directory, 'incoming.{0}'.format(shard_index)))
 
-conn = sqlite3.connect(mock_sdow_database_filename)
 
+def create_synthetic_sdow_database(conn, pages_count, links_format):
+  """Fills the SDOW database with a synthetic graph of the provided number of non-redirect pages.
 
-# Create pages table.
-conn.execute('DROP TABLE IF EXISTS pages')
-conn.execute('CREATE TABLE pages(id INTEGER PRIMARY KEY, title TEXT, is_redirect INT)')
-
-prod_page_ids = {
-    1: '22770',
-    2: '64516',
-    3: '208157',
-    4: '208161',
-    5: '6412297',
-    6: '208171',
-    7: '208159',
-    8: '208174',
-    9: '173457',
-    10: '208151',
-    11: '208156',
-    12: '208155',
-    13: '37231',
-    14: '19223527',
-    15: '208252',
-    16: '208254',
-    17: '208288',
-    18: '208294',
-    19: '208292',
-    20: '208259',
-    21: '209248',
-    22: '362193',
-    23: '362203',
-    24: '362201',
-    25: '362204',
-    26: '362205',
-    27: '369235',
-    28: '362213',
-    29: '362212',
-    # Redirects
-    30: '341668',
-    31: '392390',
-    32: '391918',
-    33: '305606',
-    34: '391919',
-    35: '379525',
-}
-
-for i in range(1, 36):
-  if i <= 10:
-    page_name = '{0}'.format(i)
+  Pages have IDs 1 to pages_count and redirects have the IDs which follow.
+  """
+  rng = np.random.default_rng(SYNTHETIC_RANDOM_SEED)
+  redirects_count = int(pages_count * REDIRECTS_PER_PAGE)
+
+  # The database is thrown away if creating it fails, so it does not need to survive crashes.
+  conn.execute('PRAGMA journal_mode = OFF')
+  conn.execute('PRAGMA synchronous = OFF')
+
+  conn.execute('DROP TABLE IF EXISTS pages')
+  conn.execute('DROP TABLE IF EXISTS redirects')
+  conn.execute('DROP TABLE IF EXISTS links')
+
+  conn.execute('CREATE TABLE pages(id INTEGER PRIMARY KEY, title TEXT NOT NULL, '
+               'is_redirect INTEGER NOT NULL)')
+  conn.execute('CREATE TABLE redirects(source_id INTEGER PRIMARY KEY, target_id INTEGER NOT NULL)')
+  if links_format == 'blob':
+    with open(links_blob_table_sql_filename) as links_blob_table_sql_file:
+      conn.executescript(links_blob_table_sql_file.read())
   else:
-    page_name = '{0}_(number)'.format(i)
-
-  is_redirect = 0 if i < 30 else 1
-
-  conn.execute('INSERT INTO pages VALUES ({0}, "{1}", {2});'.format(
-      prod_page_ids[i], page_name, is_redirect))
-
-
-# Create redirects table.
-conn.execute('DROP TABLE IF EXISTS redirects')
-conn.execute(
-    'CREATE TABLE redirects(source_id INTEGER PRIMARY KEY, target_id INTEGER NOT NULL)')
-
-for i in range(30, 35):
-  conn.execute('INSERT INTO redirects VALUES ({0}, {1});'.format(
-      prod_page_ids[i], prod_page_ids[1]))
-
-
-# Create links table.
-conn.execute('DROP TABLE IF EXISTS links')
-conn.execute(
-    'CREATE TABLE links(id INTEGER PRIMARY KEY, outgoing_links_count INTEGER, incoming_links_count INTEGER, outgoing_links TEXT, incoming_links TEXT);')
-
-forward_links = [
-    (1, [2, 4, 5, 10]),
-    (2, [1, 3, 10]),
-    (3, [4, 11]),
-    (4, [1, 6, 9]),
-    (5, [6]),
-    (6, []),
-    (7, [8]),
-    (8, [7]),
-    (9, [3]),
-    (10, []),
-    (11, [12]),
-    (12, []),
-    (13, [12]),
-    (14, []),
-    (15, [16, 17]),
-    (16, [17, 18]),
-    (17, [18]),
-    (18, [19]),
-    (19, [20]),
-    (20, []),
-]
-
-backward_links = defaultdict(list)
-for source_page_id, outgoing_links in forward_links:
-  for target_page_id in outgoing_links:
-    backward_links[target_page_id].append(source_page_id)
-
-for page_id, outgoing_links in forward_links:
-  incoming_links = backward_links[page_id]
-
-  outgoing_links_count = len(outgoing_links)
-  incoming_links_count = len(incoming_links)
-
-  outgoing_links = [prod_page_ids[i] for i in outgoing_links]
-  outgoing_links = '|'.join(outgoing_links)
-
-  incoming_links = [prod_page_ids[i] for i in incoming_links]
-  incoming_links = '|'.join(incoming_links)
-
-  conn.execute('INSERT INTO links VALUES ({0}, {1}, {2}, "{3}", "{4}");'.format(
-      prod_page_ids[page_id], outgoing_links_count, incoming_links_count, outgoing_links, incoming_links))
+    conn.execute('CREATE TABLE links(id INTEGER PRIMARY KEY, '
+                 'outgoing_links_count INTEGER NOT NULL, '
+                 'incoming_links_count INTEGER NOT NULL, outgoing_links TEXT NOT NULL, '
+                 'incoming_links TEXT NOT NULL)')
+
+  print('[INFO] Inserting {0} pages and {1} redirects'.format(pages_count, redirects_count))
+  insert_in_batches(conn, 'INSERT INTO pages VALUES (?, ?, ?)', (
+      (page_id, 'Page_{0}'.format(page_id), int(page_id > pages_count))
+      for page_id in range(1, pages_count + redirects_count + 1)))
+
+  # Popular pages have more redirects to them, like on Wikipedia.
+  for start_index in range(0, redirects_count, CHUNK_PAGES_COUNT):
+    end_index = min(start_index + CHUNK_PAGES_COUNT, redirects_count)
+    source_page_ids = range(pages_count + start_index + 1, pages_count + end_index + 1)
+    target_page_ids = get_popular_page_ids(rng, pages_count, end_index - start_index).tolist()
+    conn.executemany('INSERT INTO redirects VALUES (?, ?)', zip(source_page_ids, target_page_ids))
+
+  # Shards hold a whole number of chunks and roughly MAX_SHARD_LINKS_COUNT links.
+  shard_chunks_count = max(1, int(MAX_SHARD_LINKS_COUNT / (LINKS_PER_PAGE * CHUNK_PAGES_COUNT)))
+  shard_pages_count = shard_chunks_count * CHUNK_PAGES_COUNT
+  shards_count = (pages_count + shard_pages_count - 1) // shard_pages_count
+
+  shard_directory = tempfile.mkdtemp(prefix='sdow_mock_links_')
+  try:
+    links_count = 0
+    incoming_files = [
+        open(os.path.join(shard_directory, 'incoming.{0}'.format(shard_index)), 'wb')
+        for shard_index in range(shards_count)
+    ]
+    try:
+      for start_page_id in range(1, pages_count + 1, CHUNK_PAGES_COUNT):
+        end_page_id = min(start_page_id + CHUNK_PAGES_COUNT, pages_count + 1)
+        links = get_chunk_links(rng, start_page_id, end_page_id, pages_count)
+        links_count += len(links)
+
+        # Chunks are generated in page ID order, so each lies within a single outgoing shard.
+        shard_index = (start_page_id - 1) // shard_pages_count
+        with open(os.path.join(shard_directory, 'outgoing.{0}'.format(shard_index)), 'ab') as f:
+          links.tofile(f)
+
+        # Spill each link, reversed, to the shard of its target page.
+        target_shard_indices = (links[:, 1] - 1) // shard_pages_count
+        order = np.argsort(target_shard_indices, kind='stable')
+        reversed_links = np.ascontiguousarray(links[order][:, ::-1])
+        shard_offsets = np.searchsorted(
+            target_shard_indices[order], np.arange(shards_count + 1)).tolist()
+        for target_shard_index in range(shards_count):
+          if shard_offsets[target_shard_index] != shard_offsets[target_shard_index + 1]:
+            reversed_links[shard_offsets[target_shard_index]:
+                           shard_offsets[target_shard_index + 1]].tofile(
+                               incoming_files[target_shard_index])
+
+        print('[INFO] Generated links of {0} of {1} pages'.format(end_page_id - 1, pages_count))
+    finally:
+      for incoming_file in incoming_files:
+        incoming_file.close()
+
+    # Shards without any page with outgoing links still need an outgoing file.
+    for shard_index in range(shards_count):
+      open(os.path.join(shard_directory, 'outgoing.{0}'.format(shard_index)), 'ab').close()
+
+    print('[INFO] Inserting {0} links'.format(links_count))
+    insert_in_batches(conn, 'INSERT INTO links VALUES (?, ?, ?, ?, ?)', get_synthetic_links_rows(
+        shard_directory, shards_count, shard_pages_count, links_format))
+  finally:
+    shutil.rmtree(shard_directory)
+
+  # Index the tables once they are filled, which is faster than updating the indexes on every
+  # insert.
+  print('[INFO] Creating indexes')
+  conn.execute('CREATE INDEX pages_title_index ON pages(title COLLATE NOCASE)')
+  conn.execute('CREATE INDEX IF NOT EXISTS links_outgoing_links_count_index ON '
+               'links(outgoing_links_count)')
+  conn.execute('CREATE INDEX IF NOT EXISTS links_incoming_links_count_index ON '
+               'links(incoming_links_count)')
+
+
+def create_hand_written_sdow_database(conn):
+  """Fills the SDOW database with a small hand-written graph."""
+  # Create pages table.
+  conn.execute('DROP TABLE IF EXISTS pages')
+  conn.execute('CREATE TABLE pages(id INTEGER PRIMARY KEY, title TEXT, is_redirect INT)')
+
+  prod_page_ids = {
+      1: '22770',
+      2: '64516',
+      3: '208157',
+      4: '208161',
+      5: '6412297',
+      6: '208171',
+      7: '208159',
+      8: '208174',
+      9: '173457',
+      10: '208151',
+      11: '208156',
+      12: '208155',
+      13: '37231',
+      14: '19223527',
+      15: '208252',
+      16: '208254',
+      17: '208288',
+      18: '208294',
+      19: '208292',
+      20: '208259',
+      21: '209248',
+      22: '362193',
+      23: '362203',
+      24: '362201',
+      25: '362204',
+      26: '362205',
+      27: '369235',
+      28: '362213',
+      29: '362212',
+      # Redirects
+      30: '341668',
+      31: '392390',
+      32: '391918',
+      33: '305606',
+      34: '391919',
+      35: '379525',
+  }
+
+  for i in range(1, 36):
+    if i <= 10:
+      page_name = '{0}'.format(i)
+    else:
+      page_name = '{0}_(number)'.format(i)
+
+    is_redirect = 0 if i < 30 else 1
+
+    conn.execute('INSERT INTO pages VALUES ({0}, "{1}", {2});'.format(
+        prod_page_ids[i], page_name, is_redirect))
+
+
+  # Create redirects table.
+  conn.execute('DROP TABLE IF EXISTS redirects')
+  conn.execute(
+      'CREATE TABLE redirects(source_id INTEGER PRIMARY KEY, target_id INTEGER NOT NULL)')
+
+  for i in range(30, 35):
+    conn.execute('INSERT INTO redirects VALUES ({0}, {1});'.format(
+        prod_page_ids[i], prod_page_ids[1]))
+
+
+  # Create links table.
+  conn.execute('DROP TABLE IF EXISTS links')
+  conn.execute(
+      'CREATE TABLE links(id INTEGER PRIMARY KEY, outgoing_links_count INTEGER, '
+      'incoming_links_count INTEGER, outgoing_links TEXT, incoming_links TEXT);')
+
+  forward_links = [
+      (1, [2, 4, 5, 10]),
+      (2, [1, 3, 10]),
+      (3, [4, 11]),
+      (4, [1, 6, 9]),
+      (5, [6]),
+      (6, []),
+      (7, [8]),
+      (8, [7]),
+      (9, [3]),
+      (10, []),
+      (11, [12]),
+      (12, []),
+      (13, [12]),
+      (14, []),
+      (15, [16, 17]),
+      (16, [17, 18]),
+      (17, [18]),
+      (18, [19]),
+      (19, [20]),
+      (20, []),
+  ]
+
+  backward_links = defaultdict(list)
+  for source_page_id, outgoing_links in forward_links:
+    for target_page_id in outgoing_links:
+      backward_links[target_page_id].append(source_page_id)
+
+  for page_id, outgoing_links in forward_links:
+    incoming_links = backward_links[page_id]
+
+    outgoing_links_count = len(outgoing_links)
+    incoming_links_count = len(incoming_links)
+
+    outgoing_links = [prod_page_ids[i] for i in outgoing_links]
+    outgoing_links = '|'.join(outgoing_links)
+
+    incoming_links = [prod_page_ids[i] for i in incoming_links]
+    incoming_links = '|'.join(incoming_links)
+
+    conn.execute('INSERT INTO links VALUES ({0}, {1}, {2}, "{3}", "{4}");'.format(
+        prod_page_ids[page_id], outgoing_links_count, incoming_links_count, outgoing_links,
+        incoming_links))
+
+
+print('[INFO] Creating mock SDOW database: {0}'.format(mock_sdow_database_filename))
+
+conn = sqlite3.connect(mock_sdow_database_filename)
+
+if SYNTHETIC_PAGES_COUNT is None:
+  create_hand_written_sdow_database(conn)
+else:
+  create_synthetic_sdow_database(conn, SYNTHETIC_PAGES_COUNT, LINKS_FORMAT)
 
 conn.commit()
 
@@ -139,7 +416,10 @@ conn = sqlite3.connect(mock_searches_database_filename)
 subprocess.call('sqlite3 {0} ".read {1}"'.format(
     mock_searches_database_filename, searches_database_sql_filename), shell=True)
 # conn.execute('DROP TABLE IF EXISTS searches')
-# conn.execute('CREATE TABLE IF NOT EXISTS searches(source_id INTEGER NOT NULL, target_id INTEGER NOT NULL, duration REAL NOT NULL, degrees_count INTEGER, paths_count INTEGER NOT NULL, t TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL);')
+# conn.execute('CREATE TABLE IF NOT EXISTS searches(source_id INTEGER NOT NULL, '
+#              'target_id INTEGER NOT NULL, duration REAL NOT NULL, degrees_count INTEGER, '
+#              'paths_count INTEGER NOT NULL, '
+#              't TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL);')
 
 print('[INFO] Successfully created mock searches database: {0}'.format(
     mock_searches_database_filename))
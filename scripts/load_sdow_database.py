@@ -0,0 +1,203 @@
+"""
+Bulk loads the trimmed redirects, pages and links files into a new SDOW SQLite database.
+
+Tables are created from the SQL files in sql/, without their sqlite3 dot-commands, and filled with
+batched inserts while journaling and syncing are turned off. Their indexes are only created once
+every table has been filled. If more than one process is requested, each table is first built into
+its own temporary database in parallel, and then copied into the SDOW database through ATTACH.
+The database is finally vacuumed and analyzed, so that the query planner has statistics.
+
+Links are read from the combined links file, and stored as "|"-separated TEXT or as packed
+little-endian int32 BLOBs, depending on the requested links format.
+"""
+
+import os
+import sys
+import gzip
+import sqlite3
+from array import array
+from multiprocessing import get_context
+
+SQL_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../sql')
+
+# SQL file of each table, per links format.
+TABLE_SQL_FILENAMES = {
+    'redirects': 'createRedirectsTable.sql',
+    'pages': 'createPagesTable.sql',
+    'links': {
+        'text': 'createLinksTable.sql',
+        'blob': 'createLinksBlobTable.sql',
+    },
+}
+
+# Page size of the database. Links rows are large, so bigger pages keep more of them off overflow
+# pages.
+PAGE_SIZE_BYTES = 8192
+
+# Size of the page cache while building, in KiB.
+CACHE_SIZE_KIBIBYTES = 2 * 1024 * 1024
+
+# Number of rows inserted per executemany() call.
+INSERT_BATCH_SIZE = 50000
+
+# Validate input arguments.
+if len(sys.argv) < 5:
+  print('[ERROR] Not enough arguments provided!')
+  print('[INFO] Usage: {0} <sdow_database> <redirects_file> <pages_file> <links_file> '
+        '[<links_format>] [<processes_count>]'.format(sys.argv[0]))
+  sys.exit()
+
+SDOW_DATABASE = sys.argv[1]
+TABLE_FILENAMES = {
+    'redirects': sys.argv[2],
+    'pages': sys.argv[3],
+    'links': sys.argv[4],
+}
+LINKS_FORMAT = sys.argv[5] if len(sys.argv) > 5 else 'text'
+PROCESSES_COUNT = int(sys.argv[6]) if len(sys.argv) > 6 else 1
+
+if os.path.exists(SDOW_DATABASE):
+  print('[ERROR] Specified SQLite file "{0}" already exists.'.format(SDOW_DATABASE))
+  sys.exit()
+
+for filename in TABLE_FILENAMES.values():
+  if not filename.endswith('.gz'):
+    print('[ERROR] File "{0}" must be gzipped.'.format(filename))
+    sys.exit()
+
+if LINKS_FORMAT not in ('text', 'blob'):
+  print('[ERROR] Links format must be either "text" or "blob".')
+  sys.exit()
+
+
+def get_table_statements(table_name):
+  """Returns the CREATE TABLE and CREATE INDEX statements of the provided table's SQL file, without
+  its sqlite3 dot-commands."""
+  sql_filename = TABLE_SQL_FILENAMES[table_name]
+  if isinstance(sql_filename, dict):
+    sql_filename = sql_filename[LINKS_FORMAT]
+
+  with open(os.path.join(SQL_DIRECTORY, sql_filename)) as sql_file:
+    sql = ''.join([line for line in sql_file if not line.startswith('.')])
+
+  statements = [statement.strip() for statement in sql.split(';') if statement.strip()]
+  create_table_statements = [s for s in statements if not s.upper().startswith('CREATE INDEX')]
+  create_index_statements = [s for s in statements if s.upper().startswith('CREATE INDEX')]
+
+  return (create_table_statements, create_index_statements)
+
+
+def get_links_blob(links):
+  """Packs the provided "|"-separated page IDs into a little-endian int32 BLOB."""
+  page_ids = array('i', [int(page_id) for page_id in links.split('|') if page_id])
+  if sys.byteorder != 'little':
+    page_ids.byteswap()
+  return page_ids.tobytes()
+
+
+def iter_table_rows(table_name, filename):
+  """Yields the typed rows of the provided table's tab-separated, gzipped file."""
+  with gzip.open(filename, 'rt', encoding='utf-8', newline='\n') as f:
+    for line in f:
+      columns = line.rstrip('\n').split('\t')
+
+      if table_name == 'redirects':
+        yield (int(columns[0]), int(columns[1]))
+      elif table_name == 'pages':
+        yield (int(columns[0]), columns[1], int(columns[2]))
+      elif LINKS_FORMAT == 'blob':
+        yield (int(columns[0]), int(columns[1]), int(columns[2]), get_links_blob(columns[3]),
+               get_links_blob(columns[4]))
+      else:
+        yield (int(columns[0]), int(columns[1]), int(columns[2]), columns[3], columns[4])
+
+
+def connect_for_build(database_filename):
+  """Returns a connection to the provided database with durability turned off for the build."""
+  conn = sqlite3.connect(database_filename, isolation_level=None)
+  conn.execute('PRAGMA page_size = {0};'.format(PAGE_SIZE_BYTES))
+  conn.execute('PRAGMA journal_mode = OFF;')
+  conn.execute('PRAGMA synchronous = OFF;')
+  conn.execute('PRAGMA locking_mode = EXCLUSIVE;')
+  conn.execute('PRAGMA temp_store = MEMORY;')
+  conn.execute('PRAGMA cache_size = -{0};'.format(CACHE_SIZE_KIBIBYTES))
+  return conn
+
+
+def fill_table(conn, table_name, filename):
+  """Creates the provided table, without its indexes, and inserts the rows of its file in
+  batches."""
+  create_table_statements, _ = get_table_statements(table_name)
+  for statement in create_table_statements:
+    conn.execute(statement)
+
+  columns_count = 2 if table_name == 'redirects' else 3 if table_name == 'pages' else 5
+  insert_sql = 'INSERT INTO {0} VALUES ({1});'.format(table_name, ', '.join(['?'] * columns_count))
+
+  conn.execute('BEGIN;')
+  batch = []
+  for row in iter_table_rows(table_name, filename):
+    batch.append(row)
+    if len(batch) == INSERT_BATCH_SIZE:
+      conn.executemany(insert_sql, batch)
+      batch = []
+  if batch:
+    conn.executemany(insert_sql, batch)
+  conn.execute('COMMIT;')
+
+
+def build_table_database(table_name):
+  """Builds the provided table into its own temporary database and returns its filename."""
+  table_database = '{0}.{1}.tmp'.format(SDOW_DATABASE, table_name)
+  if os.path.exists(table_database):
+    os.remove(table_database)
+
+  conn = connect_for_build(table_database)
+  fill_table(conn, table_name, TABLE_FILENAMES[table_name])
+  conn.close()
+
+  return table_database
+
+
+if PROCESSES_COUNT > 1:
+  print('[INFO] Building tables in {0} processes'.format(PROCESSES_COUNT))
+  with get_context('fork').Pool(PROCESSES_COUNT) as pool:
+    table_databases = dict(zip(TABLE_FILENAMES, pool.map(build_table_database, TABLE_FILENAMES)))
+
+  conn = connect_for_build(SDOW_DATABASE)
+
+  # Copy each table in rowid order, which only ever appends to the SDOW database's B-trees.
+  for table_name, table_database in table_databases.items():
+    print('[INFO] Copying {0} table'.format(table_name))
+    create_table_statements, _ = get_table_statements(table_name)
+    for statement in create_table_statements:
+      conn.execute(statement)
+
+    conn.execute('ATTACH DATABASE ? AS table_database;', (table_database,))
+    conn.execute('BEGIN;')
+    conn.execute('INSERT INTO main.{0} SELECT * FROM table_database.{0} ORDER BY rowid;'.format(
+        table_name))
+    conn.execute('COMMIT;')
+    conn.execute('DETACH DATABASE table_database;')
+    os.remove(table_database)
+
+else:
+  conn = connect_for_build(SDOW_DATABASE)
+  for table_name, filename in TABLE_FILENAMES.items():
+    print('[INFO] Loading {0} table'.format(table_name))
+    fill_table(conn, table_name, filename)
+
+# Indexes are built once from the full tables, which is much faster than updating them on every
+# insert.
+for table_name in TABLE_FILENAMES:
+  _, create_index_statements = get_table_statements(table_name)
+  for statement in create_index_statements:
+    print('[INFO] {0}'.format(statement))
+    conn.execute(statement)
+
+# VACUUM builds a temporary copy of the whole database, which must go to disk rather than memory.
+print('[INFO] Vacuuming and analyzing database')
+conn.execute('PRAGMA temp_store = FILE;')
+conn.execute('VACUUM;')
+conn.execute('ANALYZE;')
+conn.close()
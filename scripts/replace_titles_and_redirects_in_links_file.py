@@ -2,23 +2,41 @@
 Replaces page names in the links file with their corresponding IDs, eliminates links containing
 non-existing pages, and replaces redirects with the pages to which they redirect.
 
-Output is written to stdout.
+The lookup tables are loaded once and shared with a pool of forked worker processes, which rewrite
+blocks of the links file in parallel. Output is written to stdout, in the order of the links file.
 """
 
 import io
+import re
 import sys
 import gzip
+from collections import deque
+from multiprocessing import cpu_count, get_context
+
+import numpy as np
+
+# Approximate number of bytes of each file parsed at once.
+BLOCK_SIZE_BYTES = 16 * 1024 * 1024
+
+# Number of blocks queued per worker process, which bounds how much of the links file is held in
+# memory at once.
+BLOCKS_PER_PROCESS = 2
+
+# Matches the page ID at the start of each line of the pages file.
+PAGE_ID_REGEX = re.compile(br'^(\d+)\t', re.MULTILINE)
 
 # Validate inputs
 if len(sys.argv) < 5:
   print('[ERROR] Not enough arguments provided!')
-  print('[INFO] Usage: {0} <pages_file> <redirects_file> <target_file> <links_file>'.format(sys.argv[0]))
+  print('[INFO] Usage: {0} <pages_file> <redirects_file> <target_file> <links_file> '
+        '[<processes_count>]'.format(sys.argv[0]))
   sys.exit()
 
 PAGES_FILE = sys.argv[1]
 REDIRECTS_FILE = sys.argv[2]
 TARGETS_FILE = sys.argv[3]
 LINKS_FILE = sys.argv[4]
+PROCESSES_COUNT = int(sys.argv[5]) if len(sys.argv) > 5 else cpu_count()
 
 if not PAGES_FILE.endswith('.gz'):
   print('[ERROR] Pages file must be gzipped.')
@@ -36,38 +54,92 @@ if not LINKS_FILE.endswith('.gz'):
   print('[ERROR] Links file must be gzipped.')
   sys.exit()
 
-# Create a set of all page IDs and a dictionary of page titles to their corresponding IDs.
-ALL_PAGE_IDS = set()
-for line in io.BufferedReader(gzip.open(PAGES_FILE, 'rb')):
-  [page_id, page_title, _] = line.rstrip(b'\n').split(b'\t')
-  ALL_PAGE_IDS.add(page_id)
-
-# Create a dictionary of page IDs to the target page ID to which they redirect.
-REDIRECTS = {}
-for line in io.BufferedReader(gzip.open(REDIRECTS_FILE, 'rb')):
-  [source_page_id, target_page_id] = line.rstrip(b'\n').split(b'\t')
-  REDIRECTS[source_page_id] = target_page_id
-
-# Create a dictionary of linktarget IDs to the target page ID
-TARGETS = {}
-for line in io.BufferedReader(gzip.open(TARGETS_FILE, 'rb')):
-  [target_id, target_page_id] = line.rstrip(b'\n').split(b'\t')
-  TARGETS[target_id] = target_page_id
-
-# Loop through each line in the links file, replacing titles with IDs, applying redirects, and
-# removing nonexistent pages, writing the result to stdout.
-for line in io.BufferedReader(gzip.open(LINKS_FILE, 'rb')):
-  [source_page_id, target_id] = line.rstrip(b'\n').split(b'\t')
-
-  source_page_exists = source_page_id in ALL_PAGE_IDS
-
-  if source_page_exists:
-    source_page_id = REDIRECTS.get(source_page_id, source_page_id)
-
-    target_page_id = TARGETS.get(target_id)
-    if target_page_id is not None and source_page_id != target_page_id:
-      target_page_id = REDIRECTS.get(target_page_id, target_page_id)
-      print(b'\t'.join([source_page_id, target_page_id]).decode())
-    else:
-      pass
 
+def iter_blocks(filename):
+  """Yields the contents of a gzipped file in blocks of whole lines."""
+  with gzip.open(filename, 'rb') as f:
+    while True:
+      block = f.read(BLOCK_SIZE_BYTES)
+      if not block:
+        return
+      # Extend each block to the end of its last line.
+      yield block + f.readline()
+
+
+def parse_id_pairs(block):
+  """Returns the rows of a block of a tab-separated file of ID pairs as an int64 array of shape
+  (rows, 2)."""
+  return np.loadtxt(io.BytesIO(block), dtype=np.int64, delimiter='\t', ndmin=2).reshape(-1, 2)
+
+
+def get_page_ids(filename):
+  """Returns the page IDs at the start of each line of the gzipped pages file."""
+  page_ids = [np.array(PAGE_ID_REGEX.findall(block), dtype=np.int64)
+              for block in iter_blocks(filename)]
+  return np.concatenate(page_ids or [np.zeros(0, dtype=np.int64)])
+
+
+def get_id_map(filename):
+  """Returns a dense array mapping the first column of a file of ID pairs to its second column, with
+  -1 for IDs which are not in the file."""
+  pairs = [parse_id_pairs(block) for block in iter_blocks(filename)]
+  pairs = np.concatenate(pairs or [np.zeros((0, 2), dtype=np.int64)])
+  id_map = np.full(pairs[:, 0].max(initial=0) + 1, -1, dtype=np.int32)
+  id_map[pairs[:, 0]] = pairs[:, 1]
+  return id_map
+
+
+def look_up(id_map, ids):
+  """Returns the values of the provided IDs in a dense ID map, with -1 for missing IDs."""
+  is_in_range = ids < len(id_map)
+  return np.where(is_in_range, id_map[np.where(is_in_range, ids, 0)], -1)
+
+
+def apply_redirects(page_ids):
+  """Returns the provided page IDs with redirects replaced by the pages to which they redirect."""
+  redirected_page_ids = look_up(REDIRECTS, page_ids)
+  return np.where(redirected_page_ids == -1, page_ids, redirected_page_ids)
+
+
+def rewrite_links(block):
+  """Returns the provided block of the links file with linktarget IDs replaced by page IDs,
+  redirects applied, and links to or from nonexistent pages removed."""
+  links = parse_id_pairs(block)
+
+  source_page_ids = links[:, 0]
+  is_in_range = source_page_ids < len(PAGE_EXISTS)
+  source_page_exists = is_in_range & PAGE_EXISTS[np.where(is_in_range, source_page_ids, 0)]
+
+  source_page_ids = apply_redirects(source_page_ids[source_page_exists])
+  target_page_ids = look_up(TARGETS, links[source_page_exists, 1])
+
+  is_kept = (target_page_ids != -1) & (source_page_ids != target_page_ids)
+  target_page_ids = apply_redirects(target_page_ids[is_kept])
+
+  links = np.column_stack((source_page_ids[is_kept], target_page_ids))
+  return ('%d\t%d\n' * len(links) % tuple(links.ravel().tolist())).encode()
+
+
+# Create a dense array of whether each page ID exists.
+page_ids = get_page_ids(PAGES_FILE)
+PAGE_EXISTS = np.zeros(page_ids.max(initial=0) + 1, dtype=np.bool_)
+PAGE_EXISTS[page_ids] = True
+del page_ids
+
+# Create a dense array of page IDs to the target page ID to which they redirect.
+REDIRECTS = get_id_map(REDIRECTS_FILE)
+
+# Create a dense array of linktarget IDs to the target page ID.
+TARGETS = get_id_map(TARGETS_FILE)
+
+# Rewrite blocks of the links file in forked worker processes, which share the lookup tables with
+# this process, writing the rewritten blocks to stdout in order.
+with get_context('fork').Pool(PROCESSES_COUNT) as pool:
+  pending_results = deque()
+  for block in iter_blocks(LINKS_FILE):
+    pending_results.append(pool.apply_async(rewrite_links, (block,)))
+    if len(pending_results) == PROCESSES_COUNT * BLOCKS_PER_PROCESS:
+      sys.stdout.buffer.write(pending_results.popleft().get())
+
+  while pending_results:
+    sys.stdout.buffer.write(pending_results.popleft().get())
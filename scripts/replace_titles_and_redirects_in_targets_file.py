@@ -1,14 +1,18 @@
 """
-Replaces page names in the links file with their corresponding IDs, eliminates links containing
+Replaces page names in the targets file with their corresponding IDs, eliminates targets of
 non-existing pages, and replaces redirects with the pages to which they redirect.
 
-Output is written to stdout.
+The targets file holds a single short line per target, so it is rewritten in this process rather
+than in a pool of workers, which would each end up with a copy of the lookup table as its entries
+are touched. Output is written to stdout, in the order of the targets file.
 """
 
-import io
 import sys
 import gzip
 
+# Approximate number of bytes of the targets file rewritten at once.
+BLOCK_SIZE_BYTES = 16 * 1024 * 1024
+
 # Validate inputs
 if len(sys.argv) < 4:
   print('[ERROR] Not enough arguments provided!')
@@ -31,31 +35,52 @@ if not TARGETS_FILE.endswith('.gz'):
   print('[ERROR] Targets file must be gzipped.')
   sys.exit()
 
-# Create a set of all page IDs and a dictionary of page titles to their corresponding IDs.
-ALL_PAGE_IDS = set()
-PAGE_TITLES_TO_IDS = {}
-for line in io.BufferedReader(gzip.open(PAGES_FILE, 'rb')):
-  [page_id, page_title, _] = line.rstrip(b'\n').split(b'\t')
-  ALL_PAGE_IDS.add(page_id)
-  PAGE_TITLES_TO_IDS[page_title] = page_id
 
-# Create a dictionary of page IDs to the target page ID to which they redirect.
-REDIRECTS = {}
-for line in io.BufferedReader(gzip.open(REDIRECTS_FILE, 'rb')):
-  [source_page_id, target_page_id] = line.rstrip(b'\n').split(b'\t')
-  REDIRECTS[source_page_id] = target_page_id
+def iter_blocks(filename):
+  """Yields the contents of a gzipped file in blocks of whole lines."""
+  with gzip.open(filename, 'rb') as f:
+    while True:
+      block = f.read(BLOCK_SIZE_BYTES)
+      if not block:
+        return
+      # Extend each block to the end of its last line.
+      yield block + f.readline()
+
+
+def replace_titles(block):
+  """Returns the provided block of the targets file with titles replaced by the IDs of the pages to
+  which they resolve, and targets of nonexistent pages removed."""
+  lines = []
+  for line in block.split(b'\n'):
+    if not line:
+      continue
 
-# Loop through each line in the links file, replacing titles with IDs, applying redirects, and
-# removing nonexistent pages, writing the result to stdout.
-for line in io.BufferedReader(gzip.open(TARGETS_FILE, 'rb')):
-  [target_id, target_page_title] = line.rstrip(b'\n').split(b'\t')
+    [target_id, target_page_title] = line.split(b'\t')
 
-  target_page_id = PAGE_TITLES_TO_IDS.get(target_page_title)
+    target_page_id = PAGE_TITLES_TO_IDS.get(target_page_title)
+    if target_page_id is not None:
+      lines.append(target_id + b'\t' + target_page_id + b'\n')
 
-  if target_page_id is not None:
-    target_page_id = REDIRECTS.get(target_page_id, target_page_id)
-    print(b'\t'.join([target_id, target_page_id]).decode())
-  else:
-    pass
+  return b''.join(lines)
+
+
+# Create a dictionary of page IDs to the target page ID to which they redirect.
+REDIRECTS = {}
+with gzip.open(REDIRECTS_FILE, 'rb') as f:
+  for line in f:
+    [source_page_id, target_page_id] = line.rstrip(b'\n').split(b'\t')
+    REDIRECTS[source_page_id] = target_page_id
+
+# Create a dictionary of page titles to the IDs of the pages to which they resolve, applying
+# redirects once here rather than for every target.
+PAGE_TITLES_TO_IDS = {}
+with gzip.open(PAGES_FILE, 'rb') as f:
+  for line in f:
+    [page_id, page_title, _] = line.rstrip(b'\n').split(b'\t')
+    PAGE_TITLES_TO_IDS[page_title] = REDIRECTS.get(page_id, page_id)
 
+del REDIRECTS
 
+# Rewrite the targets file one block at a time, writing the rewritten blocks to stdout in order.
+for block in iter_blocks(TARGETS_FILE):
+  sys.stdout.buffer.write(replace_titles(block))
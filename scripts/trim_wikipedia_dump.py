@@ -0,0 +1,93 @@
+"""
+Trims a decompressed Wikipedia SQL dump, read from stdin, into a tab-separated file of the columns
+used to build the SDOW database, keeping only rows in namespace 0.
+
+Each INSERT statement of the dump holds many rows, so statements are parsed in parallel by a pool
+of processes and their rows are written in dump order. Values are matched with a quote-aware
+regular expression, so that commas, parentheses and escaped quotes inside titles do not break rows
+apart. Quoted values are written as they appear in the dump, without their surrounding quotes and
+with their escape sequences left as is.
+
+Output is written to stdout.
+"""
+
+import re
+import sys
+from operator import itemgetter
+from multiprocessing import cpu_count, get_context
+
+# For each supported table, the index of the namespace column, and the indices of the columns which
+# are written out.
+TABLE_COLUMNS = {
+    # rd_from, rd_namespace, rd_title, ...
+    'redirect': (1, (0, 2)),
+    # page_id, page_namespace, page_title, page_is_redirect, ...
+    'page': (1, (0, 2, 3)),
+    # pl_from, pl_from_namespace, pl_target_id
+    'pagelinks': (1, (0, 2)),
+    # lt_id, lt_namespace, lt_title
+    'linktarget': (1, (0, 2)),
+}
+
+# A single value: either a quoted string, which may contain escaped characters, or an unquoted
+# number or NULL.
+VALUE_PATTERN = br"'[^'\\]*(?:\\.[^'\\]*)*'|[^,()']*"
+
+# Number of INSERT statements sent to a worker process at once.
+STATEMENTS_PER_TASK = 4
+
+# Validate input arguments.
+if len(sys.argv) < 2 or sys.argv[1] not in TABLE_COLUMNS:
+  print('[ERROR] Not enough arguments provided!')
+  print('[INFO] Usage: {0} <{1}> [<processes_count>]'.format(
+      sys.argv[0], '|'.join(sorted(TABLE_COLUMNS))))
+  sys.exit()
+
+TABLE_NAME = sys.argv[1]
+PROCESSES_COUNT = int(sys.argv[2]) if len(sys.argv) > 2 else cpu_count()
+
+NAMESPACE_COLUMN_INDEX, OUTPUT_COLUMN_INDICES = TABLE_COLUMNS[TABLE_NAME]
+
+INSERT_STATEMENT_PREFIX = 'INSERT INTO `{0}` VALUES '.format(TABLE_NAME).encode('utf-8')
+
+
+def get_row_regex(captured_columns_count):
+  """Returns a regular expression which matches a whole row, capturing its leading columns."""
+  captured_value_pattern = b'(' + VALUE_PATTERN + b')'
+  return re.compile(br'\(' + b','.join([captured_value_pattern] * captured_columns_count) +
+                    br'(?:,(?:' + VALUE_PATTERN + br'))*\)')
+
+
+ROW_REGEX = get_row_regex(max(NAMESPACE_COLUMN_INDEX, *OUTPUT_COLUMN_INDICES) + 1)
+
+get_output_columns = itemgetter(*OUTPUT_COLUMN_INDICES)
+
+
+def get_unquoted_value(value):
+  """Returns the provided value without its surrounding quotes, if it has any."""
+  if value.startswith(b"'"):
+    return value[1:-1]
+  return value
+
+
+def trim_insert_statement(statement):
+  """Returns the trimmed rows of the provided INSERT statement, one per line."""
+  return b''.join([
+      b'\t'.join([get_unquoted_value(value) for value in get_output_columns(columns)]) + b'\n'
+      for columns in ROW_REGEX.findall(statement, len(INSERT_STATEMENT_PREFIX))
+      if columns[NAMESPACE_COLUMN_INDEX] == b'0'
+  ])
+
+
+def get_insert_statements(lines):
+  """Yields the lines which are INSERT statements into the table being trimmed."""
+  for line in lines:
+    if line.startswith(INSERT_STATEMENT_PREFIX):
+      yield line
+
+
+if __name__ == '__main__':
+  with get_context('fork').Pool(PROCESSES_COUNT) as pool:
+    for trimmed_rows in pool.imap(trim_insert_statement, get_insert_statements(sys.stdin.buffer),
+                                  STATEMENTS_PER_TASK):
+      sys.stdout.buffer.write(trimmed_rows)
@@ -3,54 +3,311 @@ Runs a bi-directional breadth-first search between two Wikipedia articles and re
 the shortest paths between them.
 """
 
+import time
+from itertools import islice
 
-def get_paths(page_ids, visited_dict):
-  """Returns a list of paths which go from the provided pages to either the source or target pages.
+from sdow.landmarks import NO_PATH_DISTANCE
+
+# Sentinel returned once all of a page's parents have been explored.
+NO_MORE_PARENTS = object()
+
+
+class SearchBudgetExceeded(Exception):
+  """Raised when a search is stopped because it exceeded one of its search budget's limits."""
+
+  def __init__(self, message, degrees_searched):
+    Exception.__init__(self, message)
+    self.message = message
+    self.degrees_searched = degrees_searched
+
+
+class SearchBudget(object):
+  """Limits on the work a single search may do. Searches report their progress as they scan links
+  and stop cooperatively once any limit is exceeded."""
+
+  def __init__(self, max_duration_seconds=None, max_links_scanned=None, max_frontier_size=None,
+               deadline=None):
+    """
+    Args:
+      max_duration_seconds: The maximum wall-clock time of the search, counted from when the budget
+        is created, or None for no limit.
+      max_links_scanned: The maximum number of links fetched by the search, or None for no limit.
+      max_frontier_size: The maximum number of pages in either side's frontier, or None for no
+        limit.
+      deadline: An optional time, as returned by time.time(), after which the search stops even if
+        it is within its own maximum duration, such as the deadline of a whole batch of searches.
+    """
+    self.max_duration_seconds = max_duration_seconds
+    self.max_links_scanned = max_links_scanned
+    self.max_frontier_size = max_frontier_size
+
+    self.deadline = deadline
+    self.is_deadline_shared = deadline is not None
+    if max_duration_seconds is not None:
+      search_deadline = time.time() + max_duration_seconds
+      if deadline is None or search_deadline < deadline:
+        self.deadline = search_deadline
+        self.is_deadline_shared = False
+
+    self.links_scanned = 0
+
+  def record_links_scanned(self, links_count, degrees_searched):
+    """Records that the search scanned more links and checks the time and links limits.
+
+    Args:
+      links_count: The number of links scanned since the last call.
+      degrees_searched: The number of levels the search has fully expanded.
+
+    Returns:
+      None
+
+    Raises:
+      SearchBudgetExceeded: If the search ran out of time or scanned too many links.
+    """
+    self.links_scanned += links_count
+
+    if self.max_links_scanned is not None and self.links_scanned > self.max_links_scanned:
+      raise SearchBudgetExceeded(
+          'Search scanned more than {0} links.'.format(self.max_links_scanned), degrees_searched)
+
+    if self.deadline is not None and time.time() > self.deadline:
+      if self.is_deadline_shared:
+        raise SearchBudgetExceeded('Search ran past the deadline of its batch.', degrees_searched)
+      raise SearchBudgetExceeded(
+          'Search took longer than {0} seconds.'.format(self.max_duration_seconds),
+          degrees_searched)
+
+  def check_frontier_size(self, frontier_size, degrees_searched):
+    """Checks the frontier size limit.
+
+    Args:
+      frontier_size: The number of pages in the frontier which is about to be expanded.
+      degrees_searched: The number of levels the search has fully expanded.
+
+    Returns:
+      None
+
+    Raises:
+      SearchBudgetExceeded: If the frontier is too large.
+    """
+    if self.max_frontier_size is not None and frontier_size > self.max_frontier_size:
+      raise SearchBudgetExceeded(
+          'Search frontier grew larger than {0} pages.'.format(self.max_frontier_size),
+          degrees_searched)
+
+
+def iter_paths(page_id, visited_dict):
+  """Lazily yields every path which goes from either the source or target page to the provided
+  page. Parents are walked with an explicit stack, so long paths cannot exhaust the recursion limit.
 
   Args:
-    page_ids: The list of page IDs whose paths to get.
+    page_id: The ID of the page at which the paths end.
+    visited_dict: A mapping from page ID to a list of that page's distinct parents' IDs. None
+      signifies that the page is the source or target page.
+
+  Yields:
+    list(int): A list of page IDs corresponding to a path from the source or target page to the
+      provided page.
+  """
+  # The current path (in reverse) and, for each page on it, an iterator over its remaining parents.
+  reversed_path = [page_id]
+  parents_iterators = [iter(visited_dict[page_id])]
+
+  while parents_iterators:
+    parent_page_id = next(parents_iterators[-1], NO_MORE_PARENTS)
+
+    if parent_page_id is NO_MORE_PARENTS:
+      # All of the current page's parents have been explored, so backtrack.
+      parents_iterators.pop()
+      reversed_path.pop()
+    elif parent_page_id is None:
+      # The current page is the source or target page, so the path is complete.
+      yield reversed_path[::-1]
+    else:
+      reversed_path.append(parent_page_id)
+      parents_iterators.append(iter(visited_dict[parent_page_id]))
+
+
+def count_paths(page_id, visited_dict, paths_counts):
+  """Returns the number of paths which go from either the source or target page to the provided
+  page, without materializing them.
+
+  Args:
+    page_id: The ID of the page at which the paths end.
+    visited_dict: A mapping from page ID to a list of that page's distinct parents' IDs. None
+      signifies that the page is the source or target page.
+    paths_counts: A mapping from page ID to its already computed paths count, which is updated in
+      place.
 
   Returns:
-    list(list(int)): A list of lists of page IDs corresponding to paths from the provided page IDs
-      to the source or target pages.
+    int: The number of paths to the provided page.
   """
-  paths = []
+  pending_page_ids = [page_id]
+
+  while pending_page_ids:
+    current_page_id = pending_page_ids[-1]
+
+    if current_page_id in paths_counts:
+      pending_page_ids.pop()
+      continue
+
+    parent_page_ids = visited_dict[current_page_id]
+
+    if parent_page_ids[0] is None:
+      # The current page is the source or target page.
+      paths_counts[current_page_id] = 1
+      pending_page_ids.pop()
+      continue
+
+    # Count the paths to each parent before counting the paths to the current page.
+    uncounted_parent_page_ids = [
+        parent_page_id for parent_page_id in parent_page_ids if parent_page_id not in paths_counts
+    ]
 
-  for page_id in page_ids:
-    if page_id is None:
-      # If the current page ID is None, it is either the source or target page, so return an empty
-      # path.
-      return [[]]
+    if uncounted_parent_page_ids:
+      pending_page_ids.extend(uncounted_parent_page_ids)
     else:
-      # Otherwise, recursively get the paths for the current page's children and append them to
-      # paths.
-      current_paths = get_paths(visited_dict[page_id], visited_dict)
-      for current_path in current_paths:
-        new_path = list(current_path)
-        new_path.append(page_id)
-        paths.append(new_path)
+      paths_counts[current_page_id] = sum(
+          paths_counts[parent_page_id] for parent_page_id in parent_page_ids)
+      pending_page_ids.pop()
 
-  return paths
+  return paths_counts[page_id]
 
 
-def breadth_first_search(source_page_id, target_page_id, database):
+def iter_shortest_paths(meeting_page_ids, visited_forward, visited_backward):
+  """Lazily yields every shortest path which goes through the pages at which the forward and
+  backward searches met. Since parent lists contain no duplicates, neither do the paths.
+
+  Args:
+    meeting_page_ids: The IDs of the pages reached by both the forward and backward searches.
+    visited_forward: A mapping from page ID to a list of that page's parents' IDs in the forward
+      search, including the meeting pages.
+    visited_backward: A mapping from page ID to a list of that page's parents' IDs in the backward
+      search, including the meeting pages.
+
+  Yields:
+    list(int): A list of page IDs corresponding to a path from the source page to the target page.
+  """
+  for page_id in meeting_page_ids:
+    for path_from_source in iter_paths(page_id, visited_forward):
+      for path_from_target in iter_paths(page_id, visited_backward):
+        # Both paths include the meeting page, so drop it from the path to the target page.
+        yield path_from_source + path_from_target[-2::-1]
+
+
+def count_shortest_paths(meeting_page_ids, visited_forward, visited_backward):
+  """Returns the number of shortest paths which go through the pages at which the forward and
+  backward searches met, without materializing them.
+
+  Args:
+    meeting_page_ids: The IDs of the pages reached by both the forward and backward searches.
+    visited_forward: A mapping from page ID to a list of that page's parents' IDs in the forward
+      search, including the meeting pages.
+    visited_backward: A mapping from page ID to a list of that page's parents' IDs in the backward
+      search, including the meeting pages.
+
+  Returns:
+    int: The number of shortest paths from the source page to the target page.
+  """
+  forward_paths_counts = {}
+  backward_paths_counts = {}
+
+  return sum(
+      count_paths(page_id, visited_forward, forward_paths_counts) *
+      count_paths(page_id, visited_backward, backward_paths_counts)
+      for page_id in meeting_page_ids)
+
+
+def get_shortest_paths(meeting_page_ids, visited_forward, visited_backward, max_paths=None):
+  """Returns at most the provided number of shortest paths which go through the pages at which the
+  forward and backward searches met, along with the total number of shortest paths.
+
+  Args:
+    meeting_page_ids: The IDs of the pages reached by both the forward and backward searches.
+    visited_forward: A mapping from page ID to a list of that page's parents' IDs in the forward
+      search, including the meeting pages.
+    visited_backward: A mapping from page ID to a list of that page's parents' IDs in the backward
+      search, including the meeting pages.
+    max_paths: The maximum number of paths to return, or None to return all of them.
+
+  Returns:
+    (list(list(int)), int): A tuple containing a list of lists of page IDs corresponding to paths
+      from the source page to the target page, and the total number of shortest paths.
+  """
+  paths_count = count_shortest_paths(meeting_page_ids, visited_forward, visited_backward)
+  paths = list(islice(iter_shortest_paths(
+      meeting_page_ids, visited_forward, visited_backward), max_paths))
+
+  return (paths, paths_count)
+
+
+def prune_frontier(unvisited_dict, visited_dict, depth, distance_lower_bounds, max_distance):
+  """Moves the pages of a frontier which cannot lie on a shortest path into the visited dictionary,
+  so that they are never expanded.
+
+  Args:
+    unvisited_dict: A mapping from the ID of each page in the frontier to its parents' IDs.
+    visited_dict: A mapping from the ID of each visited page to its parents' IDs.
+    depth: The number of degrees between the frontier and the page at which its side started.
+    distance_lower_bounds: A list of lower bounds on the number of degrees between each page in the
+      frontier, in iteration order, and the page at which the other side started.
+    max_distance: An upper bound on the number of degrees of the shortest paths.
+
+  Returns:
+    None
+  """
+  pruned_page_ids = [
+      page_id for page_id, distance_lower_bound in zip(unvisited_dict, distance_lower_bounds)
+      if depth + distance_lower_bound > max_distance
+  ]
+
+  for page_id in pruned_page_ids:
+    visited_dict[page_id] = unvisited_dict.pop(page_id)
+
+
+def breadth_first_search(source_page_id, target_page_id, database, max_paths=None,
+                         search_budget=None, landmark_index=None):
   """Returns a list of shortest paths from the source to target pages by running a bi-directional
   breadth-first search on the graph of Wikipedia pages.
 
   Args:
     source_page_id: The page at which to start the search.
     target_page_id: The page at which to end the search.
-    database: An Database instance which contains methods to query the Wikipedia database.
+    database: A Database or CsrGraph instance which contains methods to query the Wikipedia
+      link graph.
+    max_paths: The maximum number of paths to return, or None to return all of them.
+    search_budget: An optional SearchBudget limiting the work done by the search.
+    landmark_index: An optional LandmarkIndex built from the same link graph, used to avoid
+      expanding pages which cannot lie on a shortest path.
 
   Returns:
-    list(list(int)): A list of lists of page IDs corresponding to paths from the source page to the
-      target page.
+    (list(list(int)), int): A tuple containing a list of lists of page IDs corresponding to paths
+      from the source page to the target page, and the total number of shortest paths.
+
+  Raises:
+    SearchBudgetExceeded: If the search exceeded one of the provided search budget's limits.
   """
   # If the source and target page IDs are identical, return the trivial path.
   if source_page_id == target_page_id:
-    return [[source_page_id]]
+    return ([[source_page_id]], 1)
 
-  paths = []
+  # If a landmark bounds the length of the shortest paths, pages further than that bound from the
+  # other side of the search are pruned from each frontier before it is expanded. Pages on a
+  # shortest path are never pruned, so the results are unchanged.
+  max_distance = None
+  if landmark_index is not None:
+    distance_lower_bound, max_distance = landmark_index.get_distance_bounds(
+        source_page_id, target_page_id)
+    if distance_lower_bound == NO_PATH_DISTANCE:
+      return ([], 0)
+
+  search_source_page_id = source_page_id
+  search_target_page_id = target_page_id
+  is_forward_frontier_pruned = False
+  is_backward_frontier_pruned = False
+
+  # The pages reached by both the forward and backward searches.
+  meeting_page_ids = []
 
   # The unvisited dictionaries are a mapping from page ID to a list of that page's parents' IDs.
   # None signifies that the source and target pages have no parent.
@@ -67,20 +324,37 @@ def breadth_first_search(source_page_id, target_page_id, database):
 
   # Continue the breadth first search until a path has been found or either of the unvisited lists
   # are empty.
-  while (len(paths) == 0) and ((len(unvisited_forward) != 0) and (len(unvisited_backward) != 0)):
-    # Run the next iteration of the breadth first search in whichever direction has the smaller number
-    # of links at the next level.
+  while (len(meeting_page_ids) == 0) and ((len(unvisited_forward) != 0) and
+                                          (len(unvisited_backward) != 0)):
+    #---  PRUNE FRONTIERS  ---#
+    if max_distance is not None and not is_forward_frontier_pruned:
+      prune_frontier(unvisited_forward, visited_forward, forward_depth,
+                     landmark_index.get_distance_lower_bounds_to(
+                         list(unvisited_forward), search_target_page_id), max_distance)
+      is_forward_frontier_pruned = True
+
+    if max_distance is not None and not is_backward_frontier_pruned:
+      prune_frontier(unvisited_backward, visited_backward, backward_depth,
+                     landmark_index.get_distance_lower_bounds_from(
+                         search_source_page_id, list(unvisited_backward)), max_distance)
+      is_backward_frontier_pruned = True
+
+    # Run the next iteration of the breadth first search in whichever direction has the smaller
+    # number of links at the next level.
     forward_links_count = database.fetch_outgoing_links_count(unvisited_forward.keys())
     backward_links_count = database.fetch_incoming_links_count(unvisited_backward.keys())
 
     if forward_links_count < backward_links_count:
       #---  FORWARD BREADTH FIRST SEARCH  ---#
+      if search_budget is not None:
+        search_budget.check_frontier_size(len(unvisited_forward), forward_depth + backward_depth)
+
       forward_depth += 1
+      is_forward_frontier_pruned = False
 
-      # Fetch the pages which can be reached from the currently unvisited forward pages.
-      # The replace() bit is some hackery to handle Python printing a trailing ',' when there is
-      # only one key.
-      outgoing_links = database.fetch_outgoing_links(unvisited_forward.keys())
+      # Fetch the pages which can be reached from the currently unvisited forward pages. The keys
+      # are copied since the links may be fetched lazily, after the dictionary is cleared below.
+      outgoing_links = database.fetch_outgoing_links(list(unvisited_forward.keys()))
 
       # Mark all of the unvisited forward pages as visited.
       for page_id in unvisited_forward:
@@ -90,25 +364,34 @@ def breadth_first_search(source_page_id, target_page_id, database):
       unvisited_forward.clear()
 
       for source_page_id, target_page_ids in outgoing_links:
-        for target_page_id in target_page_ids.split('|'):
-          if target_page_id:
-            target_page_id = int(target_page_id)
-            # If the target page is in neither visited forward nor unvisited forward, add it to
-            # unvisited forward.
-            if (target_page_id not in visited_forward) and (target_page_id not in unvisited_forward):
-              unvisited_forward[target_page_id] = [source_page_id]
-
-            # If the target page is in unvisited forward, add the source page as another one of its
-            # parents.
-            elif target_page_id in unvisited_forward:
-              unvisited_forward[target_page_id].append(source_page_id)
+        # Stop between pages if the search has run out of budget.
+        if search_budget is not None:
+          search_budget.record_links_scanned(
+              len(target_page_ids), forward_depth + backward_depth - 1)
+
+        for target_page_id in target_page_ids:
+          # If the target page is in neither visited forward nor unvisited forward, add it to
+          # unvisited forward.
+          if (target_page_id not in visited_forward) and (target_page_id not in unvisited_forward):
+            unvisited_forward[target_page_id] = [source_page_id]
+
+          # If the target page is in unvisited forward, add the source page as another one of its
+          # parents. A page's links are iterated together, so a duplicate link can only repeat the
+          # most recently added parent.
+          elif (target_page_id in unvisited_forward and
+                unvisited_forward[target_page_id][-1] != source_page_id):
+            unvisited_forward[target_page_id].append(source_page_id)
 
     else:
       #---  BACKWARD BREADTH FIRST SEARCH  ---#
+      if search_budget is not None:
+        search_budget.check_frontier_size(len(unvisited_backward), forward_depth + backward_depth)
+
       backward_depth += 1
+      is_backward_frontier_pruned = False
 
       # Fetch the pages which can reach the currently unvisited backward pages.
-      incoming_links = database.fetch_incoming_links(unvisited_backward.keys())
+      incoming_links = database.fetch_incoming_links(list(unvisited_backward.keys()))
 
       # Mark all of the unvisited backward pages as visited.
       for page_id in unvisited_backward:
@@ -118,33 +401,245 @@ def breadth_first_search(source_page_id, target_page_id, database):
       unvisited_backward.clear()
 
       for target_page_id, source_page_ids in incoming_links:
-        for source_page_id in source_page_ids.split('|'):
-          if source_page_id:
-            source_page_id = int(source_page_id)
-            # If the source page is in neither visited backward nor unvisited backward, add it to
-            # unvisited backward.
-            if (source_page_id not in visited_backward) and (source_page_id not in unvisited_backward):
-              unvisited_backward[source_page_id] = [target_page_id]
-
-            # If the source page is in unvisited backward, add the target page as another one of its
-            # parents.
-            elif source_page_id in unvisited_backward:
-              unvisited_backward[source_page_id].append(target_page_id)
+        # Stop between pages if the search has run out of budget.
+        if search_budget is not None:
+          search_budget.record_links_scanned(
+              len(source_page_ids), forward_depth + backward_depth - 1)
+
+        for source_page_id in source_page_ids:
+          # If the source page is in neither visited backward nor unvisited backward, add it to
+          # unvisited backward.
+          if ((source_page_id not in visited_backward) and
+              (source_page_id not in unvisited_backward)):
+            unvisited_backward[source_page_id] = [target_page_id]
+
+          # If the source page is in unvisited backward, add the target page as another one of its
+          # parents. A page's links are iterated together, so a duplicate link can only repeat the
+          # most recently added parent.
+          elif (source_page_id in unvisited_backward and
+                unvisited_backward[source_page_id][-1] != target_page_id):
+            unvisited_backward[source_page_id].append(target_page_id)
 
     #---  CHECK FOR PATH COMPLETION  ---#
-    # The search is complete if any of the pages are in both unvisited backward and unvisited, so
-    # find the resulting paths.
-    for page_id in unvisited_forward:
-      if page_id in unvisited_backward:
-        paths_from_source = get_paths(unvisited_forward[page_id], visited_forward)
-        paths_from_target = get_paths(unvisited_backward[page_id], visited_backward)
-
-        for path_from_source in paths_from_source:
-          for path_from_target in paths_from_target:
-            current_path = list(path_from_source) + [page_id] + list(reversed(path_from_target))
-
-            # TODO: This line shouldn't be required, but there are some unexpected duplicates.
-            if current_path not in paths:
-              paths.append(current_path)
-
-  return paths
+    # The search is complete if any of the pages are in both unvisited backward and unvisited
+    # forward.
+    meeting_page_ids = [page_id for page_id in unvisited_forward if page_id in unvisited_backward]
+
+  # Add the meeting pages to the visited dictionaries so that every page on a shortest path can be
+  # looked up in them.
+  for page_id in meeting_page_ids:
+    visited_forward[page_id] = unvisited_forward[page_id]
+    visited_backward[page_id] = unvisited_backward[page_id]
+
+  return get_shortest_paths(meeting_page_ids, visited_forward, visited_backward, max_paths)
+
+
+class SearchSide(object):
+  """One side of a bi-directional breadth-first search, expanded one level at a time from a single
+  page. Expanded levels are kept, so that every search starting or ending at that page can reuse
+  them instead of fetching the same links again."""
+
+  def __init__(self, root_page_id, database, outgoing_or_incoming_links):
+    """
+    Args:
+      root_page_id: The ID of the page at which this side of the search starts.
+      database: A Database or CsrGraph instance which contains methods to query the Wikipedia
+        link graph.
+      outgoing_or_incoming_links: Either "outgoing_links" to search forward from the root page or
+        "incoming_links" to search backward from it.
+    """
+    if outgoing_or_incoming_links == 'outgoing_links':
+      self.fetch_links = database.fetch_outgoing_links
+      self.fetch_links_count = database.fetch_outgoing_links_count
+    else:
+      self.fetch_links = database.fetch_incoming_links
+      self.fetch_links_count = database.fetch_incoming_links_count
+
+    # The levels list holds a mapping from page ID to a list of that page's parents' IDs for each
+    # depth, and the parents dictionary merges all of them. None signifies that the page is the
+    # root page.
+    self.levels = [{root_page_id: [None]}]
+    self.parents = {root_page_id: [None]}
+
+    self.links_counts = []
+
+  def get_level(self, depth):
+    """Returns the pages at the provided depth, which must have been expanded.
+
+    Args:
+      depth: The number of degrees between the pages and the root page.
+
+    Returns:
+      dict(int, list(int)): A mapping from page ID to a list of that page's parents' IDs.
+    """
+    return self.levels[depth]
+
+  def get_links_count(self, depth):
+    """Returns the number of links which must be fetched to expand the level following the
+    provided depth, or 0 if it has already been expanded.
+
+    Args:
+      depth: The depth of the level to expand.
+
+    Returns:
+      int: The count of links.
+    """
+    if depth + 1 < len(self.levels):
+      return 0
+
+    while len(self.links_counts) <= depth:
+      self.links_counts.append(None)
+
+    if self.links_counts[depth] is None:
+      self.links_counts[depth] = self.fetch_links_count(list(self.levels[depth])) or 0
+
+    return self.links_counts[depth]
+
+  def expand(self, depth, search_budget=None, degrees_searched=0):
+    """Makes sure the level following the provided depth has been expanded.
+
+    Args:
+      depth: The depth of the level to expand.
+      search_budget: An optional SearchBudget limiting the work done by the expansion.
+      degrees_searched: The number of levels the calling search has fully expanded.
+
+    Returns:
+      None
+
+    Raises:
+      SearchBudgetExceeded: If the expansion exceeded the provided search budget's limits, in
+        which case the level is left unexpanded.
+    """
+    if depth + 1 < len(self.levels):
+      return
+
+    frontier = self.levels[depth]
+    if search_budget is not None:
+      search_budget.check_frontier_size(len(frontier), degrees_searched)
+
+    # The next level is only added once it is complete, so that running out of budget part of the
+    # way through does not leave a partial level for the next search to reuse.
+    next_level = {}
+
+    for page_id, linked_page_ids in self.fetch_links(list(frontier)):
+      if search_budget is not None:
+        search_budget.record_links_scanned(len(linked_page_ids), degrees_searched)
+
+      for linked_page_id in linked_page_ids:
+        if linked_page_id not in self.parents and linked_page_id not in next_level:
+          next_level[linked_page_id] = [page_id]
+
+        # A page's links are iterated together, so a duplicate link can only repeat the most
+        # recently added parent.
+        elif linked_page_id in next_level and next_level[linked_page_id][-1] != page_id:
+          next_level[linked_page_id].append(page_id)
+
+    self.levels.append(next_level)
+    self.parents.update(next_level)
+
+
+def breadth_first_search_between_sides(forward_side, backward_side, max_paths=None,
+                                       search_budget=None):
+  """Returns a list of shortest paths from the root page of the forward side to the root page of
+  the backward side by running a bi-directional breadth-first search, reusing the levels which
+  either side has already expanded.
+
+  Args:
+    forward_side: A SearchSide searching forward from the source page.
+    backward_side: A SearchSide searching backward from the target page.
+    max_paths: The maximum number of paths to return, or None to return all of them.
+    search_budget: An optional SearchBudget limiting the work done by the search.
+
+  Returns:
+    (list(list(int)), int): A tuple containing a list of lists of page IDs corresponding to paths
+      from the source page to the target page, and the total number of shortest paths.
+
+  Raises:
+    SearchBudgetExceeded: If the search exceeded one of the provided search budget's limits.
+  """
+  # If the source and target pages are identical, return the trivial path.
+  source_page_id = next(iter(forward_side.get_level(0)))
+  if source_page_id in backward_side.get_level(0):
+    return ([[source_page_id]], 1)
+
+  meeting_page_ids = []
+
+  forward_depth = 0
+  backward_depth = 0
+
+  while (len(meeting_page_ids) == 0) and ((len(forward_side.get_level(forward_depth)) != 0) and
+                                          (len(backward_side.get_level(backward_depth)) != 0)):
+    # Expand whichever side has the smaller number of links at the next level. Levels which have
+    # already been expanded cost nothing.
+    forward_links_count = forward_side.get_links_count(forward_depth)
+    backward_links_count = backward_side.get_links_count(backward_depth)
+
+    if forward_links_count < backward_links_count:
+      forward_side.expand(forward_depth, search_budget, forward_depth + backward_depth)
+      forward_depth += 1
+    else:
+      backward_side.expand(backward_depth, search_budget, forward_depth + backward_depth)
+      backward_depth += 1
+
+    # The search is complete if any of the pages are in both frontiers.
+    backward_frontier = backward_side.get_level(backward_depth)
+    meeting_page_ids = [
+        page_id for page_id in forward_side.get_level(forward_depth) if page_id in backward_frontier
+    ]
+
+  return get_shortest_paths(
+      meeting_page_ids, forward_side.parents, backward_side.parents, max_paths)
+
+
+def breadth_first_search_to_many(source_page_id, target_page_ids, database, max_degrees=None,
+                                 max_paths=None, search_budget=None):
+  """Returns the shortest paths from the source page to each of the target pages by running a
+  single forward breadth-first search, which stops as soon as every target page has been reached.
+
+  Args:
+    source_page_id: The page at which to start the search.
+    target_page_ids: A list of the pages at which paths may end.
+    database: A Database or CsrGraph instance which contains methods to query the Wikipedia
+      link graph.
+    max_degrees: The maximum number of degrees to search, or None to search until every target
+      page has been reached or no more pages can be.
+    max_paths: The maximum number of paths to return per target page, or None to return all of
+      them.
+    search_budget: An optional SearchBudget limiting the work done by the search.
+
+  Returns:
+    dict(int, (int, list(list(int)), int)): A mapping from each target page ID to a tuple containing
+      the number of degrees from the source page, a list of lists of page IDs corresponding to
+      paths from the source page to the target page, and the total number of shortest paths. The
+      number of degrees is None for target pages which were not reached.
+
+  Raises:
+    SearchBudgetExceeded: If the search exceeded one of the provided search budget's limits.
+  """
+  forward_side = SearchSide(source_page_id, database, 'outgoing_links')
+
+  unreached_target_page_ids = set(target_page_ids)
+  results = {}
+
+  depth = 0
+  while True:
+    level = forward_side.get_level(depth)
+
+    for target_page_id in [page_id for page_id in unreached_target_page_ids if page_id in level]:
+      # The target page acts as a meeting page whose backward search has not left it.
+      paths, paths_count = get_shortest_paths(
+          [target_page_id], forward_side.parents, {target_page_id: [None]}, max_paths)
+      results[target_page_id] = (depth, paths, paths_count)
+      unreached_target_page_ids.remove(target_page_id)
+
+    if (len(unreached_target_page_ids) == 0 or len(level) == 0 or
+        (max_degrees is not None and depth >= max_degrees)):
+      break
+
+    forward_side.expand(depth, search_budget, depth)
+    depth += 1
+
+  for target_page_id in unreached_target_page_ids:
+    results[target_page_id] = (None, [], 0)
+
+  return results
@@ -0,0 +1,311 @@
+"""
+Caches for results which are expensive to recompute.
+"""
+
+import os
+import time
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+
+# Number of writes to the page information cache between evictions, per process.
+PAGE_INFO_CACHE_EVICTION_INTERVAL = 100
+
+
+def get_file_version(filename):
+  """Returns a string which changes whenever the provided file is replaced or modified.
+
+  Args:
+    filename: The file whose version to get.
+
+  Returns:
+    str: The file's size and modification time.
+  """
+  file_stat = os.stat(filename)
+  return '{0}:{1}'.format(file_stat.st_size, file_stat.st_mtime_ns)
+
+
+def get_search_result_size(paths):
+  """Returns the approximate number of bytes of memory used by a cached search result.
+
+  Args:
+    paths: The list of paths in the search result.
+
+  Returns:
+    int: The approximate size of the search result, in bytes.
+  """
+  # Roughly a list header per path plus a pointer and an integer object per page ID.
+  return 128 + sum(64 + 40 * len(path) for path in paths)
+
+
+class SearchResultsCache(object):
+  """Cache of shortest paths results keyed by (source page ID, target page ID), made up of a
+  size-bounded in-process LRU cache and an optional persistent SQLite cache shared by all
+  processes."""
+
+  def __init__(self, max_size_bytes, cache_database=None, sdow_database=None):
+    """
+    Args:
+      max_size_bytes: The approximate maximum memory used by the in-process cache, in bytes.
+      cache_database: Optional SQLite file in which to persist results. It is created if needed.
+      sdow_database: The SDOW SQLite file the results were computed from. The persistent cache is
+        cleared whenever this file changes.
+    """
+    self.max_size_bytes = max_size_bytes
+    self.size_bytes = 0
+    self.results = OrderedDict()
+    self.lock = threading.Lock()
+
+    self.hits = 0
+    self.misses = 0
+
+    self.cache_database = cache_database
+    self.sdow_database_version = None
+    if cache_database is not None:
+      self.sdow_database_version = get_file_version(sdow_database)
+
+    # SQLite connections cannot be shared across forked processes, so each process opens its own.
+    self.cache_conn = None
+    self.cache_conn_pid = None
+
+  def get_cache_connection(self):
+    """Returns this process's connection to the persistent cache, opening it if necessary and
+    clearing it if it was filled from a different SDOW database.
+
+    Returns:
+      sqlite3.Connection: The connection to the persistent cache.
+    """
+    if self.cache_conn is not None and self.cache_conn_pid == os.getpid():
+      return self.cache_conn
+
+    cache_conn = sqlite3.connect(self.cache_database, check_same_thread=False)
+    cache_conn.execute('PRAGMA journal_mode=WAL;')
+
+    # Losing the most recent cached results on a crash is harmless, so skip syncing every commit.
+    cache_conn.execute('PRAGMA synchronous=NORMAL;')
+
+    with cache_conn:
+      cache_conn.execute(
+          'CREATE TABLE IF NOT EXISTS metadata (key TEXT PRIMARY KEY, value TEXT NOT NULL);')
+      cache_conn.execute(
+          'CREATE TABLE IF NOT EXISTS search_results (source_id INTEGER NOT NULL, '
+          'target_id INTEGER NOT NULL, paths TEXT NOT NULL, paths_count INTEGER NOT NULL, '
+          'PRIMARY KEY (source_id, target_id));')
+
+      result = cache_conn.execute(
+          "SELECT value FROM metadata WHERE key = 'sdow_database_version';").fetchone()
+
+      if result is None or result[0] != self.sdow_database_version:
+        cache_conn.execute('DELETE FROM search_results;')
+        cache_conn.execute(
+            "INSERT OR REPLACE INTO metadata VALUES ('sdow_database_version', ?);",
+            (self.sdow_database_version,))
+
+    self.cache_conn = cache_conn
+    self.cache_conn_pid = os.getpid()
+
+    return cache_conn
+
+  def get(self, source_page_id, target_page_id, max_paths=None):
+    """Returns the cached shortest paths between the provided pages.
+
+    Args:
+      source_page_id: The ID of the page at which the search started.
+      target_page_id: The ID of the page at which the search ended.
+      max_paths: The maximum number of paths to return, or None to return all of them.
+
+    Returns:
+      (list(list(int)), int): A tuple containing the cached paths and the total number of shortest
+        paths.
+      OR
+      None: If the result is not cached, or if too few of its paths were cached.
+    """
+    key = (source_page_id, target_page_id)
+
+    with self.lock:
+      result = self.results.get(key)
+      if result is not None:
+        self.results.move_to_end(key)
+
+    if result is None and self.cache_database is not None:
+      row = self.get_cache_connection().execute(
+          'SELECT paths, paths_count FROM search_results WHERE source_id = ? AND target_id = ?;',
+          key).fetchone()
+
+      if row is not None:
+        result = (json.loads(row[0]), row[1])
+        self.set_in_memory(key, result)
+
+    # A result computed with a smaller maximum number of paths cannot serve larger requests.
+    if result is not None:
+      paths, paths_count = result
+      if len(paths) == paths_count or (max_paths is not None and max_paths <= len(paths)):
+        self.hits += 1
+        return (paths[:max_paths], paths_count)
+
+    self.misses += 1
+    return None
+
+  def set(self, source_page_id, target_page_id, paths, paths_count):
+    """Caches the shortest paths between the provided pages.
+
+    Args:
+      source_page_id: The ID of the page at which the search started.
+      target_page_id: The ID of the page at which the search ended.
+      paths: The list of shortest paths found, which may be fewer than paths_count.
+      paths_count: The total number of shortest paths.
+
+    Returns:
+      None
+    """
+    key = (source_page_id, target_page_id)
+
+    self.set_in_memory(key, (paths, paths_count))
+
+    if self.cache_database is not None:
+      with self.get_cache_connection() as cache_conn:
+        cache_conn.execute('INSERT OR REPLACE INTO search_results VALUES (?, ?, ?, ?);',
+                           (source_page_id, target_page_id, json.dumps(paths), paths_count))
+
+  def set_in_memory(self, key, result):
+    """Adds the provided result to the in-process cache, evicting the least recently used results
+    until it fits within its maximum size."""
+    result_size = get_search_result_size(result[0])
+    if result_size > self.max_size_bytes:
+      return
+
+    with self.lock:
+      previous_result = self.results.pop(key, None)
+      if previous_result is not None:
+        self.size_bytes -= get_search_result_size(previous_result[0])
+
+      self.results[key] = result
+      self.size_bytes += result_size
+
+      while self.size_bytes > self.max_size_bytes:
+        _, evicted_result = self.results.popitem(last=False)
+        self.size_bytes -= get_search_result_size(evicted_result[0])
+
+  def get_stats(self):
+    """Returns the cache's hit and miss counters and current size.
+
+    Returns:
+      dict: The number of hits, misses, and cached results, and the in-process cache size in bytes.
+    """
+    return {
+        'hits': self.hits,
+        'misses': self.misses,
+        'results': len(self.results),
+        'sizeBytes': self.size_bytes,
+    }
+
+
+class PageInfoCache(object):
+  """Cache of Wikipedia page information keyed by page ID, stored in a SQLite file so that it is
+  shared by all processes. Entries expire after a fixed time and the least recently fetched entries
+  are evicted once the cache grows past its maximum size."""
+
+  def __init__(self, cache_database, ttl_seconds, max_entries):
+    self.cache_database = cache_database
+    self.ttl_seconds = ttl_seconds
+    self.max_entries = max_entries
+
+    self.hits = 0
+    self.misses = 0
+    self.sets_count = 0
+
+    # The cache is used from background page information fetching threads.
+    self.lock = threading.Lock()
+
+    # SQLite connections cannot be shared across forked processes, so each process opens its own.
+    self.cache_conn = None
+    self.cache_conn_pid = None
+
+  def get_cache_connection(self):
+    """Returns this process's connection to the cache, opening it if necessary.
+
+    Returns:
+      sqlite3.Connection: The connection to the cache.
+    """
+    if self.cache_conn is not None and self.cache_conn_pid == os.getpid():
+      return self.cache_conn
+
+    cache_conn = sqlite3.connect(self.cache_database, check_same_thread=False)
+    cache_conn.execute('PRAGMA journal_mode=WAL;')
+
+    # Losing the most recently cached pages on a crash is harmless, so skip syncing every commit.
+    cache_conn.execute('PRAGMA synchronous=NORMAL;')
+
+    with cache_conn:
+      cache_conn.execute(
+          'CREATE TABLE IF NOT EXISTS pages_info (id INTEGER PRIMARY KEY, info TEXT NOT NULL, '
+          'fetched_at REAL NOT NULL);')
+      cache_conn.execute(
+          'CREATE INDEX IF NOT EXISTS pages_info_fetched_at_index ON pages_info(fetched_at);')
+
+    self.cache_conn = cache_conn
+    self.cache_conn_pid = os.getpid()
+
+    return cache_conn
+
+  def get_many(self, page_ids):
+    """Returns the cached, unexpired page information for the provided page IDs.
+
+    Args:
+      page_ids: A list of page IDs whose information to fetch.
+
+    Returns:
+      dict(int, dict): A mapping from page ID to page information for the pages which are cached.
+    """
+    page_ids = [int(page_id) for page_id in page_ids]
+    min_fetched_at = time.time() - self.ttl_seconds
+
+    pages_info = {}
+
+    # Stay well below SQLite's limit on the number of bound parameters.
+    for chunk_start_index in range(0, len(page_ids), 500):
+      page_ids_chunk = page_ids[chunk_start_index:chunk_start_index + 500]
+
+      query = 'SELECT id, info FROM pages_info WHERE fetched_at >= ? AND id IN ({0});'.format(
+          ', '.join(['?'] * len(page_ids_chunk)))
+      query_bindings = [min_fetched_at] + page_ids_chunk
+
+      with self.lock:
+        rows = self.get_cache_connection().execute(query, query_bindings).fetchall()
+
+      for page_id, info in rows:
+        pages_info[page_id] = json.loads(info)
+
+    self.hits += len(pages_info)
+    self.misses += len(page_ids) - len(pages_info)
+
+    return pages_info
+
+  def set_many(self, pages_info):
+    """Caches the provided page information and evicts expired and excess entries.
+
+    Args:
+      pages_info: A mapping from page ID to page information.
+
+    Returns:
+      None
+    """
+    if not pages_info:
+      return
+
+    fetched_at = time.time()
+
+    with self.lock, self.get_cache_connection() as cache_conn:
+      cache_conn.executemany(
+          'INSERT OR REPLACE INTO pages_info VALUES (?, ?, ?);',
+          [(page_id, json.dumps(info), fetched_at) for page_id, info in pages_info.items()])
+
+      # Evicting walks the fetched_at index, so only do so periodically.
+      self.sets_count += 1
+      if self.sets_count % PAGE_INFO_CACHE_EVICTION_INTERVAL == 1:
+        cache_conn.execute('DELETE FROM pages_info WHERE fetched_at < ?;',
+                           (fetched_at - self.ttl_seconds,))
+        cache_conn.execute(
+            'DELETE FROM pages_info WHERE fetched_at <= (SELECT fetched_at FROM pages_info '
+            'ORDER BY fetched_at DESC LIMIT 1 OFFSET ?);', (self.max_entries,))
@@ -0,0 +1,96 @@
+"""
+Reachability index built from the strongly connected components of the link graph, used to reject
+searches between pages which have no path between them without searching.
+"""
+
+import os.path
+from bisect import bisect_left
+
+from sdow.graph import load_mmapped_array
+
+
+# Names of the files written by scripts/build_component_files.py into the graph directory.
+COMPONENT_IDS_FILENAME = 'components.ids'
+COMPONENT_FLAGS_FILENAME = 'components.flags'
+COMPONENT_DESCENDANTS_OFFSETS_FILENAME = 'components.descendants_offsets'
+COMPONENT_DESCENDANTS_FILENAME = 'components.descendants'
+
+# Component flags.
+REACHES_LARGEST_COMPONENT = 1
+REACHED_BY_LARGEST_COMPONENT = 2
+HAS_DESCENDANTS = 4
+
+
+class ComponentIndex(object):
+  """Read-only, memory-mapped strongly connected component ID of every page. Components are
+  numbered in reverse topological order, so a page can only reach pages whose component ID is less
+  than or equal to its own."""
+
+  def __init__(self, graph_directory):
+    self.component_ids = load_mmapped_array(
+        os.path.join(graph_directory, COMPONENT_IDS_FILENAME), 'i')
+    self.flags = load_mmapped_array(os.path.join(graph_directory, COMPONENT_FLAGS_FILENAME), 'B')
+    self.descendants_offsets = load_mmapped_array(
+        os.path.join(graph_directory, COMPONENT_DESCENDANTS_OFFSETS_FILENAME), 'q')
+    self.descendants = load_mmapped_array(
+        os.path.join(graph_directory, COMPONENT_DESCENDANTS_FILENAME), 'i')
+
+  @staticmethod
+  def exists(graph_directory):
+    """Returns whether a component index has been built in the provided graph directory.
+
+    Args:
+      graph_directory: The directory containing the graph files.
+
+    Returns:
+      bool: Whether the component index files exist.
+    """
+    return os.path.isfile(os.path.join(graph_directory, COMPONENT_IDS_FILENAME))
+
+  def is_reachable(self, source_page_id, target_page_id):
+    """Returns whether there may be a path from the source to target page.
+
+    Args:
+      source_page_id: The ID of the page at which the path starts.
+      target_page_id: The ID of the page at which the path ends.
+
+    Returns:
+      bool: False if there is no path, or True if there may be one.
+    """
+    if source_page_id >= len(self.component_ids) or target_page_id >= len(self.component_ids):
+      return True
+
+    source_component_id = self.component_ids[source_page_id]
+    target_component_id = self.component_ids[target_page_id]
+
+    if source_component_id == target_component_id:
+      return True
+
+    # Links only ever lead to components with smaller IDs.
+    if source_component_id < target_component_id:
+      return False
+
+    source_flags = self.flags[source_component_id]
+    target_flags = self.flags[target_component_id]
+
+    # If the target page reaches the largest component, any page which reaches the target page
+    # does too.
+    if target_flags & REACHES_LARGEST_COMPONENT and not source_flags & REACHES_LARGEST_COMPONENT:
+      return False
+
+    # If the largest component reaches the source page, it also reaches every page which the source
+    # page reaches.
+    if (source_flags & REACHED_BY_LARGEST_COMPONENT and
+        not target_flags & REACHED_BY_LARGEST_COMPONENT):
+      return False
+
+    # Small components outside of the largest one store every component they reach.
+    if source_flags & HAS_DESCENDANTS:
+      start_offset = self.descendants_offsets[source_component_id]
+      end_offset = self.descendants_offsets[source_component_id + 1]
+      descendants = self.descendants[start_offset:end_offset]
+
+      index = bisect_left(descendants, target_component_id)
+      return index < len(descendants) and descendants[index] == target_component_id
+
+    return True
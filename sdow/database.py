@@ -2,25 +2,171 @@
 Wrapper for reading from and writing to the SDOW database.
 """
 
+import time
 import os.path
 import sqlite3
+from itertools import islice
 
 import sdow.helpers as helpers
-from sdow.breadth_first_search import breadth_first_search
+from sdow.graph import CsrGraph
+from sdow.cache import SearchResultsCache
+from sdow.landmarks import NO_PATH_DISTANCE, LandmarkIndex
+from sdow.components import ComponentIndex
+from sdow.titles import TitleIndex
+from sdow.searches_logger import SearchesLogger
+from sdow.breadth_first_search import (SearchBudgetExceeded, SearchSide, breadth_first_search,
+                                       breadth_first_search_between_sides,
+                                       breadth_first_search_to_many)
+
+try:
+  from sdow.vectorized_breadth_first_search import vectorized_breadth_first_search
+except ImportError:
+  # NumPy is an optional dependency which is only required for vectorized searches.
+  vectorized_breadth_first_search = None
+
+# Approximate maximum memory used by each process's cache of shortest paths results.
+SEARCH_RESULTS_CACHE_SIZE_BYTES = 64 * 1024 * 1024
+
+# Name of the persistent shortest paths results cache, stored next to the searches database.
+SEARCH_RESULTS_CACHE_FILENAME = 'search_results_cache.sqlite'
+
+# Numbers of page IDs bound to each links query. Chunks are padded up to the nearest of these sizes,
+# so SQLite only ever parses a handful of distinct queries and reuses their prepared statements for
+# every chunk of every search, while small frontiers still bind only a few parameters.
+PAGE_IDS_CHUNK_SIZES = (1, 8, 64, 512)
+
+
+def get_page_ids_chunks(page_ids):
+  """Yields the provided page IDs in chunks of at most the largest chunk size, padding each chunk
+  up to the nearest chunk size by repeating its final page ID. Repeated IDs do not change the
+  results of an IN clause.
+
+  Args:
+    page_ids: An iterable of page IDs.
+
+  Yields:
+    tuple(int): A tuple of page IDs whose length is one of PAGE_IDS_CHUNK_SIZES.
+  """
+  page_ids = iter(page_ids)
+  max_chunk_size = PAGE_IDS_CHUNK_SIZES[-1]
+
+  page_ids_chunk = tuple(islice(page_ids, max_chunk_size))
+  while page_ids_chunk:
+    chunk_size = next(size for size in PAGE_IDS_CHUNK_SIZES if size >= len(page_ids_chunk))
+    page_ids_chunk += (page_ids_chunk[-1],) * (chunk_size - len(page_ids_chunk))
+
+    yield page_ids_chunk
+
+    page_ids_chunk = tuple(islice(page_ids, max_chunk_size))
+
+
+def get_page_ids_chunk_placeholders(page_ids_chunk):
+  """Returns the parenthesized query placeholders for the provided chunk of page IDs."""
+  return '({0})'.format(', '.join(['?'] * len(page_ids_chunk)))
+
+
+def group_page_id_pairs(page_id_pairs):
+  """Groups the provided pairs of pages by shared source or target page. Each pair joins the group
+  of whichever of its pages appears in more pairs, preferring the source page.
+
+  Args:
+    page_id_pairs: A list of (source page ID, target page ID) tuples.
+
+  Returns:
+    list((int, bool, list(int))): A list of tuples containing the shared page ID, whether it is
+      the source page of the group's pairs, and the indices of the group's pairs, largest group
+      first.
+  """
+  sources_counts = {}
+  targets_counts = {}
+  for source_page_id, target_page_id in page_id_pairs:
+    sources_counts[source_page_id] = sources_counts.get(source_page_id, 0) + 1
+    targets_counts[target_page_id] = targets_counts.get(target_page_id, 0) + 1
+
+  groups = {}
+  for pair_index, (source_page_id, target_page_id) in enumerate(page_id_pairs):
+    if sources_counts[source_page_id] >= targets_counts[target_page_id]:
+      groups.setdefault((source_page_id, True), []).append(pair_index)
+    else:
+      groups.setdefault((target_page_id, False), []).append(pair_index)
+
+  return sorted([(shared_page_id, is_shared_source, pair_indices)
+                 for (shared_page_id, is_shared_source), pair_indices in groups.items()],
+                key=lambda group: -len(group[2]))
 
 
 class Database(object):
   """Wrapper for connecting to the SDOW database."""
 
-  def __init__(self, sdow_database, searches_database):
+  def __init__(self, sdow_database, searches_database, graph_directory=None,
+               vectorized_search=False, persist_search_results=False,
+               search_results_cache_size_bytes=SEARCH_RESULTS_CACHE_SIZE_BYTES):
     if not os.path.isfile(sdow_database):
       raise IOError('Specified SQLite file "{0}" does not exist.'.format(sdow_database))
 
     if not os.path.isfile(searches_database):
       raise IOError('Specified SQLite file "{0}" does not exist.'.format(searches_database))
 
-    self.sdow_conn = sqlite3.connect(sdow_database, check_same_thread=False)
-    self.searches_conn = sqlite3.connect(searches_database, check_same_thread=False)
+    self.sdow_database = sdow_database
+    self.searches_database = searches_database
+
+    self.open_connections()
+
+    # If provided, searches run against the memory-mapped graph files instead of the links table.
+    self.graph = CsrGraph(graph_directory) if graph_directory is not None else None
+
+    # If one has been built alongside the graph files, a landmark distance index is used to answer
+    # searches between disconnected pages immediately and to prune the pages searched.
+    self.landmark_index = None
+    if graph_directory is not None and LandmarkIndex.exists(graph_directory):
+      self.landmark_index = LandmarkIndex(graph_directory)
+
+    # Likewise, a component index rejects searches between disconnected pages in constant time.
+    self.component_index = None
+    if graph_directory is not None and ComponentIndex.exists(graph_directory):
+      self.component_index = ComponentIndex(graph_directory)
+
+    # A title index resolves page titles and suggests titles without querying the pages table.
+    self.title_index = None
+    if graph_directory is not None and TitleIndex.exists(graph_directory):
+      self.title_index = TitleIndex(graph_directory)
+
+    # If enabled, each level of a search is expanded with NumPy array operations.
+    if vectorized_search and vectorized_breadth_first_search is None:
+      raise ImportError('NumPy must be installed to run vectorized searches.')
+
+    self.vectorized_search = vectorized_search
+    self.max_page_id = None
+    if vectorized_search:
+      if self.graph is not None:
+        self.max_page_id = self.graph.max_page_id
+      else:
+        self.max_page_id = self.fetch_max_page_id()
+
+    # Repeated searches are served from a cache, which can optionally be persisted next to the
+    # searches database and shared by every process.
+    search_results_cache_database = None
+    if persist_search_results:
+      search_results_cache_database = os.path.join(
+          os.path.dirname(searches_database), SEARCH_RESULTS_CACHE_FILENAME)
+
+    self.search_results_cache = SearchResultsCache(
+        search_results_cache_size_bytes, search_results_cache_database, sdow_database)
+
+    # Search results are logged from a background thread so that requests never wait on commits.
+    self.searches_logger = SearchesLogger(searches_database)
+
+  def open_connections(self):
+    """Opens new connections to the SDOW and searches databases.
+
+    SQLite connections must not be used across a fork, so this is called again in each forked
+    server process. Everything else, including the memory-mapped graph files, is shared.
+
+    Returns:
+      None
+    """
+    self.sdow_conn = sqlite3.connect(self.sdow_database, check_same_thread=False)
+    self.searches_conn = sqlite3.connect(self.searches_database, check_same_thread=False)
 
     self.sdow_cursor = self.sdow_conn.cursor()
     self.searches_cursor = self.searches_conn.cursor()
@@ -46,6 +192,15 @@ class Database(object):
     """
     sanitized_page_title = helpers.get_sanitized_page_title(page_title)
 
+    if self.title_index is not None:
+      result = self.title_index.fetch_page(sanitized_page_title)
+
+      if result is None:
+        raise ValueError(
+            'Invalid page title {0} provided. Page title does not exist.'.format(page_title))
+
+      return (result[0], helpers.get_readable_page_title(result[1]), result[2])
+
     query = 'SELECT * FROM pages WHERE title = ? COLLATE NOCASE;'
     query_bindings = (sanitized_page_title,)
     self.sdow_cursor.execute(query, query_bindings)
@@ -69,7 +224,8 @@ class Database(object):
         return (current_page_id, helpers.get_readable_page_title(current_page_title), False)
 
     # If all the results are redirects, use the page to which the first result redirects.
-    query = 'SELECT target_id, title FROM redirects INNER JOIN pages ON pages.id = target_id WHERE source_id = ?;'
+    query = ('SELECT target_id, title FROM redirects INNER JOIN pages ON pages.id = target_id '
+             'WHERE source_id = ?;')
     query_bindings = (results[0][0],)
     self.sdow_cursor.execute(query, query_bindings)
 
@@ -83,6 +239,29 @@ class Database(object):
 
     return (result[0], helpers.get_readable_page_title(result[1]), True)
 
+  def fetch_page_suggestions(self, page_title_prefix, limit):
+    """Returns the most linked pages whose title starts with the provided prefix, ignoring case.
+    Pages reached through a redirect whose title matches are included.
+
+    Args:
+      page_title_prefix: The prefix of the titles to suggest.
+      limit: The maximum number of pages to return.
+
+    Returns:
+      list((int, str)): The ID and title of each suggested page, most linked first.
+
+    Raises:
+      ValueError: If the provided prefix is invalid or if no title index is loaded.
+    """
+    sanitized_page_title_prefix = helpers.get_sanitized_page_title_prefix(page_title_prefix)
+
+    if self.title_index is None:
+      raise ValueError('Page suggestions require a title index.')
+
+    return [(page_id, helpers.get_readable_page_title(page_title))
+            for page_id, page_title in self.title_index.fetch_page_suggestions(
+                sanitized_page_title_prefix, limit)]
+
   def fetch_page_title(self, page_id):
     """Returns the page title corresponding to the provided page ID.
 
@@ -97,11 +276,11 @@ class Database(object):
     """
     helpers.validate_page_id(page_id)
 
+    # This can be called from page information fetching threads while a search is using the shared
+    # cursor, so use a dedicated cursor.
     query = 'SELECT title FROM pages WHERE id = ?;'
     query_bindings = (page_id,)
-    self.sdow_cursor.execute(query, query_bindings)
-
-    page_title = self.sdow_cursor.fetchone()
+    page_title = self.sdow_conn.execute(query, query_bindings).fetchone()
 
     if not page_title:
       raise ValueError(
@@ -109,7 +288,8 @@ class Database(object):
 
     return page_title[0].replace('_', ' ')
 
-  def compute_shortest_paths(self, source_page_id, target_page_id):
+  def compute_shortest_paths(self, source_page_id, target_page_id, max_paths=None,
+                             search_budget=None):
     """Returns a list of page IDs indicating the shortest path between the source and target pages.
 
     Note: the provided page IDs must correspond to non-redirect pages, but that check is not made
@@ -118,18 +298,183 @@ class Database(object):
     Args:
       source_page_id: The ID corresponding to the page at which to start the search.
       target_page_id: The ID corresponding to the page at which to end the search.
+      max_paths: The maximum number of paths to return, or None to return all of them.
+      search_budget: An optional SearchBudget limiting the work done by the search.
 
     Returns:
-      list(list(int)): A list of integer lists corresponding to the page IDs indicating the shortest path
-        between the source and target page IDs.
+      (list(list(int)), int): A tuple containing a list of integer lists corresponding to the page
+        IDs indicating the shortest paths between the source and target page IDs, and the total
+        number of shortest paths, which can exceed the number of paths returned.
 
     Raises:
       ValueError: If either of the provided page IDs are invalid.
+      SearchBudgetExceeded: If the search exceeded one of the provided search budget's limits.
     """
     helpers.validate_page_id(source_page_id)
     helpers.validate_page_id(target_page_id)
 
-    return breadth_first_search(source_page_id, target_page_id, self)
+    cached_result = self.search_results_cache.get(source_page_id, target_page_id, max_paths)
+    if cached_result is not None:
+      return cached_result
+
+    links_database = self if self.graph is None else self.graph
+
+    if not self.is_reachable(source_page_id, target_page_id):
+      paths, paths_count = ([], 0)
+    elif self.vectorized_search:
+      paths, paths_count = vectorized_breadth_first_search(
+          source_page_id, target_page_id, links_database, self.max_page_id, max_paths,
+          search_budget)
+    else:
+      paths, paths_count = breadth_first_search(
+          source_page_id, target_page_id, links_database, max_paths, search_budget,
+          self.landmark_index)
+
+    self.search_results_cache.set(source_page_id, target_page_id, paths, paths_count)
+
+    return (paths, paths_count)
+
+  def compute_shortest_paths_batch(self, page_id_pairs, max_paths=None, get_search_budget=None):
+    """Lazily computes the shortest paths between many pairs of pages.
+
+    Pairs are grouped by shared source or target page, and each group runs its searches against a
+    single forward or backward search side, so the levels around the shared page are only
+    expanded once.
+
+    Args:
+      page_id_pairs: A list of (source page ID, target page ID) tuples.
+      max_paths: The maximum number of paths to return per pair, or None to return all of them.
+      get_search_budget: An optional function which returns a new SearchBudget for each search,
+        so that one expensive pair cannot use up the budget of the others.
+
+    Returns:
+      iterator(int, tuple): An iterator of tuples containing the index of a pair and either a tuple
+        of its shortest paths and total number of shortest paths, or the SearchBudgetExceeded error
+        which stopped its search. Pairs are yielded as soon as they complete, in no set order.
+
+    Raises:
+      ValueError: If any of the provided page IDs are invalid.
+    """
+    for source_page_id, target_page_id in page_id_pairs:
+      helpers.validate_page_id(source_page_id)
+      helpers.validate_page_id(target_page_id)
+
+    links_database = self if self.graph is None else self.graph
+
+    for shared_page_id, is_shared_source, pair_indices in group_page_id_pairs(page_id_pairs):
+      if is_shared_source:
+        shared_side = SearchSide(shared_page_id, links_database, 'outgoing_links')
+      else:
+        shared_side = SearchSide(shared_page_id, links_database, 'incoming_links')
+
+      for pair_index in pair_indices:
+        source_page_id, target_page_id = page_id_pairs[pair_index]
+
+        result = self.search_results_cache.get(source_page_id, target_page_id, max_paths)
+
+        if result is None and not self.is_reachable(source_page_id, target_page_id):
+          result = ([], 0)
+          self.search_results_cache.set(source_page_id, target_page_id, [], 0)
+
+        elif result is None:
+          if is_shared_source:
+            forward_side = shared_side
+            backward_side = SearchSide(target_page_id, links_database, 'incoming_links')
+          else:
+            forward_side = SearchSide(source_page_id, links_database, 'outgoing_links')
+            backward_side = shared_side
+
+          search_budget = None if get_search_budget is None else get_search_budget()
+          try:
+            result = breadth_first_search_between_sides(
+                forward_side, backward_side, max_paths, search_budget)
+          except SearchBudgetExceeded as error:
+            yield (pair_index, error)
+            continue
+
+          self.search_results_cache.set(source_page_id, target_page_id, result[0], result[1])
+
+        yield (pair_index, result)
+
+  def compute_shortest_paths_to_many(self, source_page_id, target_page_ids, max_degrees=None,
+                                     max_paths=None, search_budget=None):
+    """Returns the shortest paths from the source page to each of the target pages, computed with a
+    single forward search.
+
+    Args:
+      source_page_id: The ID corresponding to the page at which to start the search.
+      target_page_ids: A list of IDs corresponding to the pages at which paths may end.
+      max_degrees: The maximum number of degrees to search, or None for no limit.
+      max_paths: The maximum number of paths to return per target page, or None to return all of
+        them.
+      search_budget: An optional SearchBudget limiting the work done by the search.
+
+    Returns:
+      dict(int, (int, list(list(int)), int)): A mapping from each target page ID to a tuple
+        containing the number of degrees from the source page, or None if it was not reached, the
+        shortest paths, and the total number of shortest paths.
+
+    Raises:
+      ValueError: If any of the provided page IDs are invalid.
+      SearchBudgetExceeded: If the search exceeded one of the provided search budget's limits.
+    """
+    helpers.validate_page_id(source_page_id)
+    for target_page_id in target_page_ids:
+      helpers.validate_page_id(target_page_id)
+
+    # Leave out the target pages which the indexes prove cannot be reached, so that the search does
+    # not keep going in the hope of reaching them.
+    reachable_target_page_ids = [
+        target_page_id for target_page_id in target_page_ids
+        if self.is_reachable(source_page_id, target_page_id)
+    ]
+
+    links_database = self if self.graph is None else self.graph
+
+    results = breadth_first_search_to_many(source_page_id, reachable_target_page_ids,
+                                           links_database, max_degrees, max_paths, search_budget)
+
+    for target_page_id in target_page_ids:
+      if target_page_id not in results:
+        results[target_page_id] = (None, [], 0)
+        self.search_results_cache.set(source_page_id, target_page_id, [], 0)
+
+      elif results[target_page_id][0] is not None:
+        _, paths, paths_count = results[target_page_id]
+        self.search_results_cache.set(source_page_id, target_page_id, paths, paths_count)
+
+    return results
+
+  def is_reachable(self, source_page_id, target_page_id):
+    """Returns whether there may be a path between the provided pages, according to the component
+    and landmark indexes, without running a search.
+
+    Args:
+      source_page_id: The ID of the page at which the path starts.
+      target_page_id: The ID of the page at which the path ends.
+
+    Returns:
+      bool: False if there is no path, or True if there may be one.
+    """
+    if (self.component_index is not None and
+        not self.component_index.is_reachable(source_page_id, target_page_id)):
+      return False
+
+    if (self.landmark_index is not None and self.landmark_index.get_distance_bounds(
+        source_page_id, target_page_id)[0] == NO_PATH_DISTANCE):
+      return False
+
+    return True
+
+  def fetch_max_page_id(self):
+    """Returns the largest page ID in the links table.
+
+    Returns:
+      int: The largest page ID which has links.
+    """
+    self.sdow_cursor.execute('SELECT MAX(id) FROM links;')
+
+    return self.sdow_cursor.fetchone()[0] or 0
 
   def fetch_outgoing_links_count(self, page_ids):
     """Returns the sum of outgoing links of the provided page IDs.
@@ -162,14 +507,17 @@ class Database(object):
     Returns:
       int: The count of outgoing or incoming links.
     """
-    page_ids = str(tuple(page_ids)).replace(',)', ')')
+    links_count = 0
+    for page_ids_chunk in get_page_ids_chunks(page_ids):
+      # There is no need to escape the query parameters here since they are never user-defined.
+      query = 'SELECT SUM({0}) FROM links WHERE id IN {1};'.format(
+          incoming_or_outgoing_links_count, get_page_ids_chunk_placeholders(page_ids_chunk))
+      self.sdow_cursor.execute(query, page_ids_chunk)
 
-    # There is no need to escape the query parameters here since they are never user-defined.
-    query = 'SELECT SUM({0}) FROM links WHERE id IN {1};'.format(
-        incoming_or_outgoing_links_count, page_ids)
-    self.sdow_cursor.execute(query)
+      # The sum is NULL if none of the pages have a row in the links table.
+      links_count += self.sdow_cursor.fetchone()[0] or 0
 
-    return self.sdow_cursor.fetchone()[0]
+    return links_count
 
   def fetch_outgoing_links(self, page_ids):
     """Returns a list of tuples of page IDs representing outgoing links from the list of provided
@@ -179,8 +527,8 @@ class Database(object):
       page_ids: A list of page IDs whose outgoing links to fetch.
 
     Returns:
-      list(int, int): A lists of integer tuples representing outgoing links from the list of
-        provided page IDs to other pages.
+      iterator(int, list(int)): An iterator of tuples containing each page ID and the IDs of the
+        pages to which it links.
     """
     return self.fetch_links_helper(page_ids, 'outgoing_links')
 
@@ -192,8 +540,8 @@ class Database(object):
       page_ids: A list of page IDs whose incoming links to fetch.
 
     Returns:
-      list(int, int): A lists of integer tuples representing incoming links from the list of
-        provided page IDs to other pages.
+      iterator(int, list(int)): An iterator of tuples containing each page ID and the IDs of the
+        pages which link to it.
     """
     return self.fetch_links_helper(page_ids, 'incoming_links')
 
@@ -207,23 +555,21 @@ class Database(object):
         incoming ("target_id") links.
 
     Returns:
-      list(int, int): A cursor of a lists of integer tuples representing links from the list of
-        provided page IDs to other pages.
+      iterator(int, list(int)): An iterator of tuples containing each page ID and the IDs of the
+        pages it links to or which link to it, streamed back one chunk of page IDs at a time.
     """
-    # Convert the page IDs into a string surrounded by parentheses for insertion into the query
-    # below. The replace() bit is some hackery to handle Python printing a trailing ',' when there
-    # is only one key.
-    page_ids = str(tuple(page_ids)).replace(',)', ')')
-
-    # There is no need to escape the query parameters here since they are never user-defined.
-    query = 'SELECT id, {0} FROM links WHERE id IN {1};'.format(
-        outcoming_or_incoming_links, page_ids)
-    self.sdow_cursor.execute(query)
+    for page_ids_chunk in get_page_ids_chunks(page_ids):
+      # There is no need to escape the query parameters here since they are never user-defined.
+      query = 'SELECT id, {0} FROM links WHERE id IN {1};'.format(
+          outcoming_or_incoming_links, get_page_ids_chunk_placeholders(page_ids_chunk))
 
-    return self.sdow_cursor
+      # Each chunk gets its own cursor so that its rows can be streamed back while other queries
+      # run.
+      for page_id, links in self.sdow_conn.execute(query, page_ids_chunk):
+        yield (page_id, helpers.get_page_ids_from_links(links))
 
   def insert_result(self, search):
-    """Inserts a new search result into the searches table.
+    """Queues a new search result to be inserted into the searches table, without blocking.
 
     Args:
       results: A dictionary containing search information.
@@ -231,20 +577,25 @@ class Database(object):
     Returns: 
       None
     """
-    paths_count = len(search['paths'])
+    paths_count = search.get('paths_count', len(search['paths']))
 
     if paths_count == 0:
-      degrees_count = 'NULL'
+      degrees_count = None
     else:
       degrees_count = len(search['paths'][0]) - 1
 
-    # There is no need to escape the query parameters here since they are never user-defined.
-    query = 'INSERT INTO searches VALUES ({source_id}, {target_id}, {duration}, {degrees_count}, {paths_count}, CURRENT_TIMESTAMP);'.format(
-        source_id=search['source_id'],
-        target_id=search['target_id'],
-        duration=search['duration'],
-        degrees_count=degrees_count,
-        paths_count=paths_count,
-    )
-    self.searches_conn.execute(query)
-    self.searches_conn.commit()
+    # Rows are written in batches by a background thread, so record the time of the search now in
+    # the same format as SQLite's CURRENT_TIMESTAMP.
+    timestamp = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime())
+
+    self.searches_logger.log((search['source_id'], search['target_id'], search['duration'],
+                              degrees_count, paths_count, timestamp))
+
+  def flush_results(self):
+    """Blocks until every search result passed to insert_result() has been written to the searches
+    table and stops the background writer.
+
+    Returns:
+      None
+    """
+    self.searches_logger.close()
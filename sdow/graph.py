@@ -0,0 +1,171 @@
+"""
+Memory-mapped compressed sparse row (CSR) representation of the Wikipedia link graph, usable in
+place of the SQLite links table when running a breadth-first search.
+"""
+
+import mmap
+import os.path
+import sys
+
+
+# Names of the files written by scripts/build_graph_files.py for each link direction. Each
+# direction consists of an offsets file (little-endian int64, indexed by page ID) and a neighbors
+# file (little-endian int32 page IDs).
+OFFSETS_FILE_SUFFIX = '.offsets'
+NEIGHBORS_FILE_SUFFIX = '.neighbors'
+OUTGOING_LINKS_FILE_PREFIX = 'outgoing_links'
+INCOMING_LINKS_FILE_PREFIX = 'incoming_links'
+
+
+def load_mmapped_array(filename, typecode):
+  """Returns a read-only, memory-mapped view of the provided binary file.
+
+  Args:
+    filename: The binary file to map into memory.
+    typecode: The array typecode (e.g. "i" or "q") of the values stored in the file.
+
+  Returns:
+    memoryview: A memoryview of the file's contents cast to the provided typecode.
+
+  Raises:
+    IOError: If the provided file does not exist.
+  """
+  if not os.path.isfile(filename):
+    raise IOError('Specified graph file "{0}" does not exist.'.format(filename))
+
+  with open(filename, 'rb') as f:
+    # Empty files cannot be memory-mapped.
+    if os.fstat(f.fileno()).st_size == 0:
+      return memoryview(b'').cast(typecode)
+
+    # The mapping stays valid after the file is closed. Since it is read-only, its pages are shared
+    # with every other process which maps the same file.
+    mapped_file = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+  return memoryview(mapped_file).cast(typecode)
+
+
+class CsrGraph(object):
+  """Read-only link graph backed by memory-mapped CSR files. Exposes the same link fetching methods
+  as Database so that it can be passed directly to breadth_first_search()."""
+
+  def __init__(self, graph_directory):
+    if not os.path.isdir(graph_directory):
+      raise IOError('Specified graph directory "{0}" does not exist.'.format(graph_directory))
+
+    # The graph files are written in little-endian byte order and are read without copying.
+    if sys.byteorder != 'little':
+      raise IOError('Graph files can only be read on little-endian machines.')
+
+    self.outgoing_offsets, self.outgoing_neighbors = self.load_links_files(
+        graph_directory, OUTGOING_LINKS_FILE_PREFIX)
+    self.incoming_offsets, self.incoming_neighbors = self.load_links_files(
+        graph_directory, INCOMING_LINKS_FILE_PREFIX)
+
+    # The offsets arrays contain one entry per page ID, plus a trailing end offset.
+    self.max_page_id = len(self.outgoing_offsets) - 2
+
+  @staticmethod
+  def load_links_files(graph_directory, outgoing_or_incoming_links):
+    """Returns the memory-mapped offsets and neighbors arrays for one link direction.
+
+    Args:
+      graph_directory: The directory containing the graph files.
+      outgoing_or_incoming_links: The file prefix of the link direction to load.
+
+    Returns:
+      (memoryview, memoryview): The offsets and neighbors arrays.
+    """
+    offsets = load_mmapped_array(os.path.join(
+        graph_directory, outgoing_or_incoming_links + OFFSETS_FILE_SUFFIX), 'q')
+    neighbors = load_mmapped_array(os.path.join(
+        graph_directory, outgoing_or_incoming_links + NEIGHBORS_FILE_SUFFIX), 'i')
+
+    return (offsets, neighbors)
+
+  def fetch_outgoing_links_count(self, page_ids):
+    """Returns the sum of outgoing links of the provided page IDs.
+
+    Args:
+      page_ids: A list of page IDs whose outgoing links to count.
+
+    Returns:
+      int: The count of outgoing links.
+    """
+    return self.fetch_links_count_helper(page_ids, self.outgoing_offsets)
+
+  def fetch_incoming_links_count(self, page_ids):
+    """Returns the sum of incoming links for the provided page IDs.
+
+    Args:
+      page_ids: A list of page IDs whose incoming links to count.
+
+    Returns:
+      int: The count of incoming links.
+    """
+    return self.fetch_links_count_helper(page_ids, self.incoming_offsets)
+
+  def fetch_links_count_helper(self, page_ids, offsets):
+    """Returns the sum of outgoing or incoming links for the provided page IDs.
+
+    Args:
+      page_ids: A list of page IDs whose outgoing or incoming links to count.
+      offsets: The offsets array of the link direction to count.
+
+    Returns:
+      int: The count of outgoing or incoming links.
+    """
+    links_count = 0
+    pages_count = len(offsets) - 1
+
+    for page_id in page_ids:
+      if page_id < pages_count:
+        links_count += offsets[page_id + 1] - offsets[page_id]
+
+    return links_count
+
+  def fetch_outgoing_links(self, page_ids):
+    """Returns the outgoing links from the provided page IDs to other pages.
+
+    Args:
+      page_ids: A list of page IDs whose outgoing links to fetch.
+
+    Returns:
+      iterator(int, memoryview): An iterator of tuples containing each page ID and the IDs of the
+        pages to which it links.
+    """
+    return self.fetch_links_helper(page_ids, self.outgoing_offsets, self.outgoing_neighbors)
+
+  def fetch_incoming_links(self, page_ids):
+    """Returns the incoming links to the provided page IDs from other pages.
+
+    Args:
+      page_ids: A list of page IDs whose incoming links to fetch.
+
+    Returns:
+      iterator(int, memoryview): An iterator of tuples containing each page ID and the IDs of the
+        pages which link to it.
+    """
+    return self.fetch_links_helper(page_ids, self.incoming_offsets, self.incoming_neighbors)
+
+  def fetch_links_helper(self, page_ids, offsets, neighbors):
+    """Helper function which handles duplicate logic for fetch_outgoing_links() and
+    fetch_incoming_links().
+
+    Args:
+      page_ids: A list of page IDs whose links to fetch.
+      offsets: The offsets array of the link direction to fetch.
+      neighbors: The neighbors array of the link direction to fetch.
+
+    Returns:
+      iterator(int, memoryview): An iterator of tuples containing each page ID and a zero-copy
+        slice of its neighboring page IDs. Pages without any links are skipped.
+    """
+    pages_count = len(offsets) - 1
+
+    for page_id in page_ids:
+      if page_id < pages_count:
+        start_offset = offsets[page_id]
+        end_offset = offsets[page_id + 1]
+        if start_offset != end_offset:
+          yield (page_id, neighbors[start_offset:end_offset])
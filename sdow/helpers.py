@@ -2,92 +2,252 @@
 Helper classes and methods.
 """
 
+import os
+import sys
+from array import array
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 
 WIKIPEDIA_API_URL = 'https://en.wikipedia.org/w/api.php'
 
+# Connect and read timeouts for MediaWiki API requests, in seconds.
+WIKIPEDIA_API_TIMEOUT_SECONDS = (3.05, 10)
 
-def fetch_wikipedia_pages_info(page_ids, database):
-  """Fetched page information such as title, URL, and image thumbnail URL for the provided page IDs.
+# Maximum number of times a failed MediaWiki API request is retried.
+WIKIPEDIA_API_MAX_RETRIES = 2
+
+# Maximum number of MediaWiki API requests in flight at once, per process.
+WIKIPEDIA_API_MAX_CONCURRENT_REQUESTS = 8
+
+# Per-process MediaWiki API session and thread pools, created on first use.
+wikipedia_api_session = None
+wikipedia_api_session_pid = None
+wikipedia_api_executors = None
+wikipedia_api_executors_pid = None
+
+
+def get_wikipedia_api_session():
+  """Returns this process's pooled, keep-alive HTTP session for the MediaWiki API, which retries
+  failed requests a bounded number of times.
+
+  Returns:
+    requests.Session: The MediaWiki API session.
+  """
+  global wikipedia_api_session, wikipedia_api_session_pid
+
+  # Sockets cannot be shared across forked processes, so each process creates its own session.
+  if wikipedia_api_session is None or wikipedia_api_session_pid != os.getpid():
+    retry = Retry(
+        total=WIKIPEDIA_API_MAX_RETRIES,
+        backoff_factor=0.2,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=('GET',),
+    )
+    adapter = HTTPAdapter(
+        pool_connections=1, pool_maxsize=WIKIPEDIA_API_MAX_CONCURRENT_REQUESTS, max_retries=retry)
+
+    wikipedia_api_session = requests.Session()
+    wikipedia_api_session.mount('https://', adapter)
+
+    # Identify this client as per Wikipedia API guidelines.
+    # https://www.mediawiki.org/wiki/API:Main_page#Identifying_your_client
+    wikipedia_api_session.headers['User-Agent'] = (
+        'Six Degrees of Wikipedia/1.0 (https://www.sixdegreesofwikipedia.com/; '
+        'wenger.jacob@gmail.com)')
+
+    wikipedia_api_session_pid = os.getpid()
+
+  return wikipedia_api_session
+
+
+def get_wikipedia_api_executors():
+  """Returns this process's thread pools for fetching MediaWiki API batches and for prefetching
+  page information in the background.
+
+  Returns:
+    (ThreadPoolExecutor, ThreadPoolExecutor): The batch and prefetch thread pools.
+  """
+  global wikipedia_api_executors, wikipedia_api_executors_pid
+
+  # Threads do not survive forking, so each process creates its own thread pools. Prefetches get
+  # their own pool since they wait on batches submitted to the batch pool.
+  if wikipedia_api_executors is None or wikipedia_api_executors_pid != os.getpid():
+    wikipedia_api_executors = (
+        ThreadPoolExecutor(max_workers=WIKIPEDIA_API_MAX_CONCURRENT_REQUESTS),
+        ThreadPoolExecutor(max_workers=WIKIPEDIA_API_MAX_CONCURRENT_REQUESTS),
+    )
+    wikipedia_api_executors_pid = os.getpid()
+
+  return wikipedia_api_executors
+
+
+def fetch_wikipedia_pages_info_batch(page_ids, database):
+  """Fetches page information for a single batch of at most 50 page IDs from the MediaWiki API.
 
   Args:
-    page_title: The page title to validate.
+    page_ids: The list of page IDs whose information to fetch.
+    database: The Database instance used to look up the titles of deleted pages.
 
   Returns:
-    None
+    dict(int, dict): A mapping from page ID to page information.
 
   Raises:
-    ValueError: If the provided page title is invalid.
+    ValueError: If the MediaWiki API response is invalid.
   """
+  query_params = {
+      'action': 'query',
+      'format': 'json',
+      'pageids': '|'.join(page_ids),
+      'prop': 'info|pageimages|pageterms',
+      'inprop': 'url|displaytitle',
+      'piprop': 'thumbnail',
+      'pithumbsize': 160,
+      'pilimit': 50,
+      'wbptterms': 'description',
+  }
+
+  req = get_wikipedia_api_session().get(
+      WIKIPEDIA_API_URL, params=query_params, timeout=WIKIPEDIA_API_TIMEOUT_SECONDS)
+
+  try:
+    pages_result = req.json().get('query', {}).get('pages')
+  except ValueError as error:
+    # Wrap error message and re-raise exception.
+    error_message = f"Failed to decode MediaWiki API response: {error}"
+    raise ValueError(error_message) from error
+
+  if (pages_result is None):
+    raise ValueError('Empty MediaWiki API response')
+
   pages_info = {}
 
-  current_page_ids_index = 0
-  while current_page_ids_index < len(page_ids):
-    # Query at most 50 pages per request (given WikiMedia API limits)
-    end_page_ids_index = min(current_page_ids_index + 50, len(page_ids))
-
-    query_params = {
-        'action': 'query',
-        'format': 'json',
-        'pageids': '|'.join(page_ids[current_page_ids_index:end_page_ids_index]),
-        'prop': 'info|pageimages|pageterms',
-        'inprop': 'url|displaytitle',
-        'piprop': 'thumbnail',
-        'pithumbsize': 160,
-        'pilimit': 50,
-        'wbptterms': 'description',
-    }
-
-    current_page_ids_index = end_page_ids_index
+  for page_id, page in pages_result.items():
+    page_id = int(page_id)
+
+    if 'missing' in page:
+      # If the page has been deleted since the current Wikipedia database dump, fetch the page
+      # title from the SDOW database and create the (albeit broken) URL.
+      page_title = database.fetch_page_title(page_id)
+      pages_info[page_id] = {
+          'id': page_id,
+          'title': page_title,
+          'url': 'https://en.wikipedia.org/wiki/{0}'.format(page_title)
+      }
+    else:
+      pages_info[page_id] = {
+          'title': page['title'],
+          'url': page['fullurl']
+      }
+
+      thumbnail_url = page.get('thumbnail', {}).get('source')
+      if thumbnail_url:
+        pages_info[page_id]['thumbnailUrl'] = thumbnail_url
+
+      description = page.get('terms', {}).get('description', [])
+      if description:
+        pages_info[page_id]['description'] = description[0][0].upper() + description[0][1:]
 
-    # Identify this client as per Wikipedia API guidelines.
-    # https://www.mediawiki.org/wiki/API:Main_page#Identifying_your_client
-    headers = {
-        'User-Agent': 'Six Degrees of Wikipedia/1.0 (https://www.sixdegreesofwikipedia.com/; wenger.jacob@gmail.com)',
-    }
-
-    req = requests.get(WIKIPEDIA_API_URL, params=query_params, headers=headers)
-
-    try:
-      pages_result = req.json().get('query', {}).get('pages')
-    except ValueError as error:
-      # Wrap error message and re-raise exception.
-      error_message = f"Failed to decode MediaWiki API response: {error}"
-      raise ValueError(error_message) from error
-    
-    if (pages_result is None):
-      raise ValueError('Empty MediaWiki API response')
-
-    for page_id, page in pages_result.items():
-      page_id = int(page_id)
-
-      if 'missing' in page:
-        # If the page has been deleted since the current Wikipedia database dump, fetch the page
-        # title from the SDOW database and create the (albeit broken) URL.
-        page_title = database.fetch_page_title(page_id)
-        pages_info[page_id] = {
-            'id': page_id,
-            'title': page_title,
-            'url': 'https://en.wikipedia.org/wiki/{0}'.format(page_title)
-        }
-      else:
-        pages_info[page_id] = {
-            'title': page['title'],
-            'url': page['fullurl']
-        }
-
-        thumbnail_url = page.get('thumbnail', {}).get('source')
-        if thumbnail_url:
-          pages_info[page_id]['thumbnailUrl'] = thumbnail_url
-
-        description = page.get('terms', {}).get('description', [])
-        if description:
-          pages_info[page_id]['description'] = description[0][0].upper() + description[0][1:]
+  return pages_info
+
+
+def iter_wikipedia_pages_info(page_ids, database, page_info_cache=None):
+  """Lazily fetches page information such as title, URL, and image thumbnail URL for the provided
+  page IDs, yielding it as each batch becomes available.
+
+  Batches of page IDs are fetched from the MediaWiki API concurrently. If the iterator is closed
+  early, the batches which have not started yet are cancelled.
+
+  Args:
+    page_ids: The list of page IDs whose information to fetch.
+    database: The Database instance used to look up the titles of deleted pages.
+    page_info_cache: Optional PageInfoCache. Only pages missing from it are fetched from the
+      MediaWiki API, after which they are added to it.
+
+  Returns:
+    iterator(dict(int, dict)): An iterator of mappings from page ID to page information, starting
+      with the cached pages, if any, followed by one per batch in the order they complete.
+
+  Raises:
+    ValueError: If the MediaWiki API response is invalid.
+  """
+  if page_info_cache is not None:
+    cached_pages_info = page_info_cache.get_many(page_ids)
+    page_ids = [page_id for page_id in page_ids if int(page_id) not in cached_pages_info]
+    if cached_pages_info:
+      yield cached_pages_info
+
+  # Query at most 50 pages per request (given WikiMedia API limits).
+  page_ids_batches = [page_ids[index:index + 50] for index in range(0, len(page_ids), 50)]
+
+  if len(page_ids_batches) == 1:
+    # Avoid the thread pool overhead when there is only a single batch.
+    batches_pages_info = [fetch_wikipedia_pages_info_batch(page_ids_batches[0], database)]
+    futures = []
+  else:
+    batch_executor, _ = get_wikipedia_api_executors()
+    futures = [
+        batch_executor.submit(fetch_wikipedia_pages_info_batch, batch_page_ids, database)
+        for batch_page_ids in page_ids_batches
+    ]
+    batches_pages_info = (future.result() for future in as_completed(futures))
+
+  try:
+    for batch_pages_info in batches_pages_info:
+      if page_info_cache is not None:
+        page_info_cache.set_many(batch_pages_info)
+      yield batch_pages_info
+  finally:
+    for future in futures:
+      future.cancel()
+
+
+def fetch_wikipedia_pages_info(page_ids, database, page_info_cache=None):
+  """Fetched page information such as title, URL, and image thumbnail URL for the provided page IDs.
+
+  Batches of page IDs are fetched from the MediaWiki API concurrently.
+
+  Args:
+    page_ids: The list of page IDs whose information to fetch.
+    database: The Database instance used to look up the titles of deleted pages.
+    page_info_cache: Optional PageInfoCache. Only pages missing from it are fetched from the
+      MediaWiki API, after which they are added to it.
+
+  Returns:
+    dict(int, dict): A mapping from page ID to page information.
+
+  Raises:
+    ValueError: If the MediaWiki API response is invalid.
+  """
+  pages_info = {}
+
+  for batch_pages_info in iter_wikipedia_pages_info(page_ids, database, page_info_cache):
+    pages_info.update(batch_pages_info)
 
   return pages_info
 
 
+def prefetch_wikipedia_pages_info(page_ids, database, page_info_cache=None):
+  """Starts fetching page information for the provided page IDs in the background, for example
+  while a search is running.
+
+  Args:
+    page_ids: The list of page IDs whose information to fetch.
+    database: The Database instance used to look up the titles of deleted pages.
+    page_info_cache: Optional PageInfoCache, as in fetch_wikipedia_pages_info().
+
+  Returns:
+    concurrent.futures.Future: A future which resolves to a mapping from page ID to page
+      information.
+  """
+  _, prefetch_executor = get_wikipedia_api_executors()
+
+  return prefetch_executor.submit(fetch_wikipedia_pages_info, page_ids, database, page_info_cache)
+
+
 def get_sanitized_page_title(page_title):
   """Validates and returns the sanitized version of the provided page title, transforming it into
   the same format used to store pages titles in the database.
@@ -109,7 +269,34 @@ def get_sanitized_page_title(page_title):
   """
   validate_page_title(page_title)
 
-  return page_title.strip().replace(' ', '_').replace("'", "\\'").replace('"', '\\"')
+  return _escape_page_title(page_title.strip())
+
+
+def get_sanitized_page_title_prefix(page_title_prefix):
+  """Validates and returns the sanitized version of the provided page title prefix, in the same
+  format as get_sanitized_page_title(). Unlike in full titles, trailing whitespace is significant in
+  a prefix and is kept.
+
+  Args:
+    page_title_prefix: The page title prefix to validate and sanitize.
+
+  Returns:
+    The sanitized page title prefix.
+
+  Examples:
+    " Notre Dame "                =>   "Notre_Dame_"
+
+  Raises:
+    ValueError: If the provided page title prefix is invalid or only contains whitespace.
+  """
+  validate_page_title(page_title_prefix.strip() if is_str(page_title_prefix) else page_title_prefix)
+
+  return _escape_page_title(page_title_prefix.lstrip())
+
+
+def _escape_page_title(page_title):
+  """Returns the provided page title with spaces replaced and quotes escaped as in the database."""
+  return page_title.replace(' ', '_').replace("'", "\\'").replace('"', '\\"')
 
 
 def get_readable_page_title(sanitized_page_title):
@@ -130,6 +317,28 @@ def get_readable_page_title(sanitized_page_title):
   return sanitized_page_title.strip().replace('_', ' ').replace("\\'", "'").replace('\\"', '"')
 
 
+def get_page_ids_from_links(links):
+  """Returns the page IDs stored in a links column of the links table, which is either a
+  "|"-separated TEXT value or a packed little-endian int32 BLOB value.
+
+  Args:
+    links: A "|"-separated string of page IDs or a BLOB of packed page IDs.
+
+  Returns:
+    list(int) OR memoryview: The page IDs contained in the provided links. BLOB values are read
+      in place, without copying or parsing.
+  """
+  if isinstance(links, bytes):
+    if sys.byteorder == 'little':
+      return memoryview(links).cast('i')
+
+    page_ids = array('i', links)
+    page_ids.byteswap()
+    return page_ids
+
+  return [int(page_id) for page_id in links.split('|') if page_id]
+
+
 def is_str(val):
   """Returns whether or not the provided value is a string type.
 
@@ -0,0 +1,283 @@
+"""
+Landmark distance index used to bound the number of degrees between two pages before and during a
+search.
+"""
+
+import os.path
+
+from sdow.graph import load_mmapped_array
+
+try:
+  import numpy as np
+except ImportError:
+  # NumPy is an optional dependency which is only required to bound whole frontiers at once.
+  np = None
+
+
+# Names of the files written by scripts/build_landmark_files.py into the graph directory.
+LANDMARK_IDS_FILENAME = 'landmarks.ids'
+LANDMARK_FORWARD_DISTANCES_FILENAME = 'landmarks.forward_distances'
+LANDMARK_BACKWARD_DISTANCES_FILENAME = 'landmarks.backward_distances'
+
+# Distance stored for pages which are not reachable.
+UNREACHABLE_DISTANCE = 255
+
+# Lower bound returned when a landmark proves that there is no path.
+NO_PATH_DISTANCE = float('inf')
+
+
+def get_distance_lower_bound(source_distances, target_distances):
+  """Returns a lower bound on the number of degrees from the source to target page.
+
+  By the triangle inequality, d(source, target) >= d(landmark, target) - d(landmark, source) and
+  d(source, target) >= d(source, landmark) - d(target, landmark) for every landmark. If a landmark
+  reaches the source page but not the target page, or is reached by the target page but not the
+  source page, there is no path at all.
+
+  Args:
+    source_distances: A tuple of the distances from and to each landmark for the source page.
+    target_distances: A tuple of the distances from and to each landmark for the target page.
+
+  Returns:
+    int: The lower bound, or NO_PATH_DISTANCE if there is no path.
+  """
+  lower_bound = 0
+
+  for source_distance, target_distance in zip(source_distances[0], target_distances[0]):
+    if source_distance != UNREACHABLE_DISTANCE:
+      if target_distance == UNREACHABLE_DISTANCE:
+        return NO_PATH_DISTANCE
+      lower_bound = max(lower_bound, target_distance - source_distance)
+
+  for source_distance, target_distance in zip(source_distances[1], target_distances[1]):
+    if target_distance != UNREACHABLE_DISTANCE:
+      if source_distance == UNREACHABLE_DISTANCE:
+        return NO_PATH_DISTANCE
+      lower_bound = max(lower_bound, source_distance - target_distance)
+
+  return lower_bound
+
+
+def get_distance_lower_bounds(source_distances, target_distances):
+  """Returns lower bounds on the number of degrees from many source pages to a target page, or from
+  a source page to many target pages, computed as in get_distance_lower_bound() over all of the
+  pages at once.
+
+  Args:
+    source_distances: A tuple of the distances from and to each landmark for the source pages, as
+      NumPy arrays with one row per page, or one row for a single page.
+    target_distances: A tuple of the distances from and to each landmark for the target pages, as
+      NumPy arrays with one row per page, or one row for a single page.
+
+  Returns:
+    (numpy.ndarray, numpy.ndarray): The lower bound for each page, and whether there is no path
+      from or to each page.
+  """
+  is_forward_reached = source_distances[0] != UNREACHABLE_DISTANCE
+  is_backward_reached = target_distances[1] != UNREACHABLE_DISTANCE
+
+  has_no_path = (
+      np.any(is_forward_reached & (target_distances[0] == UNREACHABLE_DISTANCE), axis=-1) |
+      np.any(is_backward_reached & (source_distances[1] == UNREACHABLE_DISTANCE), axis=-1))
+
+  # Distances are unsigned bytes, so they are widened before being subtracted.
+  lower_bounds = np.maximum(
+      np.where(is_forward_reached,
+               target_distances[0].astype(np.int16) - source_distances[0], 0).max(
+                   axis=-1, initial=0),
+      np.where(is_backward_reached,
+               source_distances[1].astype(np.int16) - target_distances[1], 0).max(
+                   axis=-1, initial=0))
+
+  return (lower_bounds, has_no_path)
+
+
+class LandmarkIndex(object):
+  """Read-only, memory-mapped distances between every page and a set of landmark pages."""
+
+  def __init__(self, graph_directory):
+    self.landmark_page_ids = load_mmapped_array(
+        os.path.join(graph_directory, LANDMARK_IDS_FILENAME), 'i')
+
+    # Both distances arrays store one row of distances per page ID, with one entry per landmark.
+    self.forward_distances = load_mmapped_array(
+        os.path.join(graph_directory, LANDMARK_FORWARD_DISTANCES_FILENAME), 'B')
+    self.backward_distances = load_mmapped_array(
+        os.path.join(graph_directory, LANDMARK_BACKWARD_DISTANCES_FILENAME), 'B')
+
+    self.landmarks_count = len(self.landmark_page_ids)
+    self.pages_count = 0
+    if self.landmarks_count != 0:
+      self.pages_count = len(self.forward_distances) // self.landmarks_count
+
+    # Views of both distances arrays with one row per page, used to bound whole frontiers at once.
+    self.forward_distances_rows = None
+    self.backward_distances_rows = None
+    if np is not None:
+      distances_count = self.pages_count * self.landmarks_count
+      self.forward_distances_rows = np.frombuffer(
+          self.forward_distances, dtype=np.uint8, count=distances_count).reshape(
+              self.pages_count, self.landmarks_count)
+      self.backward_distances_rows = np.frombuffer(
+          self.backward_distances, dtype=np.uint8, count=distances_count).reshape(
+              self.pages_count, self.landmarks_count)
+
+  @staticmethod
+  def exists(graph_directory):
+    """Returns whether a landmark index has been built in the provided graph directory.
+
+    Args:
+      graph_directory: The directory containing the graph files.
+
+    Returns:
+      bool: Whether the landmark index files exist.
+    """
+    return os.path.isfile(os.path.join(graph_directory, LANDMARK_IDS_FILENAME))
+
+  def get_page_distances(self, page_id):
+    """Returns the distances between the provided page and each landmark.
+
+    Args:
+      page_id: The ID of the page whose distances to get.
+
+    Returns:
+      (memoryview, memoryview): The distances from each landmark to the page and from the page to
+        each landmark.
+      OR
+      None: If the page is not in the index.
+    """
+    if page_id >= self.pages_count:
+      return None
+
+    start_index = page_id * self.landmarks_count
+    end_index = start_index + self.landmarks_count
+
+    return (self.forward_distances[start_index:end_index],
+            self.backward_distances[start_index:end_index])
+
+  def get_distance_bounds(self, source_page_id, target_page_id):
+    """Returns lower and upper bounds on the number of degrees from the source to target page. The
+    number of degrees is known exactly when both bounds are equal.
+
+    Args:
+      source_page_id: The ID of the page at which the search starts.
+      target_page_id: The ID of the page at which the search ends.
+
+    Returns:
+      (int, int): The lower bound, or NO_PATH_DISTANCE if there is no path, and the upper bound, or
+        None if no landmark lies on a path from the source to target page.
+    """
+    source_distances = self.get_page_distances(source_page_id)
+    target_distances = self.get_page_distances(target_page_id)
+
+    if source_distances is None or target_distances is None:
+      return (0, None)
+
+    lower_bound = get_distance_lower_bound(source_distances, target_distances)
+
+    # Going through a landmark is never shorter than the shortest path.
+    upper_bound = None
+    for distance_to_landmark, distance_from_landmark in zip(source_distances[1],
+                                                            target_distances[0]):
+      if (distance_to_landmark != UNREACHABLE_DISTANCE and
+          distance_from_landmark != UNREACHABLE_DISTANCE):
+        distance = distance_to_landmark + distance_from_landmark
+        if upper_bound is None or distance < upper_bound:
+          upper_bound = distance
+
+    return (lower_bound, upper_bound)
+
+  def get_distance_lower_bounds_to(self, page_ids, target_page_id):
+    """Returns lower bounds on the number of degrees from each of the provided pages to the target
+    page.
+
+    Args:
+      page_ids: A list of IDs of the pages at which the paths start.
+      target_page_id: The ID of the page at which the paths end.
+
+    Returns:
+      list(int): The lower bound for each page, or NO_PATH_DISTANCE where there is no path.
+    """
+    target_distances = self.get_page_distances(target_page_id)
+    if target_distances is None:
+      return [0] * len(page_ids)
+
+    if self.forward_distances_rows is not None:
+      return self.get_distance_lower_bounds_of_rows(
+          page_ids, lambda rows: get_distance_lower_bounds(rows, (
+              self.forward_distances_rows[target_page_id],
+              self.backward_distances_rows[target_page_id])))
+
+    target_distances = (target_distances[0].tolist(), target_distances[1].tolist())
+
+    lower_bounds = []
+    for page_id in page_ids:
+      page_distances = self.get_page_distances(page_id)
+      if page_distances is None:
+        lower_bounds.append(0)
+      else:
+        lower_bounds.append(get_distance_lower_bound(page_distances, target_distances))
+
+    return lower_bounds
+
+  def get_distance_lower_bounds_from(self, source_page_id, page_ids):
+    """Returns lower bounds on the number of degrees from the source page to each of the provided
+    pages.
+
+    Args:
+      source_page_id: The ID of the page at which the paths start.
+      page_ids: A list of IDs of the pages at which the paths end.
+
+    Returns:
+      list(int): The lower bound for each page, or NO_PATH_DISTANCE where there is no path.
+    """
+    source_distances = self.get_page_distances(source_page_id)
+    if source_distances is None:
+      return [0] * len(page_ids)
+
+    if self.forward_distances_rows is not None:
+      return self.get_distance_lower_bounds_of_rows(
+          page_ids, lambda rows: get_distance_lower_bounds((
+              self.forward_distances_rows[source_page_id],
+              self.backward_distances_rows[source_page_id]), rows))
+
+    source_distances = (source_distances[0].tolist(), source_distances[1].tolist())
+
+    lower_bounds = []
+    for page_id in page_ids:
+      page_distances = self.get_page_distances(page_id)
+      if page_distances is None:
+        lower_bounds.append(0)
+      else:
+        lower_bounds.append(get_distance_lower_bound(source_distances, page_distances))
+
+    return lower_bounds
+
+  def get_distance_lower_bounds_of_rows(self, page_ids, get_lower_bounds):
+    """Returns the lower bounds computed with NumPy from the distances rows of the provided pages,
+    or 0 for pages which are not in the index.
+
+    Args:
+      page_ids: A list of IDs of the pages whose lower bounds to get.
+      get_lower_bounds: A function which returns the lower bounds of, and whether there is no path
+        for, the pages of the provided distances rows.
+
+    Returns:
+      list(int): The lower bound for each page, or NO_PATH_DISTANCE where there is no path.
+    """
+    page_ids = np.fromiter(page_ids, dtype=np.int64, count=len(page_ids))
+    indexed_positions = np.flatnonzero(page_ids < self.pages_count)
+    indexed_page_ids = page_ids[indexed_positions]
+
+    indexed_lower_bounds, has_no_path = get_lower_bounds(
+        (self.forward_distances_rows[indexed_page_ids],
+         self.backward_distances_rows[indexed_page_ids]))
+
+    lower_bounds = np.zeros(len(page_ids), dtype=np.int64)
+    lower_bounds[indexed_positions] = indexed_lower_bounds
+    lower_bounds = lower_bounds.tolist()
+
+    for position in indexed_positions[has_no_path].tolist():
+      lower_bounds[position] = NO_PATH_DISTANCE
+
+    return lower_bounds
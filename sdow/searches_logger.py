@@ -0,0 +1,131 @@
+"""
+Write-behind logger which records search results in the searches database from a background
+thread, keeping SQLite writes and commits out of the request path.
+"""
+
+import os
+import time
+import queue
+import atexit
+import logging
+import sqlite3
+import threading
+
+
+# Maximum number of search results waiting to be written before new ones are dropped.
+MAX_QUEUE_SIZE = 10000
+
+# Maximum number of search results written per commit.
+MAX_BATCH_SIZE = 500
+
+# Maximum time a search result waits before being written, in seconds.
+FLUSH_INTERVAL_SECONDS = 1.0
+
+
+class SearchesLogger(object):
+  """Queues search results in memory and writes them to the searches table in batches from a
+  background thread."""
+
+  def __init__(self, searches_database):
+    self.searches_database = searches_database
+    self.dropped_count = 0
+
+    # Threads do not survive forking, so each process starts its own queue and writer thread.
+    self.queue = None
+    self.thread = None
+    self.thread_pid = None
+    self.lock = threading.Lock()
+
+    atexit.register(self.close)
+
+  def start(self):
+    """Starts this process's writer thread if it is not already running."""
+    with self.lock:
+      if self.thread is not None and self.thread_pid == os.getpid():
+        return
+
+      self.queue = queue.Queue(maxsize=MAX_QUEUE_SIZE)
+      self.thread = threading.Thread(
+          target=self.write_searches, args=(self.queue,), name='SearchesLogger', daemon=True)
+      self.thread_pid = os.getpid()
+      self.thread.start()
+
+  def log(self, search_row):
+    """Queues a row to be inserted into the searches table, without blocking.
+
+    Args:
+      search_row: A tuple of the source ID, target ID, duration, degrees count, paths count, and
+        timestamp of a search.
+
+    Returns:
+      None
+    """
+    self.start()
+
+    try:
+      self.queue.put_nowait(search_row)
+    except queue.Full:
+      # Never slow down searches because the searches database is falling behind.
+      self.dropped_count += 1
+      logging.warning('Searches logger queue is full, dropping search result.')
+
+  def write_searches(self, searches_queue):
+    """Writer thread loop which inserts queued rows in batches, committing once per batch.
+
+    Args:
+      searches_queue: The queue from which to read rows. None signals the thread to stop.
+    """
+    searches_conn = sqlite3.connect(self.searches_database)
+
+    # Readers never block the writer (and vice versa) in WAL mode, and commits only need to be
+    # synced at checkpoints.
+    searches_conn.execute('PRAGMA journal_mode=WAL;')
+    searches_conn.execute('PRAGMA synchronous=NORMAL;')
+
+    is_stopped = False
+    while not is_stopped:
+      search_rows = [searches_queue.get()]
+
+      # Collect whatever else arrives shortly after the first row, up to the batch size.
+      flush_deadline = time.time() + FLUSH_INTERVAL_SECONDS
+      while len(search_rows) < MAX_BATCH_SIZE and search_rows[-1] is not None:
+        try:
+          search_rows.append(searches_queue.get(timeout=max(0, flush_deadline - time.time())))
+        except queue.Empty:
+          break
+
+      if search_rows[-1] is None:
+        is_stopped = True
+
+      try:
+        with searches_conn:
+          searches_conn.executemany(
+              'INSERT INTO searches VALUES (?, ?, ?, ?, ?, ?);',
+              [search_row for search_row in search_rows if search_row is not None])
+      except sqlite3.Error as error:
+        logging.error('An unexpected error occurred while inserting results: {0}'.format(error))
+
+      for _ in search_rows:
+        searches_queue.task_done()
+
+    searches_conn.close()
+
+  def flush(self):
+    """Blocks until every queued row has been written.
+
+    Returns:
+      None
+    """
+    if self.thread is not None and self.thread_pid == os.getpid():
+      self.queue.join()
+
+  def close(self):
+    """Writes every queued row and stops this process's writer thread.
+
+    Returns:
+      None
+    """
+    if self.thread is not None and self.thread_pid == os.getpid():
+      self.queue.put(None)
+      self.thread.join()
+      self.thread = None
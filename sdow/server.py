@@ -2,20 +2,54 @@
 Server web framework.
 """
 
+import os
+import json
 import time
 import logging
 import google.cloud.logging
 
 from flask_cors import CORS
 from flask_compress import Compress
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 
+from sdow.cache import PageInfoCache
 from sdow.database import Database
-from sdow.helpers import InvalidRequest, fetch_wikipedia_pages_info
-
-
-# Connect to the SDOW database.
-database = Database(sdow_database='./sdow.sqlite', searches_database='./searches.sqlite')
+from sdow.breadth_first_search import SearchBudget, SearchBudgetExceeded
+from sdow.helpers import (InvalidRequest, fetch_wikipedia_pages_info, is_positive_int,
+                          iter_wikipedia_pages_info, prefetch_wikipedia_pages_info)
+
+
+# Connect to the SDOW database, searching the memory-mapped graph files if they have been built.
+# Each server process keeps only a small in-process cache of search results, backed by a
+# persistent cache shared by all of them.
+# Setting SDOW_VECTORIZED_SEARCH=1 expands searches with NumPy, which must then be installed.
+graph_directory = './graph' if os.path.isdir('./graph') else None
+database = Database(sdow_database='./sdow.sqlite', searches_database='./searches.sqlite',
+                    graph_directory=graph_directory,
+                    vectorized_search=os.environ.get('SDOW_VECTORIZED_SEARCH') == '1',
+                    persist_search_results=True,
+                    search_results_cache_size_bytes=16 * 1024 * 1024)
+
+# Cache Wikipedia page information for a week, in a file shared by all server processes.
+page_info_cache = PageInfoCache(
+    './page_info_cache.sqlite', ttl_seconds=7 * 24 * 60 * 60, max_entries=500000)
+
+# Limits on each search, so that a single search cannot tie up a worker for long.
+SEARCH_MAX_DURATION_SECONDS = 10
+SEARCH_MAX_LINKS_SCANNED = 50000000
+SEARCH_MAX_FRONTIER_SIZE = 2000000
+
+# Limits on each batch of searches. Each pair of a batch gets the limits of a single search, and the
+# whole batch, like a search to many pages, must end before the worker timeout in
+# config/gunicorn.conf.py and NGINX's proxy timeouts in config/nginx.conf cut its response off.
+BATCH_MAX_PAIRS = 10000
+BATCH_MAX_DURATION_SECONDS = 100
+BATCH_SEARCH_MAX_LINKS_SCANNED = 500000000
+
+# Default and maximum number of pages returned by the suggestions endpoint. The maximum must not
+# exceed the number of suggestions precomputed per prefix by scripts/build_title_files.py.
+SUGGESTIONS_DEFAULT_LIMIT = 10
+SUGGESTIONS_MAX_LIMIT = 50
 
 # Initialize the Flask app.
 app = Flask(__name__)
@@ -29,17 +63,52 @@ CORS(app)
 Compress(app)
 
 
+# Environment in which the app was loaded, and whether init_worker() has run in this process.
+app_environment = 'dev'
+is_worker_initialized = False
+
+
 # Gunicorn entry point.
 def load_app(environment='dev'):
-  # Initialize GCP logging (production only).
-  if environment == 'prod':
-    print('[INFO] Starting app in production mode with remote logging enabled...')
-    logging_client = google.cloud.logging.Client()
-    logging_client.setup_logging()
+  global app_environment
+  app_environment = environment
+
+  # Initialize GCP logging (production only). If the app is being preloaded by the Gunicorn master
+  # process, this is deferred to init_worker() since the logging client's background threads do not
+  # survive forking.
+  if environment == 'prod' and is_worker_initialized:
+    setup_remote_logging()
 
   return app
 
 
+def setup_remote_logging():
+  """Initializes GCP logging."""
+  print('[INFO] Starting app in production mode with remote logging enabled...')
+  logging_client = google.cloud.logging.Client()
+  logging_client.setup_logging()
+
+
+# Gunicorn post-fork entry point.
+def init_worker():
+  """Initializes the per-process state of a newly forked worker. When the master process preloaded
+  the app, the memory-mapped graph files and all other read-only data it loaded are shared with the
+  worker rather than copied, but SQLite connections must be reopened."""
+  global is_worker_initialized
+  is_worker_initialized = True
+
+  database.open_connections()
+
+  if app_environment == 'prod':
+    setup_remote_logging()
+
+
+# Gunicorn worker exit entry point.
+def shutdown_worker():
+  """Writes any search results still queued in this worker before it exits."""
+  database.flush_results()
+
+
 @app.errorhandler(500)
 @app.errorhandler(Exception)
 def unhandled_exception_handler(error):
@@ -76,7 +145,223 @@ def invalid_request_handler(error):
 def ok_endpoint():
   '''Health check endpoint.'''
   return jsonify({
-      'timestamp': int(round(time.time() * 1000))
+      'timestamp': int(round(time.time() * 1000)),
+      'searchResultsCache': database.search_results_cache.get_stats(),
+      'pageInfoCache': {
+          'hits': page_info_cache.hits,
+          'misses': page_info_cache.misses,
+      },
+  })
+
+
+@app.route('/suggest', methods=['GET'])
+def page_suggestions_route():
+  """Endpoint which returns the most linked pages whose title starts with the provided prefix.
+
+    Args:
+      prefix: The case-insensitive prefix of the titles to suggest.
+      limit: Optional maximum number of pages to return.
+
+    Returns:
+      dict: A JSON-ified dictionary containing the suggested pages (represented by a list of
+            dictionaries with the ID and title of each page), most linked first.
+
+    Raises:
+      InvalidRequest: If the provided prefix or limit is invalid, or if suggestions are not
+                      available.
+  """
+  if database.title_index is None:
+    raise InvalidRequest('Page suggestions are not available.', status_code=503)
+
+  # Parse the limit explicitly, since Flask silently falls back to the default for invalid values.
+  limit = request.args.get('limit')
+  try:
+    limit = SUGGESTIONS_DEFAULT_LIMIT if limit is None else int(limit)
+  except ValueError:
+    limit = None
+
+  if limit is None or limit <= 0 or limit > SUGGESTIONS_MAX_LIMIT:
+    raise InvalidRequest(
+        'Limit must be an integer between 1 and {0}.'.format(SUGGESTIONS_MAX_LIMIT))
+
+  try:
+    suggestions = database.fetch_page_suggestions(request.args.get('prefix'), limit)
+  except ValueError:
+    raise InvalidRequest('Prefix must be a non-empty string.')
+
+  return jsonify({
+      'suggestions': [{'id': page_id, 'title': page_title} for page_id, page_title in suggestions],
+  })
+
+
+@app.route('/paths/batch', methods=['POST'])
+def shortest_paths_batch_route():
+  """Endpoint which streams the shortest paths between many pairs of Wikipedia pages.
+
+    Args:
+      pairs: A list of dictionaries containing the source and target titles of each pair.
+      maxPaths: Optional maximum number of paths to return per pair.
+
+    Returns:
+      Response: A newline-delimited JSON stream with one object per pair, sent as soon as its
+                search completes. Each object contains the pair's index and either its resolved
+                titles, shortest paths (represented by a list of lists of page IDs), and total
+                number of shortest paths, or an error.
+
+    Raises:
+      InvalidRequest: If the provided pairs or maximum number of paths are invalid.
+  """
+  batch_deadline = time.time() + BATCH_MAX_DURATION_SECONDS
+
+  pairs = request.json.get('pairs')
+  if not isinstance(pairs, list) or len(pairs) == 0 or len(pairs) > BATCH_MAX_PAIRS or not all(
+      isinstance(pair, dict) for pair in pairs):
+    raise InvalidRequest(
+        'Pairs must be a list of between 1 and {0} source and target pages.'.format(
+            BATCH_MAX_PAIRS))
+
+  max_paths = request.json.get('maxPaths')
+  if max_paths is not None and (isinstance(max_paths, bool) or not is_positive_int(max_paths)):
+    raise InvalidRequest('Maximum number of paths must be a positive integer.')
+
+  # Resolve every title up front, so that invalid pairs are reported without holding up the others.
+  resolved_pairs = []
+  invalid_pairs_lines = []
+  for pair_index, pair in enumerate(pairs):
+    try:
+      source_page_id, source_page_title, _ = database.fetch_page(pair.get('source'))
+      target_page_id, target_page_title, _ = database.fetch_page(pair.get('target'))
+    except ValueError:
+      invalid_pairs_lines.append(json.dumps({
+          'index': pair_index,
+          'error': 'Start or end page does not exist.',
+      }) + '\n')
+      continue
+
+    resolved_pairs.append(
+        (pair_index, source_page_id, source_page_title, target_page_id, target_page_title))
+
+  def generate_results_lines():
+    for line in invalid_pairs_lines:
+      yield line
+
+    def get_search_budget():
+      return SearchBudget(max_duration_seconds=SEARCH_MAX_DURATION_SECONDS,
+                          max_links_scanned=SEARCH_MAX_LINKS_SCANNED,
+                          max_frontier_size=SEARCH_MAX_FRONTIER_SIZE,
+                          deadline=batch_deadline)
+
+    page_id_pairs = [(resolved_pair[1], resolved_pair[3]) for resolved_pair in resolved_pairs]
+    for resolved_pair_index, result in database.compute_shortest_paths_batch(
+        page_id_pairs, max_paths, get_search_budget):
+      pair_index, _, source_page_title, _, target_page_title = resolved_pairs[resolved_pair_index]
+
+      if isinstance(result, SearchBudgetExceeded):
+        yield json.dumps({
+            'index': pair_index,
+            'error': 'Search was stopped before finding a path.',
+            'searchBudgetExceeded': True,
+            'degreesSearched': result.degrees_searched,
+        }) + '\n'
+        continue
+
+      paths, paths_count = result
+      yield json.dumps({
+          'index': pair_index,
+          'sourcePageTitle': source_page_title,
+          'targetPageTitle': target_page_title,
+          'paths': paths,
+          'pathsCount': paths_count,
+      }) + '\n'
+
+  return Response(generate_results_lines(), mimetype='application/x-ndjson')
+
+
+@app.route('/paths/many', methods=['POST'])
+def shortest_paths_to_many_route():
+  """Endpoint which returns the shortest paths from one Wikipedia page to each of many others,
+  computed with a single search.
+
+    Args:
+      source: The title of the page at which to start the search.
+      targets: A list of the titles of the pages at which paths may end.
+      maxDegrees: Optional maximum number of degrees to search.
+      maxPaths: Optional maximum number of paths to return per target page.
+
+    Returns:
+      dict: A JSON-ified dictionary containing the resolved source title and, in the same order as
+            the provided targets, either each target's resolved title, number of degrees (null if
+            it was not reached), shortest paths (represented by a list of lists of page IDs), and
+            total number of shortest paths, or an error.
+
+    Raises:
+      InvalidRequest: If the source page does not exist, if any of the other provided values are
+                      invalid, or if the search exceeded its budget.
+  """
+  batch_deadline = time.time() + BATCH_MAX_DURATION_SECONDS
+
+  targets = request.json.get('targets')
+  if not isinstance(targets, list) or len(targets) == 0 or len(targets) > BATCH_MAX_PAIRS:
+    raise InvalidRequest(
+        'Targets must be a list of between 1 and {0} pages.'.format(BATCH_MAX_PAIRS))
+
+  max_degrees = request.json.get('maxDegrees')
+  if max_degrees is not None and (isinstance(max_degrees, bool) or
+                                  not is_positive_int(max_degrees)):
+    raise InvalidRequest('Maximum number of degrees must be a positive integer.')
+
+  max_paths = request.json.get('maxPaths')
+  if max_paths is not None and (isinstance(max_paths, bool) or not is_positive_int(max_paths)):
+    raise InvalidRequest('Maximum number of paths must be a positive integer.')
+
+  try:
+    source_page_id, source_page_title, _ = database.fetch_page(request.json.get('source'))
+  except ValueError:
+    raise InvalidRequest(
+        'Start page "{0}" does not exist. Please try another search.'.format(
+            request.json.get('source')))
+
+  resolved_targets = []
+  for target in targets:
+    try:
+      resolved_targets.append(database.fetch_page(target))
+    except ValueError:
+      resolved_targets.append(None)
+
+  search_budget = SearchBudget(max_links_scanned=BATCH_SEARCH_MAX_LINKS_SCANNED,
+                               max_frontier_size=SEARCH_MAX_FRONTIER_SIZE,
+                               deadline=batch_deadline)
+  try:
+    results = database.compute_shortest_paths_to_many(
+        source_page_id, [resolved_target[0] for resolved_target in resolved_targets
+                         if resolved_target is not None], max_degrees, max_paths, search_budget)
+  except SearchBudgetExceeded as error:
+    raise InvalidRequest(
+        'Search from "{0}" was stopped before reaching every page. Please try another '
+        'search.'.format(source_page_title), status_code=503, payload={
+            'searchBudgetExceeded': True,
+            'degreesSearched': error.degrees_searched,
+            'linksScanned': search_budget.links_scanned,
+        })
+
+  response_results = []
+  for target, resolved_target in zip(targets, resolved_targets):
+    if resolved_target is None:
+      response_results.append({'error': 'End page "{0}" does not exist.'.format(target)})
+      continue
+
+    target_page_id, target_page_title, _ = resolved_target
+    degrees_count, paths, paths_count = results[target_page_id]
+    response_results.append({
+        'targetPageTitle': target_page_title,
+        'degreesCount': degrees_count,
+        'paths': paths,
+        'pathsCount': paths_count,
+    })
+
+  return jsonify({
+      'sourcePageTitle': source_page_title,
+      'results': response_results,
   })
 
 
@@ -87,23 +372,31 @@ def shortest_paths_route():
     Args:
       source: The title of the page at which to start the search.
       target: The title of the page at which to end the search.
+      maxPaths: Optional maximum number of paths to return.
 
     Returns:
       dict: A JSON-ified dictionary containing the shortest paths (represented by a list of lists of
-            page IDs) and the corresponding pages data (represented by a dictionary of page IDs).
+            page IDs), the total number of shortest paths, and the corresponding pages data
+            (represented by a dictionary of page IDs).
 
     Raises:
-      InvalidRequest: If either of the provided titles correspond to pages which do not exist.
+      InvalidRequest: If either of the provided titles correspond to pages which do not exist, if
+                      the provided maximum number of paths is invalid, or if the search exceeded
+                      its budget.
   """
   start_time = time.time()
 
+  max_paths = request.json.get('maxPaths')
+  if max_paths is not None and (isinstance(max_paths, bool) or not is_positive_int(max_paths)):
+    raise InvalidRequest('Maximum number of paths must be a positive integer.')
+
   # Look up the IDs for each page.
   try:
     (source_page_id, source_page_title,
      is_source_redirected) = database.fetch_page(request.json['source'])
   except ValueError:
-    raise InvalidRequest(
-        'Start page "{0}" does not exist. Please try another search.'.format(request.json['source']))
+    raise InvalidRequest('Start page "{0}" does not exist. Please try another search.'.format(
+        request.json['source']))
 
   try:
     (target_page_id, target_page_title,
@@ -112,14 +405,34 @@ def shortest_paths_route():
     raise InvalidRequest(
         'End page "{0}" does not exist. Please try another search.'.format(request.json['target']))
 
+  # Start fetching the source and target pages' information while the shortest paths are computed.
+  endpoint_pages_info_future = prefetch_wikipedia_pages_info(
+      list({str(source_page_id), str(target_page_id)}), database, page_info_cache)
+
   # Compute the shortest paths.
-  paths = database.compute_shortest_paths(source_page_id, target_page_id)
+  search_budget = SearchBudget(max_duration_seconds=SEARCH_MAX_DURATION_SECONDS,
+                               max_links_scanned=SEARCH_MAX_LINKS_SCANNED,
+                               max_frontier_size=SEARCH_MAX_FRONTIER_SIZE)
+  try:
+    paths, paths_count = database.compute_shortest_paths(
+        source_page_id, target_page_id, max_paths, search_budget)
+  except SearchBudgetExceeded as error:
+    logging.warning('Search budget exceeded from {0} to {1}: {2}'.format(
+        source_page_id, target_page_id, error.message))
+    raise InvalidRequest(
+        'Search from "{0}" to "{1}" was stopped before finding a path. Please try another '
+        'search.'.format(source_page_title, target_page_title), status_code=503, payload={
+            'searchBudgetExceeded': True,
+            'degreesSearched': error.degrees_searched,
+            'linksScanned': search_budget.links_scanned,
+        })
 
   response = {
       'sourcePageTitle': source_page_title,
       'targetPageTitle': target_page_title,
       'isSourceRedirected': is_source_redirected,
       'isTargetRedirected': is_target_redirected,
+      'pathsCount': paths_count,
   }
 
   # No paths found.
@@ -129,14 +442,16 @@ def shortest_paths_route():
     response['pages'] = []
   # Paths found
   else:
-    # Get a list of all IDs.
+    # Get a list of all IDs, other than the source and target pages which are already being fetched.
     page_ids_set = set()
     for path in paths:
       for page_id in path:
         page_ids_set.add(str(page_id))
+    page_ids_set.difference_update([str(source_page_id), str(target_page_id)])
 
     response['paths'] = paths
-    response['pages'] = fetch_wikipedia_pages_info(list(page_ids_set), database)
+    response['pages'] = fetch_wikipedia_pages_info(list(page_ids_set), database, page_info_cache)
+    response['pages'].update(endpoint_pages_info_future.result())
 
 
   try:
@@ -145,9 +460,132 @@ def shortest_paths_route():
       'target_id': target_page_id,
       'duration': time.time() - start_time,
       'paths': paths,
+      'paths_count': paths_count,
     })
   except Exception as e:
     # Log the error and continue.
     logging.error('An unexpected error occurred while inserting result: {0}'.format(e))
 
   return jsonify(response)
+
+
+@app.route('/paths/stream', methods=['POST'])
+def shortest_paths_stream_route():
+  """Endpoint which streams the shortest paths between two Wikipedia pages, sending each part of
+  the result as soon as it is available rather than waiting for all of the pages data.
+
+  Responds with Server-Sent Events if the request accepts "text/event-stream", or with
+  newline-delimited JSON otherwise. Closing the connection stops any pages data fetching which has
+  not started yet.
+
+    Args:
+      source: The title of the page at which to start the search.
+      target: The title of the page at which to end the search.
+      maxPaths: Optional maximum number of paths to return.
+
+    Returns:
+      Response: A stream of events, each of which is a JSON-ified dictionary:
+        1. "titles": the resolved source and target titles and whether redirects were followed.
+        2. "paths": the shortest paths (represented by a list of lists of page IDs), the total
+           number of shortest paths, and the number of degrees, or an error if the search exceeded
+           its budget.
+        3. "pages": one per batch of pages data (represented by a dictionary of page IDs).
+        4. "done": sent once everything else has been sent.
+
+    Raises:
+      InvalidRequest: If either of the provided titles correspond to pages which do not exist, or if
+                      the provided maximum number of paths is invalid.
+  """
+  start_time = time.time()
+
+  max_paths = request.json.get('maxPaths')
+  if max_paths is not None and (isinstance(max_paths, bool) or not is_positive_int(max_paths)):
+    raise InvalidRequest('Maximum number of paths must be a positive integer.')
+
+  # Look up the IDs for each page before the stream starts, so that errors get a status code.
+  try:
+    (source_page_id, source_page_title,
+     is_source_redirected) = database.fetch_page(request.json['source'])
+  except ValueError:
+    raise InvalidRequest('Start page "{0}" does not exist. Please try another search.'.format(
+        request.json['source']))
+
+  try:
+    (target_page_id, target_page_title,
+     is_target_redirected) = database.fetch_page(request.json['target'])
+  except ValueError:
+    raise InvalidRequest(
+        'End page "{0}" does not exist. Please try another search.'.format(request.json['target']))
+
+  is_event_stream = request.accept_mimetypes.best == 'text/event-stream'
+
+  def format_event(event, data):
+    if is_event_stream:
+      return 'event: {0}\ndata: {1}\n\n'.format(event, json.dumps(data))
+    data['event'] = event
+    return json.dumps(data) + '\n'
+
+  def generate_events():
+    # Start fetching the source and target pages' information while the shortest paths are
+    # computed.
+    endpoint_page_ids = list({str(source_page_id), str(target_page_id)})
+    endpoint_pages_info_future = prefetch_wikipedia_pages_info(
+        endpoint_page_ids, database, page_info_cache)
+
+    yield format_event('titles', {
+        'sourcePageTitle': source_page_title,
+        'targetPageTitle': target_page_title,
+        'isSourceRedirected': is_source_redirected,
+        'isTargetRedirected': is_target_redirected,
+    })
+
+    search_budget = SearchBudget(max_duration_seconds=SEARCH_MAX_DURATION_SECONDS,
+                                 max_links_scanned=SEARCH_MAX_LINKS_SCANNED,
+                                 max_frontier_size=SEARCH_MAX_FRONTIER_SIZE)
+    try:
+      paths, paths_count = database.compute_shortest_paths(
+          source_page_id, target_page_id, max_paths, search_budget)
+    except SearchBudgetExceeded as error:
+      endpoint_pages_info_future.cancel()
+      yield format_event('paths', {
+          'error': 'Search was stopped before finding a path. Please try another search.',
+          'searchBudgetExceeded': True,
+          'degreesSearched': error.degrees_searched,
+      })
+      return
+
+    # Log the result before sending anything else, since the client may close the connection before
+    # the stream ends, which stops this generator at its next event.
+    try:
+      database.insert_result({
+        'source_id': source_page_id,
+        'target_id': target_page_id,
+        'duration': time.time() - start_time,
+        'paths': paths,
+        'paths_count': paths_count,
+      })
+    except Exception as e:
+      # Log the error and continue.
+      logging.error('An unexpected error occurred while inserting result: {0}'.format(e))
+
+    yield format_event('paths', {
+        'paths': paths,
+        'pathsCount': paths_count,
+        'degreesCount': len(paths[0]) - 1 if paths else None,
+    })
+
+    # Send the pages data of every other page on the paths, one batch at a time.
+    page_ids_set = set()
+    for path in paths:
+      for page_id in path:
+        page_ids_set.add(str(page_id))
+    page_ids_set.difference_update(endpoint_page_ids)
+
+    for pages_info in iter_wikipedia_pages_info(list(page_ids_set), database, page_info_cache):
+      yield format_event('pages', {'pages': pages_info})
+
+    yield format_event('pages', {'pages': endpoint_pages_info_future.result()})
+    yield format_event('done', {})
+
+  return Response(generate_events(),
+                  mimetype='text/event-stream' if is_event_stream else 'application/x-ndjson')
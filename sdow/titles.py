@@ -0,0 +1,197 @@
+"""
+Memory-mapped title index used to resolve page titles and to suggest titles by prefix without
+querying SQLite.
+"""
+
+import os.path
+from bisect import bisect_left
+
+from sdow.graph import load_mmapped_array
+
+
+# Names of the files written by scripts/build_title_files.py into the graph directory.
+TITLES_DATA_FILENAME = 'titles.data'
+TITLES_OFFSETS_FILENAME = 'titles.offsets'
+TITLES_PAGE_IDS_FILENAME = 'titles.page_ids'
+TITLES_RESOLVED_INDICES_FILENAME = 'titles.resolved_indices'
+TITLES_RANKS_FILENAME = 'titles.ranks'
+TITLES_SUGGESTION_RANGES_FILENAME = 'titles.suggestion_ranges'
+TITLES_SUGGESTIONS_FILENAME = 'titles.suggestions'
+
+# Maximum number of titles matching a prefix which are ranked to pick suggestions. The suggestions
+# of prefixes which match more titles are precomputed by scripts/build_title_files.py.
+MAX_SUGGESTION_CANDIDATES = 1000
+
+
+def get_title_key(title):
+  """Returns the key by which titles are sorted, which folds ASCII letters to lower case like
+  SQLite's NOCASE collation.
+
+  Args:
+    title: The UTF-8 encoded title.
+
+  Returns:
+    bytes: The title's key.
+  """
+  return title.lower()
+
+
+class TitleIndex(object):
+  """Read-only, memory-mapped array of every page title, sorted case-insensitively."""
+
+  def __init__(self, graph_directory):
+    self.data = load_mmapped_array(os.path.join(graph_directory, TITLES_DATA_FILENAME), 'B')
+    self.offsets = load_mmapped_array(os.path.join(graph_directory, TITLES_OFFSETS_FILENAME), 'q')
+    self.page_ids = load_mmapped_array(os.path.join(graph_directory, TITLES_PAGE_IDS_FILENAME), 'i')
+    self.resolved_indices = load_mmapped_array(
+        os.path.join(graph_directory, TITLES_RESOLVED_INDICES_FILENAME), 'i')
+    self.ranks = load_mmapped_array(os.path.join(graph_directory, TITLES_RANKS_FILENAME), 'i')
+
+    # The precomputed suggestions of each large range of titles matching a prefix, in rows of a
+    # fixed size.
+    self.suggestion_ranges = load_mmapped_array(
+        os.path.join(graph_directory, TITLES_SUGGESTION_RANGES_FILENAME), 'q')
+    self.suggestions = load_mmapped_array(
+        os.path.join(graph_directory, TITLES_SUGGESTIONS_FILENAME), 'i')
+
+    self.titles_count = len(self.page_ids)
+    self.suggestions_per_range = 0
+    if len(self.suggestion_ranges) != 0:
+      self.suggestions_per_range = len(self.suggestions) // len(self.suggestion_ranges)
+
+  @staticmethod
+  def exists(graph_directory):
+    """Returns whether a title index has been built in the provided graph directory.
+
+    Args:
+      graph_directory: The directory containing the graph files.
+
+    Returns:
+      bool: Whether the title index files exist.
+    """
+    return os.path.isfile(os.path.join(graph_directory, TITLES_OFFSETS_FILENAME))
+
+  def get_encoded_title(self, index):
+    """Returns the UTF-8 encoded title at the provided index."""
+    return self.data[self.offsets[index]:self.offsets[index + 1]].tobytes()
+
+  def get_title(self, index):
+    """Returns the title at the provided index."""
+    return self.get_encoded_title(index).decode('utf-8')
+
+  def get_first_index(self, key):
+    """Returns the index of the first title whose key is not less than the provided key.
+
+    Args:
+      key: The key to search for.
+
+    Returns:
+      int: The index of the first matching title, or the number of titles if there is none.
+    """
+    low = 0
+    high = self.titles_count
+    while low < high:
+      middle = (low + high) // 2
+      if get_title_key(self.get_encoded_title(middle)) < key:
+        low = middle + 1
+      else:
+        high = middle
+    return low
+
+  def fetch_page(self, sanitized_page_title):
+    """Returns the non-redirect page corresponding to the provided title, using the same rules as
+    Database.fetch_page().
+
+    Args:
+      sanitized_page_title: The sanitized title of the page to fetch.
+
+    Returns:
+      (int, str, bool): A tuple containing the page ID, sanitized title, and whether or not a
+        redirect was followed.
+      OR
+      None: If no page exists.
+    """
+    encoded_page_title = sanitized_page_title.encode('utf-8')
+    key = get_title_key(encoded_page_title)
+
+    # Collect the indices of every title which matches case-insensitively.
+    indices = []
+    index = self.get_first_index(key)
+    while index < self.titles_count and get_title_key(self.get_encoded_title(index)) == key:
+      indices.append(index)
+      index += 1
+
+    if not indices:
+      return None
+
+    # First, look for a non-redirect page which has exact match with the page title.
+    for index in indices:
+      if (self.resolved_indices[index] == index and
+          self.get_encoded_title(index) == encoded_page_title):
+        return (self.page_ids[index], sanitized_page_title, False)
+
+    # Next, look for a match with a non-redirect page.
+    for index in indices:
+      if self.resolved_indices[index] == index:
+        return (self.page_ids[index], self.get_title(index), False)
+
+    # If all the matches are redirects, use the page to which the first match redirects.
+    resolved_index = self.resolved_indices[indices[0]]
+    if resolved_index == -1:
+      return None
+
+    return (self.page_ids[resolved_index], self.get_title(resolved_index), True)
+
+  def fetch_page_suggestions(self, sanitized_page_title_prefix, limit):
+    """Returns the most linked non-redirect pages whose title, or the title of a page which
+    redirects to them, starts with the provided prefix.
+
+    Args:
+      sanitized_page_title_prefix: The sanitized prefix of the titles to suggest.
+      limit: The maximum number of pages to return.
+
+    Returns:
+      list((int, str)): The ID and sanitized title of each suggested page, most linked first.
+    """
+    prefix_key = get_title_key(sanitized_page_title_prefix.encode('utf-8'))
+
+    # UTF-8 never contains a 0xFF byte, so the keys which start with the prefix all sort before the
+    # prefix followed by one.
+    start_index = self.get_first_index(prefix_key)
+    end_index = self.get_first_index(prefix_key + b'\xff')
+
+    if end_index - start_index > MAX_SUGGESTION_CANDIDATES:
+      suggested_indices = self.get_precomputed_suggestions(start_index, end_index)[:limit]
+    else:
+      candidates = {}
+      for index in range(start_index, end_index):
+        resolved_index = self.resolved_indices[index]
+        if resolved_index != -1:
+          candidates[resolved_index] = self.ranks[index]
+
+      suggested_indices = sorted(candidates, key=lambda index: -candidates[index])[:limit]
+
+    return [(self.page_ids[index], self.get_title(index)) for index in suggested_indices]
+
+  def get_precomputed_suggestions(self, start_index, end_index):
+    """Returns the precomputed suggestions of the titles in the provided range, which must be the
+    range of titles matching a prefix.
+
+    Args:
+      start_index: The index of the first title matching the prefix.
+      end_index: The index following the last title matching the prefix.
+
+    Returns:
+      list(int): The indices of the resolved titles of the most linked pages in the range, most
+        linked first.
+    """
+    suggestion_range = (start_index << 32) | end_index
+    position = bisect_left(self.suggestion_ranges, suggestion_range)
+    if (position == len(self.suggestion_ranges) or
+        self.suggestion_ranges[position] != suggestion_range):
+      return []
+
+    start_offset = position * self.suggestions_per_range
+    suggested_indices = self.suggestions[start_offset:start_offset + self.suggestions_per_range]
+
+    return [index for index in suggested_indices.tolist() if index != -1]
@@ -0,0 +1,239 @@
+"""
+Runs a bi-directional breadth-first search between two Wikipedia articles, expanding each level of
+the search with NumPy array operations instead of a per-link Python loop.
+
+Visited pages are tracked in boolean arrays indexed by page ID, and the links discovered at each
+level are kept as parallel arrays of parent and child page IDs. Only the links which lie on a
+shortest path are converted back into Python objects once the search completes.
+"""
+
+import numpy as np
+
+from sdow.graph import CsrGraph
+from sdow.breadth_first_search import get_shortest_paths
+
+
+def fetch_links_arrays(page_ids, database, outgoing_or_incoming_links):
+  """Returns the links from or to the provided pages as two parallel arrays.
+
+  Args:
+    page_ids: A NumPy array of page IDs whose links to fetch.
+    database: A Database or CsrGraph instance.
+    outgoing_or_incoming_links: Either "outgoing_links" or "incoming_links".
+
+  Returns:
+    (numpy.ndarray, numpy.ndarray): The IDs of the provided pages, repeated once per link, and the
+      IDs of the pages at the other end of each link.
+  """
+  if isinstance(database, CsrGraph):
+    # Gather the neighbors of every page directly out of the memory-mapped CSR arrays.
+    if outgoing_or_incoming_links == 'outgoing_links':
+      offsets, neighbors = database.outgoing_offsets, database.outgoing_neighbors
+    else:
+      offsets, neighbors = database.incoming_offsets, database.incoming_neighbors
+
+    offsets = np.frombuffer(offsets, dtype=np.int64)
+    neighbors = np.frombuffer(neighbors, dtype=np.int32)
+
+    page_ids = page_ids[page_ids < len(offsets) - 1]
+    start_offsets = offsets[page_ids]
+    links_counts = offsets[page_ids + 1] - start_offsets
+    total_links_count = int(links_counts.sum())
+
+    # Build the index of every neighbor of every page without looping over the pages.
+    level_start_offsets = np.cumsum(links_counts) - links_counts
+    neighbor_indices = np.repeat(start_offsets - level_start_offsets, links_counts) + np.arange(
+        total_links_count, dtype=np.int64)
+
+    return (np.repeat(page_ids, links_counts).astype(np.int32), neighbors[neighbor_indices])
+
+  if outgoing_or_incoming_links == 'outgoing_links':
+    links = database.fetch_outgoing_links(page_ids.tolist())
+  else:
+    links = database.fetch_incoming_links(page_ids.tolist())
+
+  fetched_page_ids = []
+  linked_page_ids = []
+  for page_id, current_linked_page_ids in links:
+    current_linked_page_ids = np.asarray(current_linked_page_ids, dtype=np.int32)
+    fetched_page_ids.append(np.full(len(current_linked_page_ids), page_id, dtype=np.int32))
+    linked_page_ids.append(current_linked_page_ids)
+
+  if not linked_page_ids:
+    return (np.empty(0, dtype=np.int32), np.empty(0, dtype=np.int32))
+
+  return (np.concatenate(fetched_page_ids), np.concatenate(linked_page_ids))
+
+
+def fetch_links_count(page_ids, database, outgoing_or_incoming_links):
+  """Returns the sum of outgoing or incoming links for the provided pages.
+
+  Args:
+    page_ids: A NumPy array of page IDs whose links to count.
+    database: A Database or CsrGraph instance.
+    outgoing_or_incoming_links: Either "outgoing_links" or "incoming_links".
+
+  Returns:
+    int: The count of outgoing or incoming links.
+  """
+  if isinstance(database, CsrGraph):
+    if outgoing_or_incoming_links == 'outgoing_links':
+      offsets = np.frombuffer(database.outgoing_offsets, dtype=np.int64)
+    else:
+      offsets = np.frombuffer(database.incoming_offsets, dtype=np.int64)
+
+    page_ids = page_ids[page_ids < len(offsets) - 1]
+    return int((offsets[page_ids + 1] - offsets[page_ids]).sum())
+
+  if outgoing_or_incoming_links == 'outgoing_links':
+    links_count = database.fetch_outgoing_links_count(page_ids.tolist())
+  else:
+    links_count = database.fetch_incoming_links_count(page_ids.tolist())
+
+  # SQLite returns NULL when none of the pages have a row in the links table.
+  return links_count or 0
+
+
+def get_parents_dict(meeting_page_ids, levels):
+  """Returns a mapping from page ID to the IDs of its parents for every page which lies on a
+  shortest path between one side of the search and the provided meeting pages.
+
+  Args:
+    meeting_page_ids: A NumPy array of the IDs of the pages at which both searches met.
+    levels: A list of (parent page IDs, child page IDs) array tuples, one per level expanded.
+
+  Returns:
+    dict(int, list(int)): A mapping from page ID to a list of its distinct parents' IDs. None
+      signifies that the page is the source or target page.
+  """
+  parents_dict = {}
+
+  current_page_ids = meeting_page_ids
+  for parent_page_ids, child_page_ids in reversed(levels):
+    # Only keep the links leading into pages which are themselves on a shortest path.
+    on_path_mask = np.isin(child_page_ids, current_page_ids)
+    parent_page_ids = parent_page_ids[on_path_mask].tolist()
+    child_page_ids = child_page_ids[on_path_mask].tolist()
+
+    # The links of each parent are contiguous, so a duplicate link can only repeat the most recently
+    # added parent.
+    for parent_page_id, child_page_id in zip(parent_page_ids, child_page_ids):
+      child_parent_page_ids = parents_dict.setdefault(child_page_id, [])
+      if not child_parent_page_ids or child_parent_page_ids[-1] != parent_page_id:
+        child_parent_page_ids.append(parent_page_id)
+
+    current_page_ids = np.unique(np.asarray(parent_page_ids, dtype=np.int32))
+
+  # The only pages remaining are the source or target page.
+  for page_id in current_page_ids.tolist():
+    parents_dict[page_id] = [None]
+
+  return parents_dict
+
+
+def vectorized_breadth_first_search(source_page_id, target_page_id, database, max_page_id,
+                                    max_paths=None, search_budget=None):
+  """Returns a list of shortest paths from the source to target pages by running a vectorized
+  bi-directional breadth-first search on the graph of Wikipedia pages.
+
+  Args:
+    source_page_id: The page at which to start the search.
+    target_page_id: The page at which to end the search.
+    database: A Database or CsrGraph instance which contains methods to query the Wikipedia
+      link graph.
+    max_page_id: The largest page ID in the link graph, used to size the visited arrays.
+    max_paths: The maximum number of paths to return, or None to return all of them.
+    search_budget: An optional SearchBudget limiting the work done by the search. Its limits are
+      checked once per level.
+
+  Returns:
+    (list(list(int)), int): A tuple containing a list of lists of page IDs corresponding to paths
+      from the source page to the target page, and the total number of shortest paths.
+
+  Raises:
+    SearchBudgetExceeded: If the search exceeded one of the provided search budget's limits.
+  """
+  # If the source and target page IDs are identical, return the trivial path.
+  if source_page_id == target_page_id:
+    return ([[source_page_id]], 1)
+
+  # The visited arrays mark every page which has been reached by either side of the search,
+  # including the pages in the current frontier.
+  pages_count = max(max_page_id, source_page_id, target_page_id) + 1
+  visited_forward = np.zeros(pages_count, dtype=np.bool_)
+  visited_backward = np.zeros(pages_count, dtype=np.bool_)
+  visited_forward[source_page_id] = True
+  visited_backward[target_page_id] = True
+
+  # The unvisited arrays hold the sorted IDs of the pages in the current frontier.
+  unvisited_forward = np.array([source_page_id], dtype=np.int32)
+  unvisited_backward = np.array([target_page_id], dtype=np.int32)
+
+  # The levels lists hold a tuple of (parent page IDs, child page IDs) arrays per level expanded.
+  forward_levels = []
+  backward_levels = []
+
+  meeting_page_ids = np.empty(0, dtype=np.int32)
+
+  # Continue the breadth first search until a path has been found or either of the unvisited arrays
+  # are empty.
+  while (len(meeting_page_ids) == 0) and ((len(unvisited_forward) != 0) and
+                                          (len(unvisited_backward) != 0)):
+    # Run the next iteration of the breadth first search in whichever direction has the smaller
+    # number of links at the next level.
+    forward_links_count = fetch_links_count(unvisited_forward, database, 'outgoing_links')
+    backward_links_count = fetch_links_count(unvisited_backward, database, 'incoming_links')
+
+    degrees_searched = len(forward_levels) + len(backward_levels)
+
+    if forward_links_count < backward_links_count:
+      #---  FORWARD BREADTH FIRST SEARCH  ---#
+      if search_budget is not None:
+        search_budget.check_frontier_size(len(unvisited_forward), degrees_searched)
+        search_budget.record_links_scanned(forward_links_count, degrees_searched)
+
+      parent_page_ids, child_page_ids = fetch_links_arrays(
+          unvisited_forward, database, 'outgoing_links')
+
+      # Only keep links to pages which have not been visited yet.
+      unvisited_mask = ~visited_forward[child_page_ids]
+      parent_page_ids = parent_page_ids[unvisited_mask]
+      child_page_ids = child_page_ids[unvisited_mask]
+
+      unvisited_forward = np.unique(child_page_ids)
+      visited_forward[unvisited_forward] = True
+      forward_levels.append((parent_page_ids, child_page_ids))
+
+    else:
+      #---  BACKWARD BREADTH FIRST SEARCH  ---#
+      if search_budget is not None:
+        search_budget.check_frontier_size(len(unvisited_backward), degrees_searched)
+        search_budget.record_links_scanned(backward_links_count, degrees_searched)
+
+      parent_page_ids, child_page_ids = fetch_links_arrays(
+          unvisited_backward, database, 'incoming_links')
+
+      # Only keep links from pages which have not been visited yet.
+      unvisited_mask = ~visited_backward[child_page_ids]
+      parent_page_ids = parent_page_ids[unvisited_mask]
+      child_page_ids = child_page_ids[unvisited_mask]
+
+      unvisited_backward = np.unique(child_page_ids)
+      visited_backward[unvisited_backward] = True
+      backward_levels.append((parent_page_ids, child_page_ids))
+
+    #---  CHECK FOR PATH COMPLETION  ---#
+    # The search is complete if any of the pages are in both unvisited backward and unvisited
+    # forward.
+    meeting_page_ids = np.intersect1d(unvisited_forward, unvisited_backward, assume_unique=True)
+
+  if len(meeting_page_ids) == 0:
+    return ([], 0)
+
+  # Convert the links which lie on a shortest path into the parent dictionaries used to build the
+  # resulting paths.
+  forward_parents = get_parents_dict(meeting_page_ids, forward_levels)
+  backward_parents = get_parents_dict(meeting_page_ids, backward_levels)
+
+  return get_shortest_paths(
+      meeting_page_ids.tolist(), forward_parents, backward_parents, max_paths)
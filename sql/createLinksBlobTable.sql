@@ -0,0 +1,11 @@
+CREATE TABLE IF NOT EXISTS links
+(
+  id INTEGER PRIMARY KEY,
+  outgoing_links_count INTEGER NOT NULL,
+  incoming_links_count INTEGER NOT NULL,
+  outgoing_links BLOB NOT NULL,
+  incoming_links BLOB NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS links_outgoing_links_count_index ON links(outgoing_links_count);
+CREATE INDEX IF NOT EXISTS links_incoming_links_count_index ON links(incoming_links_count);